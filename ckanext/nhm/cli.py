@@ -5,6 +5,16 @@ import click
 from ckan.lib.uploader import ResourceUpload
 from ckan.plugins import toolkit
 
+from .dcat.dump import queue_ntriples_dump, write_ntriples
+from .dcat.utils import rdf_resources
+from .lib.facets import precompute_facets
+from .lib.gbif import backfill_gbif_occurrences
+from .lib.guid_index import get_guid_index_path, update_guid_index
+from .lib.helpers import get_specimen_resource_id
+from .lib.record import iter_records
+from .lib.resource_view import get_view_registry
+from .lib.statistics import get_record_history_path, update_record_history
+from .lib.status import refresh_status
 from .logic.schema import DATASET_TYPE_VOCABULARY
 
 # default list of dataset category tags
@@ -196,3 +206,151 @@ def replace_resource_file(resource_id, path):
         'A copy of the original resource file has been made at {}'.format(backup_path),
         fg='yellow',
     )
+
+
+@nhm.command(name='dump-specimen-rdf')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    '--version',
+    type=int,
+    default=None,
+    help='The version of the specimen data to dump, defaults to the latest',
+)
+@click.option(
+    '--page-size',
+    type=int,
+    default=1000,
+    show_default=True,
+    help='The number of records to retrieve per search',
+)
+@click.option(
+    '--skip-gbif',
+    is_flag=True,
+    default=False,
+    help="Don't look up each record's GBIF record",
+)
+@click.option(
+    '--background',
+    is_flag=True,
+    default=False,
+    help='Queue a background job to write the dump instead of writing it now',
+)
+def dump_specimen_rdf(path, version, page_size, skip_gbif, background):
+    """
+    Write the whole specimen collection to PATH as gzip compressed N-Triples.
+    """
+    args = (path, get_specimen_resource_id(), version, page_size, not skip_gbif)
+    if background:
+        job = queue_ntriples_dump(*args)
+        success('Queued job {} to write the dump to {}', job.id, path)
+    else:
+        count = write_ntriples(*args)
+        success('Written {} records to {}', count, path)
+
+
+@nhm.command(name='update-record-history')
+def update_record_history_command():
+    """
+    Count the records for any weeks missing from the record history.
+    """
+    history = update_record_history()
+    success(
+        'Record history has {} weeks, stored in {}',
+        len(history),
+        get_record_history_path(),
+    )
+
+
+@nhm.command(name='backfill-gbif-occurrences')
+@click.option(
+    '--batch-size',
+    type=int,
+    default=100,
+    show_default=True,
+    help='The number of occurrence IDs to look up in each request to GBIF',
+)
+@click.option(
+    '--interval',
+    type=float,
+    default=1.0,
+    show_default=True,
+    help='The minimum number of seconds between requests to GBIF',
+)
+@click.option(
+    '--overwrite',
+    is_flag=True,
+    default=False,
+    help='Look up occurrence IDs even if they are already in the store',
+)
+def backfill_gbif_occurrences_command(batch_size, interval, overwrite):
+    """
+    Look up the GBIF record for every specimen and store it in the GBIF occurrence
+    store used by the external links on record pages.
+    """
+    records = (record.data for record in iter_records(get_specimen_resource_id()))
+    counts = backfill_gbif_occurrences(records, batch_size, interval, overwrite)
+    success(
+        'Found {found}, not found {not_found}, skipped {skipped}, failed {failed}',
+        **counts,
+    )
+
+
+@nhm.command(name='refresh-status')
+def refresh_status_command():
+    """
+    Check the status of the image server, collections data ingest and GBIF dataset and
+    store the results for the status reports. This should be run regularly (e.g. every
+    few minutes using cron).
+    """
+    refresh_status()
+    success('Status reports updated')
+
+
+@nhm.command(name='update-guid-index')
+@click.option(
+    '--page-size',
+    type=int,
+    default=5000,
+    show_default=True,
+    help='The number of records to retrieve from the datastore at a time',
+)
+def update_guid_index_command(page_size):
+    """
+    Add the GUID of every record in the RDF resources (currently just the specimens) to
+    the GUID index used to redirect object URLs. This should be run after each ingest,
+    GUIDs already in the index are updated rather than the index being rebuilt.
+    """
+    for resource_id in rdf_resources():
+        version = toolkit.get_action('vds_version_round')(
+            {}, {'resource_id': resource_id}
+        )
+        records = (
+            record.data
+            for record in iter_records(resource_id, version, page_size=page_size)
+        )
+        count = update_guid_index(resource_id, version, records)
+        success('Indexed {} GUIDs from {} at version {}', count, resource_id, version)
+    success('GUID index stored in {}', get_guid_index_path())
+
+
+@nhm.command(name='precompute-facets')
+@click.option(
+    '--force',
+    is_flag=True,
+    help='Recompute the facets even if they are already of the latest version',
+)
+def precompute_facets_command(force):
+    """
+    Compute the unfiltered facets of each collection resource (the resources with their
+    own faceted view, e.g. the specimens) and store them so that they can be shown on
+    the resource page without searching. This should be run after each ingest, the
+    facets are only recomputed if there is a new version of the resource.
+    """
+    for resource_id, view in get_view_registry().by_resource_id.items():
+        if not view.field_facets:
+            continue
+        version = precompute_facets(resource_id, view.field_facets, force=force)
+        if version is None:
+            click.echo(f'Facets for {resource_id} are already up to date')
+        else:
+            success('Stored facets for {} at version {}', resource_id, version)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+import gzip
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from ckan.plugins import toolkit
+from rdflib import Graph
+
+from ckanext.nhm.dcat.specimen_records import RecordGraphBuilder
+from ckanext.nhm.dcat.utils import Namespaces
+from ckanext.nhm.lib.record import iter_records
+
+log = logging.getLogger(__name__)
+
+# the number of records whose triples are serialised together
+BATCH_SIZE = 100
+
+
+def write_ntriples(
+    path: str,
+    resource_id: str,
+    version: Optional[int] = None,
+    page_size: int = 1000,
+    fetch_gbif_records: bool = True,
+) -> int:
+    """
+    Writes every record in the given resource to the given path as gzip compressed
+    N-Triples. The records are paged through and each record's triples are written out
+    in small batches so memory usage is constant regardless of the size of the
+    resource. The dump is written to a temporary file next to the path and then moved
+    into place once it is complete so that a partial dump is never left at the path.
+
+    :param path: the path to write the dump to
+    :param resource_id: the resource to dump
+    :param version: the version of the resource to dump (default: None, the latest)
+    :param page_size: the number of records to retrieve per search (default: 1000)
+    :param fetch_gbif_records: whether to look up each record's GBIF record and include
+        its data in the dump (default: True)
+    :returns: the number of records written
+    """
+    rounded_version = toolkit.get_action('vds_version_round')(
+        {'ignore_auth': True}, {'resource_id': resource_id, 'version': version}
+    )
+    # nothing is added to this graph, it's just here to bind the namespaces to
+    namespaces = Namespaces(Graph())
+
+    path = Path(path)
+    temp_path = path.with_name(f'.{path.name}.tmp')
+    count = 0
+    try:
+        with gzip.open(temp_path, 'wb') as f:
+            batch = Graph()
+            # search at the rounded version so that an ingest part way through the dump
+            # doesn't mix records from different versions
+            for record in iter_records(resource_id, rounded_version, page_size):
+                builder = RecordGraphBuilder(
+                    record,
+                    namespaces,
+                    # the metadata URI for each record should point at a format we
+                    # actually serve on the object endpoint, N-Triples isn't one of them
+                    'ttl',
+                    version,
+                    rounded_version=rounded_version,
+                    fetch_gbif_record=fetch_gbif_records,
+                )
+                for triple in builder:
+                    batch.add(triple)
+                count += 1
+                if count % BATCH_SIZE == 0:
+                    f.write(batch.serialize(format='nt', encoding='utf-8'))
+                    batch = Graph()
+                if count % 100000 == 0:
+                    log.info(f'Written {count} records to {path}')
+            f.write(batch.serialize(format='nt', encoding='utf-8'))
+        os.replace(temp_path, path)
+    finally:
+        # if the dump failed, don't leave the partial dump lying around
+        if temp_path.exists():
+            temp_path.unlink()
+    log.info(f'Finished writing {count} records to {path}')
+    return count
+
+
+def queue_ntriples_dump(
+    path: str,
+    resource_id: str,
+    version: Optional[int] = None,
+    page_size: int = 1000,
+    fetch_gbif_records: bool = True,
+):
+    """
+    Queues a background job to write the N-Triples dump. See write_ntriples for the
+    parameters.
+
+    :returns: the queued job
+    """
+    return toolkit.enqueue_job(
+        write_ntriples,
+        [path, resource_id, version, page_size, fetch_gbif_records],
+        title=f'Write N-Triples dump of {resource_id} to {path}',
+        # these can take a long time on the specimen collection
+        rq_kwargs={'timeout': 24 * 60 * 60},
+    )
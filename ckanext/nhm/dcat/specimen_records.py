@@ -6,7 +6,8 @@
 import itertools
 import json
 from datetime import datetime
-from typing import Optional
+from functools import partial
+from typing import Dict, Iterable, List, Optional
 
 from ckan.plugins import toolkit
 from rdflib import Literal, URIRef
@@ -18,10 +19,14 @@ from ckanext.nhm.dcat.utils import (
     as_dwc_list,
     object_uri,
 )
+from ckanext.nhm.lib.concurrency import run_concurrently
 from ckanext.nhm.lib.dwc import dwc_terms
 from ckanext.nhm.lib.helpers import get_department
 from ckanext.nhm.lib.record import Record
 
+# the maximum number of GBIF records to look up at the same time
+GBIF_LOOKUP_WORKERS = 10
+
 
 class ObjectSerializer(RDFSerializer):
     """
@@ -53,9 +58,54 @@ class ObjectSerializer(RDFSerializer):
 
         Returns a string with the serialized dataset
         """
-        rdflib_format = url_to_rdflib_format(output_format)
         builder = RecordGraphBuilder(record, Namespaces(self.g), output_format, version)
+        self._add_triples(builder)
+        return self._serialize(output_format)
+
+    def serialize_records(
+        self,
+        records: List[Record],
+        output_format: str = 'xml',
+        version: Optional[int] = None,
+    ):
+        """
+        Given a list of records, returns an RDF serialization of a single graph
+        containing all of them.
+
+        The version is only rounded once per resource and the GBIF records for all the
+        records are retrieved up front, rather than each record's graph builder doing
+        these lookups itself.
+
+        Returns a string with the serialized graph
+        """
+        namespaces = Namespaces(self.g)
+        rounded_versions = {}
+        gbif_records = get_gbif_records(record.data.get('gbifID') for record in records)
+
+        for record in records:
+            if record.resource_id not in rounded_versions:
+                rounded_versions[record.resource_id] = toolkit.get_action(
+                    'vds_version_round'
+                )({}, {'resource_id': record.resource_id, 'version': version})
+            builder = RecordGraphBuilder(
+                record,
+                namespaces,
+                output_format,
+                version,
+                rounded_version=rounded_versions[record.resource_id],
+                gbif_record=gbif_records.get(record.data.get('gbifID')),
+                fetch_gbif_record=False,
+            )
+            self._add_triples(builder)
+
+        return self._serialize(output_format)
 
+    def _add_triples(self, builder: 'RecordGraphBuilder'):
+        """
+        Adds all the triples from the given builder to the graph.
+
+        :param builder: a RecordGraphBuilder object
+        """
         for triple in builder:
             # the builder is allowed to yield duplicate triples so using add here just defers the
             # handling of these to the triplestore itself, which it handles fine. We could use set
@@ -65,11 +115,58 @@ class ObjectSerializer(RDFSerializer):
             # triplestore and the (x, y, a) triple would be removed)
             self.g.add(triple)
 
+    def _serialize(self, output_format: str):
+        """
+        Serializes the graph in the given format.
+
+        :param output_format: the format, as it appears in URLs (e.g. ttl)
+        :returns: the serialized graph as a string
+        """
+        rdflib_format = url_to_rdflib_format(output_format)
         return self.g.serialize(
             format=rdflib_format, **self.serializer_kwargs.get(rdflib_format, {})
         )
 
 
+def get_gbif_record(gbif_id) -> Optional[dict]:
+    """
+    Retrieve the GBIF record with the given GBIF ID, if we can.
+
+    :param gbif_id: the GBIF ID, can be None
+    :returns: the GBIF record dict or None if we couldn't get it or no GBIF ID was
+        passed
+    """
+    if gbif_id is not None:
+        try:
+            context = {'ignore_auth': True}
+            data_dict = {'gbif_id': gbif_id}
+            return toolkit.get_action('gbif_record_show')(context, data_dict)
+        except toolkit.ObjectNotFound:
+            pass
+    return None
+
+
+def get_gbif_records(gbif_ids: Iterable) -> Dict[str, dict]:
+    """
+    Retrieve the GBIF records for all the given GBIF IDs. Each unique GBIF ID is only
+    looked up once and the lookups are run concurrently.
+
+    :param gbif_ids: the GBIF IDs, any Nones are ignored
+    :returns: a dict of GBIF ID -> GBIF record dict, IDs with no GBIF record are not
+        included
+    """
+    unique_ids = list(set(filter(None, gbif_ids)))
+    gbif_records = run_concurrently(
+        [partial(get_gbif_record, gbif_id) for gbif_id in unique_ids],
+        max_workers=GBIF_LOOKUP_WORKERS,
+    )
+    return {
+        gbif_id: gbif_record
+        for gbif_id, gbif_record in zip(unique_ids, gbif_records)
+        if gbif_record is not None
+    }
+
+
 class RecordGraphBuilder(object):
     """
     Class that can generate the triples necessary to represent a record in rdf format.
@@ -81,6 +178,9 @@ class RecordGraphBuilder(object):
         namespaces: Namespaces,
         output_format: str,
         version: Optional[int],
+        rounded_version: Optional[int] = None,
+        gbif_record: Optional[dict] = None,
+        fetch_gbif_record: bool = True,
     ):
         """
         :param record: a Record object
@@ -88,6 +188,11 @@ class RecordGraphBuilder(object):
         :param output_format: the format the generated graph will be output in. This will be used to
                               create the metadata URI (i.e. object_url + .{output_format})
         :param version: the version of the record in question, or None if there is no version
+        :param rounded_version: the rounded version of the record, if this has already been
+                                worked out. If None (the default) it is looked up.
+        :param gbif_record: the GBIF record for the record, if this has already been retrieved
+        :param fetch_gbif_record: whether to look up the GBIF record if one isn't passed
+                                  (default: True)
         """
         self.record = record
         self.namespaces = namespaces
@@ -95,13 +200,15 @@ class RecordGraphBuilder(object):
         self.version = version
 
         # figure out the rounded version of the record
-        self.rounded_version = toolkit.get_action('vds_version_round')(
-            {},
-            {
-                'resource_id': self.record.resource_id,
-                'version': self.version,
-            },
-        )
+        if rounded_version is None:
+            rounded_version = toolkit.get_action('vds_version_round')(
+                {},
+                {
+                    'resource_id': self.record.resource_id,
+                    'version': self.version,
+                },
+            )
+        self.rounded_version = rounded_version
 
         # figure out the object URI for the record (possibly with version)
         if version is None:
@@ -114,25 +221,9 @@ class RecordGraphBuilder(object):
         self.record_ref = URIRef(self.base_object_uri)
 
         # grab the gbif version of the record if we can
-        self.gbif_record = self._get_gbif_record()
-
-    def _get_gbif_record(self):
-        """
-        Retrieve the GBIF representation of the record if we can.
-
-        :returns: the GBIF record dict or None if we couldn't get it or didn't have a
-            GBIF ID associated with the record
-        """
-        gbif_id = self.record.data.get('gbifID', None)
-
-        if gbif_id is not None:
-            try:
-                context = {'ignore_auth': True}
-                data_dict = {'gbif_id': gbif_id}
-                return toolkit.get_action('gbif_record_show')(context, data_dict)
-            except toolkit.ObjectNotFound:
-                pass
-        return None
+        if gbif_record is None and fetch_gbif_record:
+            gbif_record = get_gbif_record(self.record.data.get('gbifID', None))
+        self.gbif_record = gbif_record
 
     def __iter__(self):
         """
@@ -244,7 +335,7 @@ class RecordGraphBuilder(object):
         # if there is associated media, yield it as a list
         images = self.record.images
         if images:
-            value = as_dwc_list(image.url for image in images)
+            value = as_dwc_list(images.urls)
             yield self.record_ref, self.namespaces.dwc.associatedMedia, Literal(value)
 
         yield (
@@ -398,7 +489,7 @@ class RecordGraphBuilder(object):
             yield (
                 self.record_ref,
                 self.namespaces.dwc.associatedMedia,
-                Literal(as_dwc_list(image.url for image in images)),
+                Literal(as_dwc_list(images.urls)),
             )
 
         if self.record.data.get('created', None) is not None:
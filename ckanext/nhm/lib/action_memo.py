@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import copy
+import json
+import logging
+from collections import Counter
+from functools import wraps
+from typing import Callable, Optional
+
+from ckan.plugins import toolkit
+from flask import g, has_request_context
+
+log = logging.getLogger(__name__)
+
+# the actions which have no side effects and therefore can be memoized for the duration
+# of a request
+MEMOIZABLE_ACTIONS = frozenset(
+    {
+        'datastore_search',
+        'package_show',
+        'resource_show',
+        'resource_view_list',
+        'vds_basic_count',
+        'vds_basic_query',
+        'vds_resource_check',
+        'vds_version_round',
+    }
+)
+
+
+def _get_memo() -> dict:
+    if not hasattr(g, 'nhm_action_memo'):
+        g.nhm_action_memo = {}
+        g.nhm_action_memo_hits = Counter()
+        g.nhm_action_memo_misses = Counter()
+    return g.nhm_action_memo
+
+
+def _make_key(action_name: str, context: dict, data_dict: dict) -> Optional[str]:
+    """
+    Creates the memo key for the given action call. As well as the action name and the
+    data dict, the user and whether auth is being ignored are included as these can
+    change the result.
+
+    :param action_name: the name of the action
+    :param context: the context dict
+    :param data_dict: the data dict
+    :returns: the key as a string, or None if the data dict can't be serialised
+    """
+    user = context.get('user', getattr(g, 'user', None))
+    try:
+        data = json.dumps(data_dict, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+    return f'{action_name}|{user}|{bool(context.get("ignore_auth"))}|{data}'
+
+
+def memoized(action_name: str, action: Callable) -> Callable:
+    """
+    Wraps the given action function so that calls with the same data dict are only made
+    once per request. Only actions in MEMOIZABLE_ACTIONS are wrapped, the rest are
+    returned as is. Outside of a request the action is always called.
+
+    Results are copied in and out of the memo so that callers modifying the result they
+    get back don't affect other callers. Exceptions are not memoized.
+
+    :param action_name: the name of the action
+    :param action: the action function (i.e. the result of toolkit.get_action)
+    :returns: the wrapped action function
+    """
+    if action_name not in MEMOIZABLE_ACTIONS:
+        return action
+
+    @wraps(action)
+    def wrapper(context, data_dict):
+        if not has_request_context():
+            return action(context, data_dict)
+
+        key = _make_key(action_name, context, data_dict)
+        if key is None:
+            return action(context, data_dict)
+
+        memo = _get_memo()
+        if key in memo:
+            g.nhm_action_memo_hits[action_name] += 1
+        else:
+            g.nhm_action_memo_misses[action_name] += 1
+            memo[key] = copy.deepcopy(action(context, data_dict))
+        return copy.deepcopy(memo[key])
+
+    return wrapper
+
+
+def get_memoized_action(action_name: str) -> Callable:
+    """
+    Returns the named action, wrapped with memoized.
+
+    :param action_name: the name of the action
+    :returns: the action function
+    """
+    return memoized(action_name, toolkit.get_action(action_name))
+
+
+def clear_memo():
+    """
+    Clears the memoized action results for the current request, if there is one. This
+    should be called whenever something is changed during a request.
+    """
+    if has_request_context() and hasattr(g, 'nhm_action_memo'):
+        g.nhm_action_memo.clear()
+
+
+def get_memo_stats() -> dict:
+    """
+    Returns the memo hit and miss counts for each action called during the current
+    request. The misses are the number of calls that were actually made.
+
+    :returns: a dict of action name -> {'hits': int, 'misses': int}
+    """
+    if not has_request_context() or not hasattr(g, 'nhm_action_memo'):
+        return {}
+    hits = g.nhm_action_memo_hits
+    misses = g.nhm_action_memo_misses
+    return {
+        action_name: {'hits': hits[action_name], 'misses': misses[action_name]}
+        for action_name in sorted(set(hits) | set(misses))
+    }
+
+
+def log_memo_stats(response):
+    """
+    Flask after_request handler which logs the memo stats for the request at debug
+    level.
+
+    :param response: the response
+    :returns: the response, unchanged
+    """
+    if log.isEnabledFor(logging.DEBUG):
+        stats = get_memo_stats()
+        if stats:
+            summary = ', '.join(
+                f'{name}={counts["misses"]}/{counts["hits"] + counts["misses"]}'
+                for name, counts in stats.items()
+            )
+            log.debug(f'Action calls made/requested: {summary}')
+    return response
@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from beaker.cache import Cache, cache_regions
+from cachetools import LRUCache
+from ckan.plugins import toolkit
+from redis.exceptions import RedisError
+
+log = logging.getLogger(__name__)
+
+# returned by TwoTierCache.get when the key isn't in the cache, this allows None to be
+# cached
+MISSING = object()
+
+# the prefix used for all the keys we put in redis
+REDIS_PREFIX = 'ckanext-nhm'
+
+
+class TwoTierCache:
+    """
+    A cache with an in-process LRU tier and an optional Redis tier which is shared
+    between all processes. Values are looked for in the local tier first and then in
+    the Redis tier. Values found in the Redis tier are copied into the local tier.
+
+    Values stored in the Redis tier must be JSON serialisable and keys must be strings.
+
+    The number of hits in each tier and the number of misses are counted so that the
+    cache's effectiveness can be monitored, see stats.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 1024,
+        ttl: Optional[int] = None,
+        use_redis: bool = False,
+        local_ttl: Optional[int] = None,
+    ):
+        """
+        :param name: the name of the cache, this is used to namespace the keys in Redis
+        :param maxsize: the maximum number of values to keep in the local tier
+        :param ttl: the default number of seconds to keep values for, None means keep
+            them until they are evicted
+        :param use_redis: whether to use the Redis tier or not
+        :param local_ttl: the maximum number of seconds to keep values in the local
+            tier, this allows changes made to the Redis tier by other processes to be
+            seen. None means the local tier uses the same ttl as the Redis tier
+        """
+        self.name = name
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.local_ttl = local_ttl
+        # values are stored in the local tier as (expiry, value) tuples
+        self._local = LRUCache(maxsize=maxsize)
+        self._lock = threading.RLock()
+        # locks for the keys currently being created by get_or_set, with the number of
+        # threads waiting on each
+        self._key_locks: Dict[str, List] = {}
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f'{REDIS_PREFIX}:{self.name}:{key}'
+
+    def _redis(self):
+        # imported here to avoid requiring the redis config when the tier isn't used
+        from ckan.lib.redis import connect_to_redis
+
+        return connect_to_redis()
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        """
+        Retrieve the value associated with the given key.
+
+        :param key: the key
+        :param default: the value to return if the key isn't in the cache, defaults to
+            the MISSING sentinel
+        :returns: the value or the default
+        """
+        value, tier = self._lookup(key)
+        # the counts are updated by all the threads using the cache
+        with self._lock:
+            if tier == 'local':
+                self.local_hits += 1
+            elif tier == 'redis':
+                self.redis_hits += 1
+            else:
+                self.misses += 1
+        return default if tier is None else value
+
+    def _lookup(self, key: str) -> Tuple[Any, Optional[str]]:
+        """
+        Looks for the key in each tier.
+
+        :param key: the key
+        :returns: a 2-tuple of the value (or MISSING) and the name of the tier it was
+            found in (or None)
+        """
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                expiry, value = entry
+                if expiry is None or expiry > time.time():
+                    return value, 'local'
+                del self._local[key]
+
+        if self.use_redis:
+            try:
+                redis_key = self._redis_key(key)
+                conn = self._redis()
+                raw = conn.get(redis_key)
+                if raw is not None:
+                    value = json.loads(raw)
+                    ttl = conn.ttl(redis_key)
+                    self._set_local(key, value, ttl if ttl and ttl > 0 else None)
+                    return value, 'redis'
+            except RedisError:
+                log.warning(f'Failed to read from the {self.name} redis cache')
+
+        return MISSING, None
+
+    def _set_local(self, key: str, value: Any, ttl: Optional[int]):
+        if self.local_ttl is not None:
+            ttl = self.local_ttl if ttl is None else min(ttl, self.local_ttl)
+        expiry = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._local[key] = (expiry, value)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """
+        Store the value under the given key.
+
+        :param key: the key
+        :param value: the value
+        :param ttl: the number of seconds to store the value for, defaults to the
+            cache's default ttl
+        """
+        ttl = self.ttl if ttl is None else ttl
+        self._set_local(key, value, ttl)
+        if self.use_redis:
+            try:
+                self._redis().set(self._redis_key(key), json.dumps(value), ex=ttl)
+            except RedisError:
+                log.warning(f'Failed to write to the {self.name} redis cache')
+
+    def delete(self, key: str):
+        """
+        Remove the given key from the cache.
+
+        :param key: the key
+        """
+        with self._lock:
+            self._local.pop(key, None)
+        if self.use_redis:
+            try:
+                self._redis().delete(self._redis_key(key))
+            except RedisError:
+                log.warning(f'Failed to delete from the {self.name} redis cache')
+
+    def clear(self):
+        """
+        Remove everything from the cache.
+        """
+        with self._lock:
+            self._local.clear()
+        if self.use_redis:
+            try:
+                conn = self._redis()
+                for redis_key in conn.scan_iter(match=self._redis_key('*')):
+                    conn.delete(redis_key)
+            except RedisError:
+                log.warning(f'Failed to clear the {self.name} redis cache')
+
+    def get_or_set(
+        self,
+        key: str,
+        factory: Callable[[], Any],
+        ttl: Optional[int] = None,
+        cache_none: bool = True,
+    ) -> Any:
+        """
+        Retrieve the value associated with the given key, or if it isn't in the cache,
+        create it using the factory, store it, and return it. If several threads miss
+        the same key at the same time, only one of them calls the factory and the others
+        wait for it and use its value.
+
+        :param key: the key
+        :param factory: a function which takes no arguments and returns the value
+        :param ttl: the number of seconds to store the value for if it is created,
+            defaults to the cache's default ttl
+        :param cache_none: whether to store the value if the factory returns None
+        :returns: the value
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                # another thread may have created the value while we were waiting
+                value, _tier = self._lookup(key)
+                if value is MISSING:
+                    value = factory()
+                    if value is not None or cache_none:
+                        self.set(key, value, ttl)
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if key_lock[1] == 0:
+                    del self._key_locks[key]
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit and miss counts for this cache in this process.
+
+        :returns: a dict of stats
+        """
+        with self._lock:
+            local_hits, redis_hits, misses = (
+                self.local_hits,
+                self.redis_hits,
+                self.misses,
+            )
+            size = len(self._local)
+        lookups = local_hits + redis_hits + misses
+        return {
+            'local_hits': local_hits,
+            'redis_hits': redis_hits,
+            'misses': misses,
+            'hit_rate': (local_hits + redis_hits) / lookups if lookups else 0,
+            'size': size,
+        }
+
+
+_caches: Dict[str, TwoTierCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(
+    name: str,
+    maxsize: int = 1024,
+    ttl: Optional[int] = None,
+    use_redis: bool = False,
+    local_ttl: Optional[int] = None,
+) -> TwoTierCache:
+    """
+    Returns the cache with the given name, creating it if necessary.
+
+    The defaults given here can be overridden in the config using these options:
+
+        - ckanext.nhm.<name>_cache.size: the maximum size of the local tier
+        - ckanext.nhm.<name>_cache.ttl: the default number of seconds to keep values
+        - ckanext.nhm.<name>_cache.redis: whether to use the shared Redis tier
+
+    :param name: the name of the cache
+    :param maxsize: the default maximum size of the local tier
+    :param ttl: the default number of seconds to keep values for
+    :param use_redis: whether to use the shared Redis tier by default
+    :param local_ttl: the maximum number of seconds to keep values in the local tier
+    :returns: a TwoTierCache object
+    """
+    with _caches_lock:
+        if name not in _caches:
+            prefix = f'ckanext.nhm.{name}_cache'
+            ttl = toolkit.config.get(f'{prefix}.ttl', ttl)
+            _caches[name] = TwoTierCache(
+                name,
+                maxsize=toolkit.asint(toolkit.config.get(f'{prefix}.size', maxsize)),
+                ttl=toolkit.asint(ttl) if ttl is not None else None,
+                use_redis=toolkit.asbool(
+                    toolkit.config.get(f'{prefix}.redis', use_redis)
+                ),
+                local_ttl=local_ttl,
+            )
+        return _caches[name]
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the hit and miss counts of all the caches created with get_cache in this
+    process.
+
+    :returns: a dict of cache name -> stats dict
+    """
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+# a list of (resource ID config option, beaker cached function, cache key) tuples
+# recording which cached functions depend on which resources
+_resource_dependents: List[Tuple[str, Callable, str]] = []
+
+
+def invalidated_by(*resource_id_options: str, key: str) -> Callable:
+    """
+    Decorator which records that the decorated beaker cache_region function's value
+    depends on the data in the resources whose IDs are set in the given config options.
+    This must be applied on top of the cache_region decorator and the function must not
+    take any arguments.
+
+    :param resource_id_options: the names of config options which hold resource IDs
+    :param key: the key the function's value is cached under, i.e. the arguments given
+        to the cache_region decorator after the region name, joined with spaces
+    :returns: a decorator which returns the function it is given unchanged
+    """
+
+    def decorator(function: Callable) -> Callable:
+        for option in resource_id_options:
+            _resource_dependents.append((option, function, key))
+        return function
+
+    return decorator
+
+
+def get_resource_dependents(
+    resource_ids: Iterable[str],
+) -> List[Tuple[Callable, str]]:
+    """
+    Returns the cached functions which depend on any of the given resources.
+
+    :param resource_ids: the resource IDs
+    :returns: a list of (cached function, cache key) pairs, without duplicates
+    """
+    resource_ids = set(resource_ids)
+    dependents = []
+    for option, function, key in _resource_dependents:
+        dependent = (function, key)
+        if toolkit.config.get(option) in resource_ids and dependent not in dependents:
+            dependents.append(dependent)
+    return dependents
+
+
+def refresh_resource_dependents(resource_ids: List[str]):
+    """
+    Recalculates the cached values that depend on the given resources and overwrites
+    the old values with them. This is meant to be run as a background job. Readers keep
+    getting the old value until the new one is stored, so no web request has to wait
+    for the new values.
+
+    :param resource_ids: the resource IDs
+    """
+    for function, key in get_resource_dependents(resource_ids):
+        region = cache_regions.get(function._arg_region, {})
+        if not region.get('enabled', True):
+            continue
+        try:
+            # call the undecorated function so that the cached value isn't used
+            value = function.__wrapped__()
+        except Exception:
+            log.exception(f'Failed to refresh the cached {function.__name__} value')
+            continue
+        # this is the same cache object (and so backend) the decorator uses
+        Cache(function._arg_namespace, **region).put(key, value)
+
+
+def invalidate_resource_dependents(resource_ids: Iterable[str]):
+    """
+    Queues a background job to recalculate the cached values that depend on the given
+    resources. The old values are served until the job has stored the new ones.
+
+    :param resource_ids: the resource IDs
+    """
+    resource_ids = sorted(set(resource_ids))
+    dependents = get_resource_dependents(resource_ids)
+    if not dependents:
+        return
+
+    log.info(
+        f'Refreshing {", ".join(f.__name__ for f, _key in dependents)} after an '
+        f'update to {", ".join(resource_ids)}'
+    )
+    try:
+        toolkit.enqueue_job(
+            refresh_resource_dependents,
+            [resource_ids],
+            title=f'Refresh cached values for {", ".join(resource_ids)}',
+        )
+    except Exception:
+        log.warning('Failed to queue the cache refresh job', exc_info=True)
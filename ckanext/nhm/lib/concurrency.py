@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, List, Optional
+
+from ckan import model
+from flask import copy_current_request_context, current_app, has_request_context
+
+
+def in_app_context(function: Callable) -> Callable:
+    """
+    Wraps the given function so that it can be run in another thread. If there is a
+    request context it is copied into the thread, otherwise the current app context is
+    pushed. CKAN actions need one or the other to work. The thread's database session
+    is removed once the function has finished so that connections aren't leaked.
+
+    :param function: the function to wrap
+    :returns: the wrapped function
+    """
+    if has_request_context():
+        function = copy_current_request_context(function)
+        app = None
+    else:
+        app = current_app._get_current_object()
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            if app is None:
+                return function(*args, **kwargs)
+            with app.app_context():
+                return function(*args, **kwargs)
+        finally:
+            model.Session.remove()
+
+    return wrapper
+
+
+def run_concurrently(
+    functions: List[Callable[[], Any]], max_workers: Optional[int] = None
+) -> List[Any]:
+    """
+    Runs the given functions concurrently in a thread pool and returns their results in
+    the same order as the functions were given. If any of the functions raises an
+    exception, it is raised from here once all the functions have finished.
+
+    :param functions: a list of functions which take no arguments
+    :param max_workers: the maximum number of threads to use, defaults to one per
+        function
+    :returns: a list of the results
+    """
+    if not functions:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(functions)) as executor:
+        futures = [executor.submit(in_app_context(function)) for function in functions]
+    return [future.result() for future in futures]
@@ -5,6 +5,7 @@
 # Created by the Natural History Museum in London, UK
 
 from collections import OrderedDict
+from types import MappingProxyType
 
 from importlib_resources import files
 from lxml import etree
@@ -17,6 +18,37 @@ with open(path, 'r') as xml_f:
     DWC_XSD = data.getroot()
 
 
+def _build_term_index(xsd):
+    """
+    Walks the groups and elements in the XSD and creates a lookup of each term name to
+    the group it belongs to and its URI, in the order the terms appear in the XSD. Some
+    terms appear in more than one group, in which case the first group is used.
+
+    :param xsd: the root of the parsed XSD
+    :returns: a 2-tuple of the read-only term name -> (group, URI) lookup and the
+        dynamicProperties URI
+    """
+    index = OrderedDict()
+    dynamic_properties_uri = None
+    for group in xsd.iterfind('xs:group', namespaces=xsd.nsmap):
+        group_name = group.get('name')
+        for element in group.iterfind('xs:sequence/xs:element', namespaces=xsd.nsmap):
+            ns, name = element.get('ref').split(':')
+            uri = f'{xsd.nsmap[ns]}{name}'
+            if name == 'dynamicProperties':
+                dynamic_properties_uri = uri
+            if name not in index:
+                index[name] = (group_name, uri)
+    return MappingProxyType(index), dynamic_properties_uri
+
+
+# compiled once at import so that we don't have to walk the XSD every time we need the
+# terms
+DWC_TERM_INDEX, DYNAMIC_PROPERTIES_URI = _build_term_index(DWC_XSD)
+# the position of each term in the XSD, used to keep the terms in XSD order
+_TERM_POSITIONS = MappingProxyType({name: i for i, name in enumerate(DWC_TERM_INDEX)})
+
+
 def dwc_terms(fields):
     """
     Get DwC terms and groups, parsed from tdwg_dwcterms. Even though we use simple DwC
@@ -27,38 +59,30 @@ def dwc_terms(fields):
     :returns: dict, keyed by groups
     """
     fields = list(fields)
-    dynamic_properties_uri = None
-    terms = OrderedDict()
-    for group in DWC_XSD.iterfind('xs:group', namespaces=DWC_XSD.nsmap):
-        for element in group.iterfind(
-            'xs:sequence/xs:element', namespaces=DWC_XSD.nsmap
-        ):
-            ns, name = element.get('ref').split(':')
-            uri = f'{DWC_XSD.nsmap[ns]}{name}'
-            if name == 'dynamicProperties':
-                # Keep a references to the dynamic properties uri, we
-                # will need this later on
-                dynamic_properties_uri = uri
-            if name in fields:
-                # We have a field for this group -
-                # so create the group if it doesn't exist
-                try:
-                    terms[group.get('name')]
-                except KeyError:
-                    terms[group.get('name')] = OrderedDict()
+    # find the fields which are DwC terms and put them in the order they appear in the
+    # XSD
+    matched = sorted(
+        DWC_TERM_INDEX.keys() & set(fields), key=_TERM_POSITIONS.__getitem__
+    )
 
-                terms[group.get('name')][uri] = name
-                # Remove field name from the fields list - those remaining will
-                # be dynamic properties
-                fields.remove(name)
+    terms = OrderedDict()
+    for name in matched:
+        group, uri = DWC_TERM_INDEX[name]
+        if group not in terms:
+            terms[group] = OrderedDict()
+        terms[group][uri] = name
 
     # Add created - not actually in DwC
     terms['RecordLevelTerms']['http://purl.org/dc/terms/created'] = 'created'
 
-    # dynamic properties are actually part of RecordLevelTerms, but we treat it slightly differently
+    # dynamic properties are actually part of RecordLevelTerms, but we treat it slightly
+    # differently
+    # - any fields which aren't DwC terms are dynamic properties
     # - filter out all hidden fields (starting with _)
     terms['dynamicProperties'] = {
-        dynamic_properties_uri: [f for f in fields if not f.startswith('_')]
+        DYNAMIC_PROPERTIES_URI: [
+            f for f in fields if f not in DWC_TERM_INDEX and not f.startswith('_')
+        ]
     }
 
     return terms
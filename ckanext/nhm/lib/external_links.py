@@ -4,17 +4,31 @@
 # This file is part of ckanext-nhm
 # Created by the Natural History Museum in London, UK
 import abc
+import logging
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import requests
 from cachetools import TTLCache, cached
+from ckan.plugins import toolkit
 
+from ckanext.nhm.lib.gbif import get_gbif_occurrence
+from ckanext.nhm.lib.http import get_client
 from ckanext.nhm.lib.taxonomy import extract_ranks
 
+log = logging.getLogger(__name__)
+
 Link = namedtuple('Link', ('text', 'url'))
 
+# the default number of seconds to wait for all the external sites' links on a page
+DEFAULT_DEADLINE = 3
+
+# the sites' links are resolved in this shared pool so that a slow site can carry on
+# in the background after the page's deadline has passed without holding up the page
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='external-links')
+
 
 @dataclass
 class Site(abc.ABC):
@@ -25,6 +39,10 @@ class Site(abc.ABC):
     name: str
     icon_url: str
 
+    # whether get_links makes any requests to other services, sites which don't are
+    # resolved straight away rather than in the thread pool
+    remote = False
+
     @abc.abstractmethod
     def get_links(self, record: dict) -> List[Link]:
         """
@@ -55,38 +73,17 @@ class RankedTemplateSite(Site):
         ]
 
 
-@cached(cache=TTLCache(maxsize=1024, ttl=300))
 def _get_gbif_record(occurrence_id: str, institution_code: str) -> Optional[dict]:
     """
     Given an occurrence ID and an institution code, returns the GBIF record for it, or
-    None if exactly one GBIF record couldn't be found. This function is protected with a
-    TTL cache to avoid hitting GBIF over and over again for the same occurrence ID
-    query.
+    None if exactly one GBIF record couldn't be found. The lookups are stored in the
+    shared GBIF occurrence store so that we don't hit GBIF over and over again for the
+    same occurrence ID query.
 
     :param occurrence_id: an occurrence ID
     :param institution_code: an institution code, this will probably be NHMUK really
     """
-    if occurrence_id is None or institution_code is None:
-        return None
-
-    try:
-        r = requests.get(
-            'https://api.gbif.org/v1/occurrence/search',
-            params={
-                'occurrenceID': occurrence_id,
-                'institutionCode': institution_code,
-            },
-            timeout=5,
-        )
-    except requests.Timeout:
-        return None
-
-    if r.ok:
-        results = r.json()
-        if results.get('count') == 1:
-            return results['results'][0]
-
-    return None
+    return get_gbif_occurrence(occurrence_id, institution_code)
 
 
 @cached(cache=TTLCache(maxsize=1024, ttl=300))
@@ -98,7 +95,7 @@ def _get_phenome10k_record(gbif_key: str) -> Optional[dict]:
 
     :param gbif_key: the gbif key of the record
     """
-    r = requests.get(
+    r = get_client('phenome10k').get(
         'https://www.phenome10k.org/api/v1/scan/search',
         params={'gbif_occurrence_id': gbif_key},
     )
@@ -116,6 +113,8 @@ class Phenome10kSite(Site):
     Phenome10k.
     """
 
+    remote = True
+
     def get_links(self, record: dict) -> List[Link]:
         links = []
         try:
@@ -139,6 +138,8 @@ class GBIFSite(Site):
     record.
     """
 
+    remote = True
+
     def get_links(self, record: dict) -> List[Link]:
         links = []
 
@@ -223,3 +224,62 @@ def get_sites(record: dict) -> List[Site]:
     }
     # if no collection code is available, default to None
     return searches.get(record.get('collectionCode', None), [])
+
+
+def get_deadline() -> float:
+    """
+    :returns: the number of seconds to wait for all the external links on a page
+    """
+    return float(
+        toolkit.config.get('ckanext.nhm.external_links.deadline', DEFAULT_DEADLINE)
+    )
+
+
+def _get_links(site: Site, record: dict) -> List[Link]:
+    try:
+        return site.get_links(record)
+    except Exception:
+        log.warning(f'Failed to get links from {site.name}', exc_info=True)
+        return []
+
+
+def resolve_links(
+    record: dict, deadline: Optional[float] = None
+) -> List[Tuple[Site, List[Link]]]:
+    """
+    Gets the links from all the sites relevant to the given record. The sites which
+    need to make requests to other services do so concurrently and any site which hasn't
+    finished by the deadline is left out, so a slow site never holds up the page for
+    longer than the deadline.
+
+    :param record: a record dict
+    :param deadline: the maximum number of seconds to wait, defaults to the configured
+        deadline
+    :returns: a list of (site, links) pairs, in the same order as the sites from
+        get_sites, only including the sites that returned links
+    """
+    if deadline is None:
+        deadline = get_deadline()
+
+    sites = get_sites(record)
+    # keyed on the site's index in the list as sites aren't hashable
+    futures = {
+        i: _executor.submit(_get_links, site, record)
+        for i, site in enumerate(sites)
+        if site.remote
+    }
+    if futures:
+        _done, not_done = wait(futures.values(), timeout=deadline)
+        for i, future in futures.items():
+            if future in not_done:
+                log.info(f'{sites[i].name} links were not ready within {deadline}s')
+
+    resolved = []
+    for i, site in enumerate(sites):
+        if i in futures:
+            links = futures[i].result() if futures[i].done() else []
+        else:
+            links = _get_links(site, record)
+        if links:
+            resolved.append((site, links))
+    return resolved
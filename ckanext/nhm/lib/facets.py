@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ckanext.nhm.lib.action_memo import get_memoized_action
+from ckanext.nhm.lib.cache import MISSING, get_cache
+from ckanext.nhm.lib.field_schema import round_version
+
+# the number of values shown for each facet by default and when "show more" is clicked
+DEFAULT_FACET_LIMIT = 10
+MAX_FACET_LIMIT = 50
+
+# the facets for a query at a version never change, so this only needs to be long
+# enough for Redis to get rid of queries that aren't being made anymore
+FACET_CACHE_TTL = 60 * 60 * 24
+
+
+def get_facet_cache():
+    """
+    Returns the cache the facets of resource searches are kept in. This is shared
+    between processes using Redis (if available).
+
+    :returns: a TwoTierCache
+    """
+    return get_cache('facets', maxsize=256, ttl=FACET_CACHE_TTL, use_redis=True)
+
+
+def get_facet_snapshot_store():
+    """
+    Returns the store the precomputed facet snapshots are kept in. The snapshots are
+    kept until they're replaced and the local copies are refreshed from Redis every few
+    minutes so that new snapshots are picked up by all processes.
+
+    :returns: a TwoTierCache
+    """
+    return get_cache('facet_snapshots', maxsize=16, use_redis=True, local_ttl=300)
+
+
+class FacetQuery:
+    """
+    A facet search on a resource. The query and filters are normalised so that
+    equivalent searches (e.g. with the filters in a different order) share a cache
+    entry.
+    """
+
+    def __init__(
+        self,
+        resource_id: str,
+        fields: Iterable[str],
+        q: Optional[str] = None,
+        filters: Optional[Dict[str, List[str]]] = None,
+    ):
+        """
+        :param resource_id: the resource ID
+        :param fields: the fields to get the facets of
+        :param q: the free text query, if there is one
+        :param filters: the filters as a dict of field names to lists of values, this
+            can include the __version__ filter
+        """
+        self.resource_id = resource_id
+        self.fields = tuple(fields)
+        self.q = (q or '').strip() or None
+        self.filters = {
+            field: sorted(set(values))
+            for field, values in (filters or {}).items()
+            if field != '__version__' and values
+        }
+        version = (filters or {}).get('__version__')
+        self.requested_version = int(version[0]) if version else None
+
+    @property
+    def is_unfiltered(self) -> bool:
+        """
+        :returns: True if this query has no search term or filters, i.e. it's for the
+            facets of the whole resource
+        """
+        return self.q is None and not self.filters
+
+    def get_key(self, version: int) -> str:
+        """
+        Returns the cache key for this query at the given rounded version.
+
+        :param version: the rounded version
+        :returns: the key
+        """
+        query = json.dumps(
+            {'q': self.q, 'filters': self.filters, 'fields': self.fields},
+            sort_keys=True,
+        )
+        query_hash = hashlib.sha1(query.encode('utf-8')).hexdigest()
+        return f'{self.resource_id}:{version}:{query_hash}'
+
+    def run(self, version: Optional[int], context: Optional[dict] = None) -> dict:
+        """
+        Runs the search, getting the top MAX_FACET_LIMIT values of each field.
+
+        :param version: the version to search at
+        :param context: the context to run the search with
+        :returns: a dict of field names to dicts containing the values, as a list of
+            [value, count] pairs in descending count order, and the number of documents
+            which have other values (sum_other_doc_count)
+        """
+        search_params = {
+            'resource_id': self.resource_id,
+            # use limit 0 as we're not interested in getting any results, just the
+            # facets
+            'limit': 0,
+            'facets': list(self.fields),
+            'facet_limits': {field: MAX_FACET_LIMIT for field in self.fields},
+            'q': self.q,
+            'filters': self.filters,
+        }
+        if version is not None:
+            search_params['version'] = version
+        action = get_memoized_action('vds_basic_query')
+        search = action(context or {}, search_params)
+
+        facets = {}
+        for field in self.fields:
+            facet = search['facets'][field]
+            facets[field] = {
+                # lists rather than tuples so that the value is the same when it's come
+                # from Redis
+                'values': sorted(
+                    ([value, count] for value, count in facet['values'].items()),
+                    key=lambda value_count: value_count[1],
+                    reverse=True,
+                ),
+                'sum_other_doc_count': facet['details']['sum_other_doc_count'],
+            }
+        return facets
+
+    def _get_snapshot(self) -> Optional[dict]:
+        """
+        Returns the precomputed facets for this query if there are some. Only the
+        unfiltered facets of the latest version are precomputed, see precompute_facets.
+        If there's been an ingest since the snapshot was taken it isn't used, so that
+        the facets match the records until precompute_facets is run again.
+
+        :returns: the facets (see run) or None
+        """
+        if not self.is_unfiltered or self.requested_version is not None:
+            return None
+        snapshot = get_facet_snapshot_store().get(self.resource_id, None)
+        if (
+            snapshot is None
+            or snapshot['fields'] != list(self.fields)
+            or snapshot['version'] != round_version(self.resource_id)
+        ):
+            return None
+        return snapshot['facets']
+
+    def _get_version_and_key(self) -> Tuple[Optional[int], Optional[str]]:
+        version = round_version(self.resource_id, self.requested_version)
+        if version is None:
+            # there's no data yet, so there's no version to key the cache on
+            return None, None
+        return version, self.get_key(version)
+
+    def get(self, context: Optional[dict] = None) -> dict:
+        """
+        Returns the facets for this query, from the cache if possible.
+
+        :param context: the context to run the search with if it isn't cached
+        :returns: the facets, see run
+        """
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            return snapshot
+        version, key = self._get_version_and_key()
+        if key is None:
+            return self.run(self.requested_version, context)
+        return get_facet_cache().get_or_set(key, lambda: self.run(version, context))
+
+    def get_cached(self) -> Optional[dict]:
+        """
+        Returns the facets for this query if they're in the cache.
+
+        :returns: the facets (see run) or None if they aren't cached
+        """
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            return snapshot
+        _version, key = self._get_version_and_key()
+        if key is None:
+            return None
+        facets = get_facet_cache().get(key)
+        return None if facets is MISSING else facets
+
+
+def precompute_facets(
+    resource_id: str, fields: Iterable[str], force: bool = False
+) -> Optional[int]:
+    """
+    Gets the unfiltered facets of the latest version of the given resource and stores
+    them as the resource's facet snapshot. The snapshot is used for all unfiltered
+    facet searches on the resource until it is replaced, so this should be run after
+    each ingest.
+
+    :param resource_id: the resource ID
+    :param fields: the fields to get the facets of
+    :param force: recompute the facets even if the snapshot is already of the latest
+        version (default: False)
+    :returns: the version the facets were computed at, or None if the snapshot was
+        already up to date
+    """
+    query = FacetQuery(resource_id, fields)
+    version = round_version(resource_id)
+    store = get_facet_snapshot_store()
+    snapshot = store.get(resource_id, None)
+    if (
+        not force
+        and snapshot is not None
+        and snapshot['version'] == version
+        and snapshot['fields'] == list(query.fields)
+    ):
+        return None
+    facets = query.run(version, {'ignore_auth': True})
+    store.set(
+        resource_id,
+        {'version': version, 'fields': list(query.fields), 'facets': facets},
+    )
+    return version
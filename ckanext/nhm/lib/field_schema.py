@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import logging
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from ckan.plugins import toolkit
+
+from ckanext.nhm.lib.action_memo import get_memoized_action
+from ckanext.nhm.lib.cache import get_cache
+
+log = logging.getLogger(__name__)
+
+# the fields at a version never change, so this only needs to be long enough for Redis
+# to get rid of the schemas of old versions that aren't being looked at anymore
+FIELD_SCHEMA_TTL = 60 * 60 * 24 * 7
+
+
+class Field(NamedTuple):
+    """
+    A field in a resource and its type.
+    """
+
+    name: str
+    type: str
+
+
+def get_field_schema_cache():
+    """
+    Returns the cache the field schemas of resources at each rounded version are kept
+    in. This is shared between processes using Redis (if available).
+
+    :returns: a TwoTierCache
+    """
+    return get_cache('field_schema', maxsize=512, ttl=FIELD_SCHEMA_TTL, use_redis=True)
+
+
+def round_version(resource_id: str, version: Optional[int] = None) -> Optional[int]:
+    """
+    Rounds the given version down to the version of the resource's data it refers to.
+    If no version is given, the latest version of the resource is returned.
+
+    :param resource_id: the resource ID
+    :param version: the version, or None for the latest version
+    :returns: the rounded version, or None if the resource has no data
+    """
+    data_dict = {'resource_id': resource_id}
+    if version is not None:
+        data_dict['version'] = version
+    return get_memoized_action('vds_version_round')({}, data_dict)
+
+
+def _load_field_schema(resource_id: str, version: Optional[int]) -> List[List[str]]:
+    data_dict = {'resource_id': resource_id, 'limit': 0}
+    if version is not None:
+        data_dict['version'] = version
+    result = get_memoized_action('vds_basic_query')({}, data_dict)
+    # lists rather than tuples so that the value is the same when it's come from Redis
+    return [[field['id'], field['type']] for field in result.get('fields', [])]
+
+
+def get_field_schema(
+    resource_id: str, version: Optional[int] = None
+) -> Tuple[Field, ...]:
+    """
+    Returns the fields of the given resource at the given version, in the order they
+    were ingested, along with their types. The fields only change when a new version is
+    ingested so they are cached using the rounded version.
+
+    :param resource_id: the resource ID
+    :param version: the version, or None for the latest version
+    :returns: a tuple of Field objects
+    """
+    rounded_version = round_version(resource_id, version)
+    if rounded_version is None:
+        # there's no data yet, so there's no version to key the cache on
+        fields = _load_field_schema(resource_id, version)
+    else:
+        fields = get_field_schema_cache().get_or_set(
+            f'{resource_id}:{rounded_version}',
+            lambda: _load_field_schema(resource_id, rounded_version),
+        )
+    return tuple(Field(*field) for field in fields)
+
+
+def get_field_names(resource_id: str, version: Optional[int] = None) -> List[str]:
+    """
+    Returns the names of the fields of the given resource at the given version, in the
+    order they were ingested.
+
+    :param resource_id: the resource ID
+    :param version: the version, or None for the latest version
+    :returns: a list of field names
+    """
+    return [field.name for field in get_field_schema(resource_id, version)]
+
+
+def warm_field_schemas(resource_ids: List[str]):
+    """
+    Loads the latest field schemas of the given resources into the cache. This is run as
+    a background job after resources are updated so that the first request after an
+    ingest doesn't have to wait for the fields.
+
+    :param resource_ids: the resource IDs
+    """
+    for resource_id in resource_ids:
+        try:
+            get_field_schema(resource_id)
+        except Exception:
+            log.warning(f'Failed to load the fields of {resource_id}', exc_info=True)
+
+
+def queue_field_schema_warming(resource_ids: Iterable[str]):
+    """
+    Queues a background job to warm the field schema cache for the given resources.
+
+    :param resource_ids: the resource IDs
+    """
+    resource_ids = sorted(set(resource_ids))
+    if not resource_ids:
+        return
+    try:
+        toolkit.enqueue_job(
+            warm_field_schemas,
+            [resource_ids],
+            title=f'Load the fields of {", ".join(resource_ids)}',
+        )
+    except Exception:
+        log.warning('Failed to queue the field schema job', exc_info=True)
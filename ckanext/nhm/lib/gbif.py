@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from ckan.plugins import toolkit
+
+from ckanext.nhm.lib.cache import MISSING, get_cache
+from ckanext.nhm.lib.http import get_client
+
+log = logging.getLogger(__name__)
+
+GBIF_OCCURRENCE_SEARCH_URL = 'https://api.gbif.org/v1/occurrence/search'
+# the maximum number of results GBIF will return in one page
+GBIF_PAGE_SIZE = 300
+
+# the fields we keep from each GBIF occurrence record
+GBIF_OCCURRENCE_FIELDS = ('key', 'catalogNumber', 'scientificName', 'acceptedTaxonKey')
+
+# found occurrences are kept for 30 days by default, occurrences which couldn't be found
+# for 1 day
+DEFAULT_TTL = 30 * 24 * 60 * 60
+DEFAULT_NEGATIVE_TTL = 24 * 60 * 60
+
+
+def get_occurrence_store():
+    """
+    Returns the cache used to store the GBIF occurrence records found for each
+    occurrence ID. This uses Redis by default so that the lookups are shared between
+    processes and survive restarts.
+
+    :returns: a TwoTierCache
+    """
+    return get_cache('gbif_occurrence', maxsize=4096, ttl=DEFAULT_TTL, use_redis=True)
+
+
+def get_negative_ttl() -> int:
+    """
+    :returns: the number of seconds to remember that an occurrence couldn't be found for
+    """
+    return toolkit.asint(
+        toolkit.config.get(
+            'ckanext.nhm.gbif_occurrence_cache.negative_ttl', DEFAULT_NEGATIVE_TTL
+        )
+    )
+
+
+def _store_key(occurrence_id: str, institution_code: str) -> str:
+    return f'{institution_code}:{occurrence_id}'
+
+
+def _slim(occurrence: dict) -> dict:
+    """
+    Removes all but the fields we use from the given GBIF occurrence record.
+    """
+    return {
+        field: occurrence[field]
+        for field in GBIF_OCCURRENCE_FIELDS
+        if field in occurrence
+    }
+
+
+def _store(occurrence_id: str, institution_code: str, occurrence: Optional[dict]):
+    """
+    Stores the occurrence (or None, if it couldn't be found) for the occurrence ID.
+    """
+    ttl = None if occurrence is not None else get_negative_ttl()
+    get_occurrence_store().set(
+        _store_key(occurrence_id, institution_code), occurrence, ttl=ttl
+    )
+
+
+def fetch_gbif_occurrences(
+    occurrence_ids: List[str], institution_code: str, timeout: Optional[float] = None
+) -> Dict[str, Optional[dict]]:
+    """
+    Searches GBIF for the occurrence records with the given occurrence IDs, paging
+    through the results until GBIF says there are no more. An occurrence ID which
+    matches exactly one GBIF record maps to that record and one which matches none or
+    several maps to None. If GBIF stops returning results before the end of the records,
+    the occurrence IDs without any matches so far are left out of the returned dict as
+    we can't tell whether they exist. If a request fails, the exception is raised.
+
+    :param occurrence_ids: the occurrence IDs
+    :param institution_code: an institution code, this will probably be NHMUK really
+    :param timeout: the request timeout in seconds, defaults to the client's timeout
+    :returns: a dict of occurrence ID -> GBIF record (with only the fields we use) or
+        None
+    """
+    results = {occurrence_id: [] for occurrence_id in occurrence_ids}
+    kwargs = {'timeout': timeout} if timeout is not None else {}
+    client = get_client('gbif_occurrence')
+    offset = 0
+    while True:
+        r = client.get(
+            GBIF_OCCURRENCE_SEARCH_URL,
+            params={
+                # repeated parameters are ORed together by GBIF
+                'occurrenceID': occurrence_ids,
+                'institutionCode': institution_code,
+                'limit': GBIF_PAGE_SIZE,
+                'offset': offset,
+            },
+            **kwargs,
+        )
+        r.raise_for_status()
+        page = r.json()
+        occurrences = page.get('results', [])
+        for occurrence in occurrences:
+            if occurrence.get('occurrenceID') in results:
+                results[occurrence['occurrenceID']].append(occurrence)
+        complete = page.get('endOfRecords', True)
+        if complete or not occurrences:
+            break
+        offset += len(occurrences)
+    return {
+        occurrence_id: _slim(matches[0]) if len(matches) == 1 else None
+        for occurrence_id, matches in results.items()
+        if matches or complete
+    }
+
+
+def get_gbif_occurrence(occurrence_id: str, institution_code: str) -> Optional[dict]:
+    """
+    Given an occurrence ID and an institution code, returns the GBIF record for it, or
+    None if exactly one GBIF record couldn't be found. Results are stored in the shared
+    occurrence store, including when no record is found, so GBIF is only asked once for
+    each occurrence ID. If the request to GBIF fails, None is returned and nothing is
+    stored.
+
+    :param occurrence_id: an occurrence ID
+    :param institution_code: an institution code, this will probably be NHMUK really
+    :returns: the GBIF record (with only the fields we use) or None
+    """
+    if occurrence_id is None or institution_code is None:
+        return None
+
+    stored = get_occurrence_store().get(_store_key(occurrence_id, institution_code))
+    if stored is not MISSING:
+        return stored
+
+    try:
+        occurrences = fetch_gbif_occurrences([occurrence_id], institution_code)
+    except requests.RequestException:
+        return None
+    if occurrence_id not in occurrences:
+        # we couldn't tell whether it exists, so don't store anything
+        return None
+    occurrence = occurrences[occurrence_id]
+
+    _store(occurrence_id, institution_code, occurrence)
+    return occurrence
+
+
+def backfill_gbif_occurrences(
+    records: Iterable[dict],
+    batch_size: int = 100,
+    interval: float = 1.0,
+    overwrite: bool = False,
+) -> Dict[str, int]:
+    """
+    Looks up the GBIF records for the given records in batches and stores them in the
+    occurrence store. At most one request is made to GBIF every interval seconds.
+    Batches which fail are logged and skipped.
+
+    :param records: the record dicts, each should have an occurrenceID and optionally an
+        institutionCode (defaults to NHMUK)
+    :param batch_size: the number of occurrence IDs to look up in each request
+    :param interval: the minimum number of seconds between requests
+    :param overwrite: whether to look up occurrence IDs which are already stored
+    :returns: a dict of counts of the records found, not found, skipped and failed
+    """
+    store = get_occurrence_store()
+    counts = {'found': 0, 'not_found': 0, 'skipped': 0, 'failed': 0}
+    batches: Dict[str, List[str]] = {}
+    last_request = 0.0
+
+    def flush(institution_code: str):
+        nonlocal last_request
+        occurrence_ids = batches.pop(institution_code)
+        wait = last_request + interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        last_request = time.monotonic()
+        try:
+            occurrences = fetch_gbif_occurrences(occurrence_ids, institution_code)
+        except requests.RequestException:
+            log.warning(
+                f'Failed to look up a batch of {len(occurrence_ids)} occurrences',
+                exc_info=True,
+            )
+            counts['failed'] += len(occurrence_ids)
+            return
+        for occurrence_id in occurrence_ids:
+            if occurrence_id not in occurrences:
+                # GBIF didn't return all the results, so this one is unknown
+                counts['failed'] += 1
+                continue
+            occurrence = occurrences[occurrence_id]
+            _store(occurrence_id, institution_code, occurrence)
+            counts['found' if occurrence is not None else 'not_found'] += 1
+
+    for record in records:
+        occurrence_id = record.get('occurrenceID')
+        institution_code = record.get('institutionCode', 'NHMUK')
+        if not occurrence_id or not institution_code:
+            counts['skipped'] += 1
+            continue
+        if (
+            not overwrite
+            and store.get(_store_key(occurrence_id, institution_code)) is not MISSING
+        ):
+            counts['skipped'] += 1
+            continue
+        batch = batches.setdefault(institution_code, [])
+        if occurrence_id not in batch:
+            batch.append(occurrence_id)
+        if len(batch) >= batch_size:
+            flush(institution_code)
+
+    for institution_code in list(batches):
+        flush(institution_code)
+
+    return counts
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import copy
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Tuple
+
+# useful DwC fields which are shown after the _id, gbifIssue and scientific name columns
+# (if they're present) and before all the other columns
+PRIORITY_COLUMNS = (
+    'typeStatus',
+    'type',
+    'phylum',
+    'class',
+    'order',
+    'family',
+    'genus',
+    'specificEpithet',
+    'infraspecificEpithet',
+    'locality',
+    'country',
+    'recordedBy',
+    'catalogNumber',
+    'associatedMedia',
+    'preservative',
+    'collectionCode',
+    'year',
+    'month',
+    'day',
+)
+
+# there is an annoying feature/bug in slickgrid that if fitColumns=True and grid is
+# wider than available viewport, slickgrid columns cannot be resized until fitColumns is
+# deactivated. So to fix, we're going to work out how many columns are in the dataset to
+# decide whether or not to turn on fitColumns. Messy, but better than trying to hack
+# around with slickgrid
+VIEWPORT_MAX_WIDTH = 920
+COLUMN_WIDTH = 100
+
+
+class GridColumns(NamedTuple):
+    """
+    The order of the grid's columns, the columns to hide and whether the columns fit in
+    the viewport.
+    """
+
+    order: Tuple[str, ...]
+    hidden: Tuple[str, ...]
+    fit: bool
+
+
+@lru_cache(maxsize=256)
+def get_grid_columns(
+    fields: Tuple[str, ...], latest_fields: Tuple[str, ...]
+) -> GridColumns:
+    """
+    Works out the order the columns should be shown in the grid and which columns should
+    be hidden. The result only depends on the fields so it is cached, this means each
+    (resource, version) pair is only worked out once.
+
+    The hidden columns solve a specific problem whereby if a user is viewing an old
+    version of the data and in newer versions of the data new columns have been added,
+    the user will see these new columns in the slick grid header row (no data will be
+    shown for them because the column doesn't exist in the old records). This happens
+    because slick requests the column headers without the version so they come from the
+    latest version. If we stop using slick or slick is fixed we can stop doing this.
+
+    :param fields: the fields at the version being viewed, in order
+    :param latest_fields: the fields at the latest version
+    :returns: a GridColumns object
+    """
+    field_set = set(fields)
+
+    # ID and DQI always first
+    order = ['_id']
+    if 'gbifIssue' in field_set:
+        order.append('gbifIssue')
+    # add other useful DwC fields
+    if 'currentScientificName' in field_set:
+        # prefer current scientific name
+        order.append('currentScientificName')
+    elif 'scientificName' in field_set:
+        order.append('scientificName')
+    order.extend(field for field in PRIORITY_COLUMNS if field in field_set)
+    # add the rest of the columns, dict.fromkeys removes the duplicates while keeping
+    # the order
+    order = tuple(dict.fromkeys([*order, *fields]))
+
+    hidden = tuple(field for field in latest_fields if field not in field_set)
+    fit = len(fields) * COLUMN_WIDTH < VIEWPORT_MAX_WIDTH
+    return GridColumns(order, hidden, fit)
+
+
+def build_grid_state(view, fields: Iterable[str], latest_fields: Iterable[str]) -> dict:
+    """
+    Creates the slickgrid state for the given view and fields. The view's state is
+    copied rather than modified so that nothing is shared between requests.
+
+    :param view: the view object for the resource
+    :param fields: the fields at the version being viewed, in order
+    :param latest_fields: the fields at the latest version
+    :returns: the state dict
+    """
+    columns = get_grid_columns(tuple(fields), tuple(latest_fields))
+    state = copy.deepcopy(view.get_slickgrid_state())
+    state['fitColumns'] = columns.fit
+    state['columnsOrder'] = list(columns.order)
+    state['hiddenColumns'] = list(columns.hidden)
+    state.setdefault('columnsWidth', []).extend(
+        {'column': column, 'width': width}
+        for column, width in view.grid_column_widths.items()
+    )
+    return state
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import logging
+import os
+import sqlite3
+import threading
+import uuid as uuid_lib
+from typing import Iterable, NamedTuple, Optional
+
+from ckan.plugins import toolkit
+
+log = logging.getLogger(__name__)
+
+SCHEMA = (
+    # resource IDs are stored once and referenced by number to keep the index small
+    'CREATE TABLE IF NOT EXISTS resources ('
+    ' id INTEGER PRIMARY KEY,'
+    ' resource_id TEXT NOT NULL UNIQUE'
+    ')',
+    # GUIDs are stored as their 16 byte binary form
+    'CREATE TABLE IF NOT EXISTS guids ('
+    ' guid BLOB PRIMARY KEY,'
+    ' resource INTEGER NOT NULL REFERENCES resources (id),'
+    ' record_id INTEGER NOT NULL,'
+    ' first_version INTEGER NOT NULL,'
+    ' last_version INTEGER NOT NULL'
+    ') WITHOUT ROWID',
+)
+
+UPSERT = (
+    'INSERT INTO guids (guid, resource, record_id, first_version, last_version) '
+    'VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (guid) DO UPDATE SET '
+    ' resource = excluded.resource,'
+    ' record_id = excluded.record_id,'
+    ' first_version = min(first_version, excluded.first_version),'
+    ' last_version = max(last_version, excluded.last_version)'
+)
+
+LOOKUP = (
+    'SELECT resources.resource_id, guids.record_id, guids.first_version, '
+    'guids.last_version FROM guids JOIN resources ON resources.id = guids.resource '
+    'WHERE guids.guid = ?'
+)
+
+# each thread gets its own read only connection
+_local = threading.local()
+
+
+class GUIDLocation(NamedTuple):
+    """
+    Where a GUID can be found.
+    """
+
+    resource_id: str
+    record_id: int
+    # the first and last versions of the resource the GUID was indexed at
+    first_version: int
+    last_version: int
+
+    def contains(self, version: Optional[int]) -> bool:
+        """
+        Returns True if the record is known to exist at the given version. None means
+        the latest version, which the index can't know about (the resource may have been
+        updated since it was indexed) so this always returns False for None. To check
+        the latest version, pass the resource's current version instead.
+
+        :param version: the version, or None
+        :returns: True if the record exists at the version, False if it isn't known
+        """
+        if version is None:
+            return False
+        return self.first_version <= version <= self.last_version
+
+
+def get_guid_index_path() -> Optional[str]:
+    """
+    Returns the path of the GUID index database. This can be set using the
+    ckanext.nhm.guid_index.path config option and defaults to a file in the CKAN
+    storage path. If neither are set, None is returned.
+
+    :returns: the path or None
+    """
+    path = toolkit.config.get('ckanext.nhm.guid_index.path')
+    if path:
+        return path
+    storage_path = toolkit.config.get('ckan.storage_path')
+    if storage_path:
+        return os.path.join(storage_path, 'nhm', 'guid_index.sqlite')
+    return None
+
+
+def _to_bytes(guid: str) -> Optional[bytes]:
+    try:
+        return uuid_lib.UUID(guid).bytes
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def _get_connection(path: str) -> Optional[sqlite3.Connection]:
+    """
+    Returns this thread's read only connection to the index at the given path, opening
+    it if necessary.
+
+    :param path: the path of the index
+    :returns: a connection or None if the index doesn't exist
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    if path not in connections:
+        if not os.path.exists(path):
+            return None
+        connections[path] = sqlite3.connect(
+            f'file:{path}?mode=ro', uri=True, check_same_thread=False
+        )
+    return connections[path]
+
+
+def lookup_guid(guid: str) -> Optional[GUIDLocation]:
+    """
+    Finds the given GUID in the index.
+
+    :param guid: the GUID (i.e. the occurrenceID of the record)
+    :returns: a GUIDLocation or None if the GUID isn't in the index (or there isn't an
+        index)
+    """
+    path = get_guid_index_path()
+    guid_bytes = _to_bytes(guid)
+    if path is None or guid_bytes is None:
+        return None
+    try:
+        connection = _get_connection(path)
+        if connection is None:
+            return None
+        row = connection.execute(LOOKUP, (guid_bytes,)).fetchone()
+    except sqlite3.Error:
+        log.warning(f'Failed to look up {guid} in the GUID index', exc_info=True)
+        return None
+    return GUIDLocation(*row) if row else None
+
+
+def update_guid_index(
+    resource_id: str,
+    version: int,
+    records: Iterable[dict],
+    path: Optional[str] = None,
+    batch_size: int = 10000,
+) -> int:
+    """
+    Adds the given records, which must all be from the given resource at the given
+    version, to the GUID index. GUIDs already in the index are updated in place so that
+    the index can be updated after each ingest without being rebuilt.
+
+    :param resource_id: the resource ID
+    :param version: the version of the resource the records are from
+    :param records: the records' data dicts, these must include _id and occurrenceID
+    :param path: the path of the index, defaults to get_guid_index_path()
+    :param batch_size: the number of records to write in each transaction
+    :returns: the number of records written to the index
+    """
+    path = path or get_guid_index_path()
+    if path is None:
+        raise Exception('No GUID index path is configured')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    count = 0
+    connection = sqlite3.connect(path)
+    try:
+        # write ahead logging lets the web processes keep reading the index while it's
+        # being updated, this is stored in the file so only needs setting once
+        connection.execute('PRAGMA journal_mode=WAL')
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.execute(
+                'INSERT OR IGNORE INTO resources (resource_id) VALUES (?)',
+                (resource_id,),
+            )
+        (resource,) = connection.execute(
+            'SELECT id FROM resources WHERE resource_id = ?', (resource_id,)
+        ).fetchone()
+
+        rows = []
+        for data in records:
+            guid_bytes = _to_bytes(data.get('occurrenceID'))
+            if guid_bytes is None:
+                continue
+            rows.append((guid_bytes, resource, int(data['_id']), version, version))
+            if len(rows) >= batch_size:
+                with connection:
+                    connection.executemany(UPSERT, rows)
+                count += len(rows)
+                rows = []
+        if rows:
+            with connection:
+                connection.executemany(UPSERT, rows)
+            count += len(rows)
+    finally:
+        connection.close()
+    return count
@@ -7,13 +7,13 @@
 import itertools
 import json
 import logging
-import operator
 import re
 import time
-from collections import OrderedDict, defaultdict
+from collections import defaultdict
 from datetime import datetime
+from functools import partial
 from operator import itemgetter
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import quote
 
 from beaker.cache import cache_region
@@ -26,9 +26,13 @@ from lxml import etree, html
 from werkzeug.routing import BuildError
 
 from ckanext.gbif.lib.errors import GBIF_ERRORS
-from ckanext.nhm.lib import external_links
-from ckanext.nhm.lib.external_links import Site
+from ckanext.nhm.lib import action_memo, external_links, statistics
+from ckanext.nhm.lib.cache import get_cache, invalidated_by
+from ckanext.nhm.lib.external_links import Link, Site
+from ckanext.nhm.lib.facets import DEFAULT_FACET_LIMIT, MAX_FACET_LIMIT, FacetQuery
+from ckanext.nhm.lib.field_schema import get_field_names, get_field_schema
 from ckanext.nhm.lib.form import list_to_form_options
+from ckanext.nhm.lib.grid_state import build_grid_state
 from ckanext.nhm.lib.resource_view import (
     resource_view_get_filter_options,
     resource_view_get_view,
@@ -40,6 +44,9 @@ log = logging.getLogger(__name__)
 
 re_dwc_field_label = re.compile('([A-Z]+)')
 
+# matches the $tokens in resource group names that are filled in from linked specimens
+re_group_token = re.compile(r'\$[a-zA-Z]+')
+
 re_url_validation = re.compile(
     r'^(?:http)s?://'  # http:// or https://
     r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:['
@@ -52,6 +59,13 @@ re_url_validation = re.compile(
 
 AUTHOR_MAX_LENGTH = 100
 
+# the config options which hold the IDs of the collection resources
+COLLECTION_RESOURCE_ID_OPTIONS = (
+    'ckanext.nhm.specimen_resource_id',
+    'ckanext.nhm.indexlot_resource_id',
+    'ckanext.nhm.artefact_resource_id',
+)
+
 
 def get_site_statistics():
     """
@@ -80,6 +94,7 @@ def get_dataset_count():
     return toolkit.get_action('package_search')({}, {'rows': 1})['count']
 
 
+@invalidated_by(*COLLECTION_RESOURCE_ID_OPTIONS, key='record_count')
 @cache_region('collection_stats', 'record_count')
 def get_record_count():
     """
@@ -103,21 +118,7 @@ def get_record_stats() -> List[dict]:
 
     :returns: a list of dicts
     """
-    # 01/08/2017 as ms epoch
-    start_version = 1501545600000
-    # now as ms epoch
-    end_version = int(time.time() * 1000)
-    # 1 week in ms
-    step = 604800000
-    count_action = toolkit.get_action('vds_multi_count')
-
-    return [
-        {
-            'date': datetime.fromtimestamp(version / 1000),
-            'count': count_action({}, {'version': version})['total'],
-        }
-        for version in range(start_version, end_version, step)
-    ]
+    return statistics.get_record_history()
 
 
 def _get_action(action, params):
@@ -234,7 +235,9 @@ def url_for_resource_view(resource_id, view_type=None, filters={}):
     """
 
     try:
-        views = toolkit.get_action('resource_view_list')({}, {'id': resource_id})
+        views = action_memo.get_memoized_action('resource_view_list')(
+            {}, {'id': resource_id}
+        )
     except toolkit.ObjectNotFound:
         return None
     else:
@@ -259,6 +262,7 @@ def url_for_resource_view(resource_id, view_type=None, filters={}):
         )
 
 
+@invalidated_by('ckanext.nhm.indexlot_resource_id', key='collection_stats')
 @cache_region('collection_stats', 'collection_stats')
 def indexlot_count():
     """
@@ -340,57 +344,18 @@ def get_beetle_iiif_resource_id():
     return str(value) if value is not None else None
 
 
+@invalidated_by(*COLLECTION_RESOURCE_ID_OPTIONS, key='collection_stats')
 @cache_region('collection_stats', 'collection_stats')
 def collection_stats():
     """
     Get collection stats, including collection codes and collection totals.
     """
-    stats = {}
     collections = [
         ('artefacts', get_artefact_resource_id()),
         ('indexlots', get_indexlot_resource_id()),
         ('specimens', get_specimen_resource_id()),
     ]
-
-    collections_total = 0
-    for name, resource_id in collections:
-        # we use the same params for both the vds_resource_check and the vds_basic_count
-        # and the limit param is just ignored by vds_resource_check
-        params = {'resource_id': resource_id, 'limit': 0}
-        # check if the resource is a valid datastore resource first otherwise the call
-        # to vds_basic_count could error out
-        if toolkit.get_action('vds_resource_check')({}, params):
-            stats[name] = toolkit.get_action('vds_basic_count')({}, params)
-        else:
-            stats[name] = 0
-        collections_total += stats[name]
-    stats['total'] = collections_total
-
-    collection_code_counts = []
-    for collection_code in ('PAL', 'MIN', 'BMNH(E)', 'ZOO', 'BOT'):
-        params = {
-            'resource_ids': [get_specimen_resource_id()],
-            'limit': 0,
-            'query': {
-                'filters': {
-                    'and': [
-                        {
-                            'string_equals': {
-                                'fields': ['collectionCode'],
-                                'value': collection_code,
-                            }
-                        }
-                    ]
-                }
-            },
-        }
-        total = toolkit.get_action('vds_multi_count')({}, params)['total']
-        collection_code_counts.append((collection_code, total))
-
-    collection_code_counts.sort(key=operator.itemgetter(1), reverse=True)
-    stats['collectionCodes'] = OrderedDict(collection_code_counts)
-
-    return stats
+    return statistics.get_collection_stats(collections, get_specimen_resource_id())
 
 
 def get_department(collection_code):
@@ -528,14 +493,14 @@ def resource_view_get_field_groups(resource):
 
 def get_resource_fields(resource, version=None, use_request_version=False):
     """
-    Retrieves the fields for the given resource. This is done using the datastore_search
-    action. By default, the field names from the latest version of the resource are
-    returned. However, this can be altered by either passing a version (must be an
-    integer) or by having a version filter in the request and then passing
-    use_request_version=True. The version is extracted from the __version__ filter as
-    defined by the versioned-datastore plugin. If we can start passing the version as a
-    parameter in its own right rather than as part of the filters then we can change
-    this code.
+    Retrieves the fields for the given resource. This is done using the field schema
+    cache, see lib/field_schema.py. By default, the field names from the latest version
+    of the resource are returned. However, this can be altered by either passing a
+    version (must be an integer) or by having a version filter in the request and then
+    passing use_request_version=True. The version is extracted from the __version__
+    filter as defined by the versioned-datastore plugin. If we can start passing the
+    version as a parameter in its own right rather than as part of the filters then we
+    can change this code.
 
     If the resource isn't a datastore resource then an empty list is returned.
 
@@ -553,17 +518,12 @@ def get_resource_fields(resource, version=None, use_request_version=False):
     if not resource.get('datastore_active'):
         return []
 
-    data = {'resource_id': resource['id'], 'limit': 0}
-
-    if version is not None:
-        data['version'] = version
-    elif use_request_version:
+    if version is None and use_request_version:
         filters = parse_request_filters()
         if '__version__' in filters:
-            data['version'] = int(filters['__version__'][0])
+            version = int(filters['__version__'][0])
 
-    result = toolkit.get_action('vds_basic_query')({}, data)
-    return [field['id'] for field in result.get('fields', [])]
+    return get_field_names(resource['id'], version)
 
 
 # Resource view and filters
@@ -578,81 +538,12 @@ def resource_view_state(resource_view_json, resource_json):
     resource = json.loads(resource_json)
 
     fields = get_resource_fields(resource, use_request_version=True)
-
-    # Initiate the resource view
-    view = resource_view_get_view(resource)
-    # And get the state
-    resource_view['state'] = view.get_slickgrid_state()
-
-    # there is an annoying feature/bug in slickgrid that if fitColumns=True and grid is wider than
-    # available viewport, slickgrid columns cannot be resized until fitColumns is deactivated. So to
-    # fix, we're going to work out how many columns are in the dataset to decide whether or not to
-    # turn on fitColumns. Messy, but better than trying to hack around with slickgrid
-    viewport_max_width = 920
-    col_width = 100
-    fit_columns = (len(fields) * col_width) < viewport_max_width
-    # TODO: This can be merged into get_slickgrid_state
-    resource_view['state']['fitColumns'] = fit_columns
-
-    # ID and DQI always first
-    columns_order = ['_id']
-    if 'gbifIssue' in fields:
-        columns_order.append('gbifIssue')
-    # add other useful DwC fields
-    if 'currentScientificName' in fields:
-        # prefer current scientific name
-        columns_order.append('currentScientificName')
-    elif 'scientificName' in fields:
-        columns_order.append('scientificName')
-    for f in [
-        'typeStatus',
-        'type',
-        'phylum',
-        'class',
-        'order',
-        'family',
-        'genus',
-        'specificEpithet',
-        'infraspecificEpithet',
-        'locality',
-        'country',
-        'recordedBy',
-        'catalogNumber',
-        'associatedMedia',
-        'preservative',
-        'collectionCode',
-        'year',
-        'month',
-        'day',
-    ]:
-        if f in fields:
-            columns_order.append(f)
-    # Add the rest of the columns to the columns order
-    columns_order += [f for f in fields if f not in columns_order]
-    resource_view['state']['columnsOrder'] = list(columns_order)
-
-    # this is a bit of a hack but not the worst thing that's ever happened. This code is here to
-    # solve a specific problem whereby if a user is viewing an old version of the data and in newer
-    # versions of the data new columns have been added, the user will see these new columns in the
-    # slick grid header row (no data will be shown for them because the column doesn't exist in the
-    # old records). This happens because when slick is setting up it requests the data and the
-    # column headers in separate datastore_search requests, this is inefficient but also problematic
-    # because the column headers request doesn't include any of the filters or query parameters that
-    # the data request does. This means that we lose the version information and will return the
-    # headers in the latest version even if the user is actually looking at older data. By
-    # retrieving the current fields for the resource here and then using this list to generate a
-    # list of hidden columns to pass to slick we can make sure these columns don't appear. If we
-    # stop using slick or slick is fixed we can stop doing this.
+    # the latest fields are used to hide columns that have been added since the version
+    # being viewed, see get_grid_columns
     latest_fields = get_resource_fields(resource, use_request_version=False)
-    resource_view['state']['hiddenColumns'] = [
-        f for f in latest_fields if f not in fields
-    ]
 
-    if view.grid_column_widths:
-        for column, width in view.grid_column_widths.items():
-            resource_view['state']['columnsWidth'].append(
-                {'column': column, 'width': width}
-            )
+    view = resource_view_get_view(resource)
+    resource_view['state'] = build_grid_state(view, fields, latest_fields)
 
     try:
         return json.dumps(resource_view)
@@ -1000,23 +891,29 @@ def dataset_author_truncate(author_str):
     return author_str
 
 
-def get_resource_facets(resource):
+def resource_has_facets(resource):
+    """
+    Returns True if the resource's view defines any facets.
+
+    :param resource: the resource dict
+    :returns: True or False
+    """
+    return bool(resource_view_get_view(resource).field_facets)
+
+
+def get_resource_facets(resource, cached_only=False):
     """
     Return a list of facets for a particular resource.
 
     :param resource:
+    :param cached_only: if True, only return the facets if they have already been cached
+        and return None if they haven't (default: False)
     """
-    # Number of facets to display
-    num_facets = 10
     resource_view = resource_view_get_view(resource)
     # if facets aren't defined in the resource view, then just return
     if not resource_view.field_facets:
         return
-    context = {'user': toolkit.c.user}
-    # Build query parameters for the faceted search
     # We'll use the same query parameters used in the current request
-    # And then add extras to perform a solr faceted query, returning
-    # facets but zero results (limit=0)
     query_params = get_query_params()
 
     # Convert filters to a dictionary as this won't happen automatically
@@ -1027,23 +924,17 @@ def get_resource_facets(resource):
             filter_field, filter_value = f.split(':', 1)
             filters[filter_field].append(filter_value)
 
-    search_params = dict(
-        resource_id=resource.get('id'),
-        # use limit 0 as we're not interested in getting any results, just the facets
-        limit=0,
-        facets=resource_view.field_facets,
-        q=query_params.get('q', None),
-        filters=filters,
+    # the top MAX_FACET_LIMIT values of each facet are cached for each query so that
+    # the show more button doesn't need to search again
+    facet_query = FacetQuery(
+        resource['id'], resource_view.field_facets, query_params.get('q'), filters
     )
-
-    # if the show more button is clicked, a parameter is added to the query which
-    # informs us we need
-    # to show more facets, so use 50 for the facet limit on the given field
-    for field_name in resource_view.field_facets:
-        if toolkit.h.get_param_int('_{}_limit'.format(field_name)) == 0:
-            search_params.setdefault('facet_limits', {})[field_name] = 50
-
-    search = toolkit.get_action('vds_basic_query')(context, search_params)
+    if cached_only:
+        search_facets = facet_query.get_cached()
+        if search_facets is None:
+            return None
+    else:
+        search_facets = facet_query.get({'user': toolkit.c.user})
     facets = []
 
     # dictionary of facet name => formatter function with camel_case_to_string defined
@@ -1067,16 +958,22 @@ def get_resource_facets(resource):
 
     # Loop through original facets to ensure order is preserved
     for field_name in resource_view.field_facets:
+        # if the show more button is clicked, a parameter is added to the query which
+        # informs us we need to show more facets
+        if toolkit.h.get_param_int('_{}_limit'.format(field_name)) == 0:
+            limit = MAX_FACET_LIMIT
+        else:
+            limit = DEFAULT_FACET_LIMIT
+        # the values are already sorted by count desc so that the top value is first
+        values = search_facets[field_name]['values']
         # parse the facets into a list of dictionary values
         facets.append(
             {
                 'name': field_name,
                 'label': facet_label_formatters[field_name](field_name),
                 'active': field_name in filters,
-                'has_more': search['facets'][field_name]['details'][
-                    'sum_other_doc_count'
-                ]
-                > 0,
+                'has_more': len(values) > limit
+                or search_facets[field_name]['sum_other_doc_count'] > 0,
                 'facet_values': [
                     {
                         'name': value,
@@ -1084,14 +981,8 @@ def get_resource_facets(resource):
                         'count': count,
                         'active': field_name in filters
                         and value in filters[field_name],
-                        # loop over the top values, sorted by count desc so that the top
-                        # value is first
                     }
-                    for value, count in sorted(
-                        search['facets'][field_name]['values'].items(),
-                        key=itemgetter(1),
-                        reverse=True,
-                    )
+                    for value, count in values[:limit]
                 ],
             }
         )
@@ -1099,7 +990,7 @@ def get_resource_facets(resource):
     return facets
 
 
-def remove_url_filter(field, value, extras=None):
+def remove_url_filter(field, value, extras=None, alternative_url=None):
     """
     The CKAN built in functions remove_url_param / add_url_param cannot handle multiple
     filters which are concatenated with |, not separate query params This replaces
@@ -1108,6 +999,8 @@ def remove_url_filter(field, value, extras=None):
     :param field: the field to remove the filter for
     :param value: the value of the field to remove the filter for
     :param extras: extra parameters to include in the created URL
+    :param alternative_url: the URL to add the parameters to instead of the current
+        request's URL
     :returns: a URL
     """
 
@@ -1142,11 +1035,18 @@ def remove_url_filter(field, value, extras=None):
         # If we have filter parts, add them back to the params dict
         if filter_parts:
             filters = '|'.join(filter_parts)
-            return toolkit.h.remove_url_param('filters', replace=filters, extras=extras)
-    return toolkit.h.remove_url_param('filters', extras=extras)
+            return toolkit.h.remove_url_param(
+                'filters',
+                replace=filters,
+                extras=extras,
+                alternative_url=alternative_url,
+            )
+    return toolkit.h.remove_url_param(
+        'filters', extras=extras, alternative_url=alternative_url
+    )
 
 
-def add_url_filter(field, value, extras=None):
+def add_url_filter(field, value, extras=None, alternative_url=None):
     """
     The CKAN built in functions remove_url_param / add_url_param cannot handle multiple
     filters which are concatenated with |, not separate query params This replaces
@@ -1155,6 +1055,8 @@ def add_url_filter(field, value, extras=None):
     :param field:
     :param extras:
     :param value:
+    :param alternative_url: the URL to add the parameters to instead of the current
+        request's URL
     """
 
     params = {k: v for k, v in toolkit.request.params.items() if k != 'page'}
@@ -1164,7 +1066,9 @@ def add_url_filter(field, value, extras=None):
     ]
     filters = '|'.join(filters)
     params['filters'] = filters
-    return core_helpers._url_with_params(toolkit.request.base_url, params.items())
+    return core_helpers._url_with_params(
+        alternative_url or toolkit.request.base_url, params.items()
+    )
 
 
 def parse_request_filters():
@@ -1256,17 +1160,13 @@ def resource_view_get_filterable_fields(resource):
     if not resource.get('datastore_active'):
         return []
 
-    # otherwise, query the datastore for the fields
-    data = {
-        'resource_id': resource['id'],
-        'limit': 0,
-    }
-    fields = toolkit.get_action('vds_basic_query')({}, data).get('fields', [])
+    # otherwise, get the fields from the field schema
+    fields = get_field_schema(resource['id'])
 
     # sort and filter the fields ensuring we only return string type fields and don't
     # return the id
     # field
-    return sorted(f['id'] for f in fields if f['type'] == 'string' and f['id'] != '_id')
+    return sorted(f.name for f in fields if f.type == 'string' and f.name != '_id')
 
 
 def form_select_datastore_field_options(resource, allow_empty=True):
@@ -1276,7 +1176,7 @@ def form_select_datastore_field_options(resource, allow_empty=True):
     :param allow_empty:  (optional, default: True)
 
     """
-    fields = toolkit.h.resource_view_get_fields(resource)
+    fields = sorted(get_resource_fields(resource))
     return list_to_form_options(fields, allow_empty)
 
 
@@ -1291,7 +1191,7 @@ def _get_latest_update(package_or_resource_dicts):
     """
     # a list of fields on the resource that should contain update dates
     fields = ['last_modified', 'revision_timestamp', 'Created']
-    get_rounded_version = toolkit.get_action('vds_version_round')
+    get_rounded_version = action_memo.get_memoized_action('vds_version_round')
 
     latest_dict = None
     latest_date = None
@@ -1368,6 +1268,28 @@ def get_external_sites(record: dict) -> List[Site]:
     return external_links.get_sites(record)
 
 
+def get_external_links(record: dict) -> List[Tuple[Site, List[Link]]]:
+    """
+    Helper called on collection record pages which returns the links relevant to the
+    record from each external site. The sites are queried concurrently and any which
+    don't respond within the configured deadline are left out.
+
+    :param record: a record dict
+    :returns: a list of (Site, list of Links) pairs
+    """
+    return external_links.resolve_links(record)
+
+
+def external_links_lazy() -> bool:
+    """
+    Whether the external links on record pages should be loaded by the browser after
+    the page has loaded rather than while rendering the page.
+
+    :returns: True if the links should be loaded lazily, False if not
+    """
+    return toolkit.asbool(toolkit.config.get('ckanext.nhm.external_links.lazy', True))
+
+
 def render_epoch(
     epoch_timestamp, in_milliseconds=True, date_format='%Y-%m-%d %H:%M:%S (UTC)'
 ):
@@ -1407,7 +1329,7 @@ def get_object_url(resource_id, guid, version=None, include_version=True):
     :returns: the object url
     """
     if include_version:
-        rounded_version = toolkit.get_action('vds_version_round')(
+        rounded_version = action_memo.get_memoized_action('vds_version_round')(
             {},
             {
                 'resource_id': resource_id,
@@ -1529,32 +1451,91 @@ def get_specimen_jsonld(uuid, version=None):
         return ''
 
 
-def get_resource_group(resource):
+def _has_linked_group_name(resource: dict) -> bool:
+    """
+    Returns True if the resource's group name contains tokens which need to be filled
+    in from the resource's linked specimen.
+    """
     group_name = resource.get('resource_group')
-    linked_specimen = resource.get('linked_specimen')
-    if linked_specimen and group_name and '$' in group_name:
-        # has to be imported here due to circular imports
-        from ckanext.nhm.lib.record import get_specimen_by_uuid
-
-        linked_specimen_record = get_specimen_by_uuid(linked_specimen)
-        if linked_specimen_record and group_name:
-            tokens = [
-                t
-                for t in re.findall(r'\$[a-zA-Z]+', group_name)
-                if t.strip('$') in linked_specimen_record.data
-            ]
-            for token in tokens:
-                group_name = group_name.replace(
-                    token, linked_specimen_record.data.get(token.strip('$'))
-                )
+    return bool(resource.get('linked_specimen') and group_name and '$' in group_name)
+
+
+def get_resource_group(resource, linked_specimens=None):
+    """
+    Returns the name of the group the resource is in. Any $tokens in the group name are
+    replaced with the values of the same fields in the resource's linked specimen.
+
+    :param resource: the resource dict
+    :param linked_specimens: optional dict of UUID -> specimen Record to get the linked
+        specimen from, if not given the specimen is looked up on its own
+    :returns: the group name or None if the resource isn't in a group
+    """
+    group_name = resource.get('resource_group')
+    if _has_linked_group_name(resource):
+        linked_specimen = resource['linked_specimen']
+        if linked_specimens is None:
+            # has to be imported here due to circular imports
+            from ckanext.nhm.lib.record import get_specimen_by_uuid
+
+            linked_specimen_record = get_specimen_by_uuid(linked_specimen)
+        else:
+            linked_specimen_record = linked_specimens.get(linked_specimen)
+        if linked_specimen_record:
+            data = linked_specimen_record.data
+
+            def replace(match):
+                token = match.group()
+                return str(data[token[1:]]) if token[1:] in data else token
+
+            group_name = re_group_token.sub(replace, group_name)
     if (group_name or '').strip() == '':
         group_name = None
     return group_name
 
 
-def group_resources(resource_list):
+def _get_resource_groups(resource_list) -> Dict[str, Optional[str]]:
+    """
+    Works out the group name of each resource. The linked specimens of all the resources
+    are found together in the specimen resource using RecordBatch.load_by.
+
+    :param resource_list: a list of resource dicts
+    :returns: a dict of resource ID -> group name
+    """
+    # has to be imported here due to circular imports
+    from ckanext.nhm.lib.record import RecordBatch
+
+    uuids = [r['linked_specimen'] for r in resource_list if _has_linked_group_name(r)]
+    linked_specimens = {}
+    if uuids:
+        try:
+            batch = RecordBatch.load_by(
+                get_specimen_resource_id(), 'occurrenceID', uuids
+            )
+            linked_specimens = {record.data['occurrenceID']: record for record in batch}
+        except Exception:
+            log.warning(f'Failed to find {len(uuids)} linked specimens', exc_info=True)
+    return {r['id']: get_resource_group(r, linked_specimens) for r in resource_list}
+
+
+def group_resources(resource_list, pkg=None):
+    """
+    Groups the given resources by their group names.
+
+    :param resource_list: a list of resource dicts
+    :param pkg: the package dict the resources are from, if given, the group names are
+        cached until the package is modified
+    :returns: a list of (group name, group slug, list of resource dicts) tuples
+    """
+    if isinstance(pkg, dict) and pkg.get('id') and pkg.get('metadata_modified'):
+        key = f'{pkg["id"]}:{pkg["metadata_modified"]}'
+        groups = get_cache('resource_groups', maxsize=256, ttl=86400).get_or_set(
+            key, partial(_get_resource_groups, resource_list)
+        )
+    else:
+        groups = _get_resource_groups(resource_list)
+
     group_and_resource = sorted(
-        [(get_resource_group(r), r) for r in resource_list], key=lambda x: x[0] or ''
+        [(groups.get(r['id']), r) for r in resource_list], key=lambda x: x[0] or ''
     )
     return [
         (
@@ -1575,11 +1556,11 @@ def is_downloadable_group(resource_list):
 def get_resource_size(resource_dict):
     # kilo, mega, giga, etc. I could make this a list but what's the point
     prefixes = 'KMGTPEZ'
-    if toolkit.get_action('vds_resource_check')(
+    if action_memo.get_memoized_action('vds_resource_check')(
         {}, {'resource_id': resource_dict['id']}
     ):
         try:
-            records = toolkit.get_action('vds_basic_count')(
+            records = action_memo.get_memoized_action('vds_basic_count')(
                 {}, {'resource_id': resource_dict['id']}
             )
             return f'{records} records'
@@ -1609,7 +1590,7 @@ def get_record_permalink(
             'record_id': record_dict['_id'],
         }
         if include_version:
-            rounded_version = toolkit.get_action('vds_version_round')(
+            rounded_version = action_memo.get_memoized_action('vds_version_round')(
                 {},
                 {
                     'resource_id': resource_dict['id'],
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from ckan.plugins import toolkit
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+# the statuses which are worth retrying and which count as failures for the circuit
+# breaker
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of making a request when the integration's circuit breaker is open.
+
+    This is a ConnectionError so that callers handling requests' exceptions already
+    handle it.
+    """
+
+    pass
+
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Returns the requests session for the host of the given URL. Each host gets its own
+    session with its own connection pool so that connections are kept alive between
+    requests instead of going through a new TCP/TLS handshake every time.
+
+    :param url: the URL that is going to be requested
+    :returns: a requests Session
+    """
+    parts = urlsplit(url)
+    host = f'{parts.scheme}://{parts.netloc}'
+    with _sessions_lock:
+        if host not in _sessions:
+            session = requests.Session()
+            session.mount(host, HTTPAdapter(pool_connections=1, pool_maxsize=16))
+            _sessions[host] = session
+        return _sessions[host]
+
+
+@dataclass
+class Metrics:
+    """
+    Counts and timings for the requests made by an integration.
+    """
+
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    rejected: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def mean_time(self) -> float:
+        """
+        :returns: the mean time taken by a request in seconds, or 0 if no requests have
+            been made
+        """
+        return self.total_time / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        :returns: the metrics as a dict, including the mean time
+        """
+        return {**asdict(self), 'mean_time': self.mean_time}
+
+
+class CircuitBreaker:
+    """
+    Stops requests being made to an integration for a cooldown period after too many
+    consecutive failures. Once the cooldown has passed, one request is allowed through
+    and if it succeeds the breaker closes again.
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        """
+        :param name: the integration's name, used in log messages
+        :param threshold: the number of consecutive failures which opens the breaker
+        :param cooldown: the number of seconds the breaker stays open for
+        """
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """
+        :returns: True if the breaker has been opened and hasn't closed again yet
+        """
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """
+        :returns: True if a request can be made, False if not
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # let one request through to see if the integration has recovered, if it
+                # fails the breaker will be opened again for another cooldown period
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Records a successful request, which resets the failure count and closes the
+        breaker if it's open.
+        """
+        with self._lock:
+            if self.opened_at is not None:
+                log.info(f'{self.name} circuit breaker closed')
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        """
+        Records a failed request, which opens the breaker (or restarts its cooldown) if
+        there have been threshold consecutive failures.
+        """
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    log.warning(
+                        f'{self.name} circuit breaker opened after {self.failures} '
+                        f'consecutive failures'
+                    )
+                self.opened_at = time.monotonic()
+
+
+class HTTPClient:
+    """
+    Makes requests to a single external integration with a timeout, retries with
+    backoff, a circuit breaker and metrics.
+
+    The defaults given when creating the client can be overridden in the config using
+    these options:
+
+        - ckanext.nhm.http.<name>.timeout: the request timeout in seconds
+        - ckanext.nhm.http.<name>.retries: the number of times to retry a request
+        - ckanext.nhm.http.<name>.failure_threshold: the number of consecutive failures
+          which opens the circuit breaker
+        - ckanext.nhm.http.<name>.cooldown: the number of seconds the circuit breaker
+          stays open for
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float = 5,
+        retries: int = 0,
+        backoff: float = 0.2,
+        failure_threshold: int = 5,
+        cooldown: float = 30,
+    ):
+        """
+        :param name: the name of the integration
+        :param timeout: the default request timeout in seconds
+        :param retries: the default number of times to retry a failed request, requests
+            aren't retried unless this or the retries option is set
+        :param backoff: the number of seconds to wait before the first retry, this
+            doubles for each subsequent retry
+        :param failure_threshold: the default number of consecutive failures which opens
+            the circuit breaker
+        :param cooldown: the default number of seconds the circuit breaker stays open
+            for
+        """
+        prefix = f'ckanext.nhm.http.{name}'
+        self.name = name
+        self.timeout = float(toolkit.config.get(f'{prefix}.timeout', timeout))
+        self.retries = int(toolkit.config.get(f'{prefix}.retries', retries))
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(
+            name,
+            int(toolkit.config.get(f'{prefix}.failure_threshold', failure_threshold)),
+            float(toolkit.config.get(f'{prefix}.cooldown', cooldown)),
+        )
+        self.metrics = Metrics()
+        self._metrics_lock = threading.Lock()
+
+    def _record(self, elapsed: float, error: bool):
+        with self._metrics_lock:
+            self.metrics.requests += 1
+            self.metrics.total_time += elapsed
+            self.metrics.max_time = max(self.metrics.max_time, elapsed)
+            if error:
+                self.metrics.errors += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Makes a GET request to the given URL. Connection errors, timeouts and 502, 503
+        and 504 responses are retried. Other responses are returned as they are.
+
+        :param url: the URL
+        :param kwargs: any other parameters to pass to requests, if no timeout is given
+            the client's timeout is used
+        :returns: the response
+        :raises CircuitOpenError: if the circuit breaker is open before the first try
+        :raises requests.RequestException: if the request fails after all the retries
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        session = get_session(url)
+        # the result of the last attempt, used if a retry is stopped by the breaker
+        response = None
+        error = None
+
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                with self._metrics_lock:
+                    self.metrics.rejected += 1
+                # if this is a retry, the caller gets the last attempt's result as if
+                # there were no more retries
+                if response is not None:
+                    return response
+                if error is not None:
+                    raise error
+                raise CircuitOpenError(f'{self.name} circuit breaker is open')
+
+            if attempt:
+                with self._metrics_lock:
+                    self.metrics.retries += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            start = time.monotonic()
+            try:
+                response = session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(time.monotonic() - start, True)
+                self.breaker.record_failure()
+                if attempt == self.retries:
+                    raise
+                response, error = None, e
+                continue
+
+            elapsed = time.monotonic() - start
+            failed = response.status_code in RETRY_STATUSES
+            self._record(elapsed, failed)
+            log.debug(
+                f'{self.name}: GET {url} {response.status_code} in {elapsed:.3f}s'
+            )
+            if not failed:
+                self.breaker.record_success()
+                return response
+            self.breaker.record_failure()
+            if attempt == self.retries:
+                return response
+
+
+_clients: Dict[str, HTTPClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str, **defaults) -> HTTPClient:
+    """
+    Returns the HTTP client for the given integration, creating it if necessary.
+
+    :param name: the name of the integration
+    :param defaults: the defaults to create the client with if it doesn't exist yet,
+        see HTTPClient
+    :returns: an HTTPClient
+    """
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = HTTPClient(name, **defaults)
+        return _clients[name]
+
+
+def get_metrics() -> Dict[str, dict]:
+    """
+    Returns the metrics for each integration which has been used in this process.
+
+    :returns: a dict of integration name -> metrics dict
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {
+        client.name: {
+            **client.metrics.as_dict(),
+            'circuit_open': client.breaker.is_open,
+        }
+        for client in clients
+    }
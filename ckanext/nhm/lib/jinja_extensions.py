@@ -5,31 +5,140 @@
 # Created by the Natural History Museum in London, UK
 
 import re
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Callable, FrozenSet, Mapping, NamedTuple, Tuple
 
 from jinja2 import nodes
 from jinja2.ext import Extension
 
 from ckanext.nhm.lib.taxonomy import find_author_split
 
+COMMON_STRINGS = MappingProxyType(
+    {
+        'italics': '<em>{0}</em>',
+        'bold': '<b>{0}</b>',
+        'deitalicise': '<span style="font-style: normal;">{0}</span>',
+    }
+)
+
+# abbreviations should not be italicised. These are combined into one regex with the
+# longest abbreviations first so that, for example, subvar isn't matched as var
+ABBREVIATIONS = ('var', 'subsp', 'subvar', 'f', 'subf', 'ssp', 'cv')
+_abbreviation_regex = re.compile(
+    r'(\s?(?:{0})\.?\s)'.format('|'.join(sorted(ABBREVIATIONS, key=len, reverse=True)))
+)
+
+
+class CollectionRules(NamedTuple):
+    """
+    The formatting rules for a collection.
+    """
+
+    # field name -> the formatting functions to apply to it, in order
+    field_formats: Mapping[str, Tuple[Callable[[str], str], ...]]
+    # the fields which need to be parsed for abbreviations and authors
+    parsed_fields: FrozenSet[str]
+
+
+def _build_rules(*rule_sets):
+    """
+    Merges the given rule definitions into a single, immutable CollectionRules object.
+
+    :param rule_sets: 2-tuples of a dict where the keys are functions taking and
+        outputting a single string and the values are the names of fields to which that
+        function should be applied, and a list of fields to be parsed
+    :returns: a CollectionRules object
+    """
+    field_formats = {}
+    parsed_fields = set()
+    for formatted_fields, fields_to_parse in rule_sets:
+        for formatter, field_names in formatted_fields.items():
+            for field_name in field_names:
+                formatters = field_formats.setdefault(field_name, [])
+                if formatter not in formatters:
+                    formatters.append(formatter)
+        parsed_fields.update(fields_to_parse)
+    return CollectionRules(
+        MappingProxyType({f: tuple(fs) for f, fs in field_formats.items()}),
+        frozenset(parsed_fields),
+    )
+
+
+# add any globals here, e.g. if every collection should have the species italicised
+GLOBAL_RULES = ({}, [])
+
+# zoology-specific rules
+ZOOLOGY_RULES = (
+    {
+        COMMON_STRINGS['italics'].format: ['specificEpithet', 'genus', 'subgenus'],
+        str.lower: ['specificEpithet', 'infraspecificEpithet'],
+    },
+    ['scientificName', 'infraspecificEpithet', 'determinations Names'],
+)
+
+# entomology-specific rules, will almost always follow zoology rules but can override
+# them if necessary
+ENTOMOLOGY_RULES = ZOOLOGY_RULES
+
+# palaeontology-specific rules, will almost always follow zoology rules but can override
+# them if necessary
+PALAEONTOLOGY_RULES = ZOOLOGY_RULES
+
+# botany-specific rules
+BOTANY_RULES = (
+    {
+        COMMON_STRINGS['italics'].format: ['specificEpithet', 'genus', 'subgenus'],
+        str.lower: ['specificEpithet', 'infraspecificEpithet'],
+    },
+    ['scientificName', 'infraspecificEpithet', 'determinations Names'],
+)
+
+# mineralogy-specific rules
+MINERALOGY_RULES = ({}, [])
+
+# collection code regex -> the rules for that collection, checked in order. These are
+# built once when the module is loaded and are never modified so they can be shared
+# between threads safely
+COLLECTION_RULES = tuple(
+    (re.compile(rgx, re.IGNORECASE), _build_rules(GLOBAL_RULES, rules))
+    for rgx, rules in (
+        (r'zoo', ZOOLOGY_RULES),
+        (r'bmnh\(e\)', ENTOMOLOGY_RULES),
+        (r'pal', PALAEONTOLOGY_RULES),
+        (r'bot', BOTANY_RULES),
+        (r'min', MINERALOGY_RULES),
+    )
+)
+DEFAULT_RULES = _build_rules(GLOBAL_RULES)
+
+
+@lru_cache(maxsize=128)
+def get_collection_rules(collection_code):
+    """
+    Find the formatting rules for the given collection code.
+
+    :param collection_code: the collection code (can be None)
+    :returns: a CollectionRules object
+    """
+    if collection_code:
+        for rgx, rules in COLLECTION_RULES:
+            if rgx.match(collection_code):
+                return rules
+    return DEFAULT_RULES
+
 
 class TaxonomyFormatExtension(Extension):
     """
     A custom Jinja2 tag for formatting scientific names in HTML.
+
+    The extension holds no state and all the rules it uses are immutable so it is safe
+    to use from multiple threads.
     """
 
     tags = {'taxonomy'}
-    # keyed on the format
-    format_to_fields = {}
-    # keyed on the field name
-    field_to_formats = {}
-    # just a list of field names
-    parsed_fields = []
     # common string formats
-    common_strings = {
-        'italics': '<em>{0}</em>',
-        'bold': '<b>{0}</b>',
-        'deitalicise': '<span style="font-style: normal;">{0}</span>',
-    }
+    common_strings = COMMON_STRINGS
 
     def parse(self, parser):
         """
@@ -66,150 +175,16 @@ class TaxonomyFormatExtension(Extension):
         :returns: HTML-formatted tag body
         """
         body = str(caller())
+        rules = get_collection_rules(collection_code)
+
+        for formatter in rules.field_formats.get(field_name, ()):
+            body = formatter(body)
 
-        # add any globals here, e.g. if every collection should have the
-        # species italicised
-        global_formatted_fields = {}
-        global_parsed_fields = []
-
-        collections = {
-            r'(?i)zoo': self._zoo,
-            r'(?i)bmnh\(e\)': self._ent,
-            r'(?i)pal': self._pal,
-            r'(?i)bot': self._bot,
-            r'(?i)min': self._min,
-        }
-
-        # get collection-specific rules
-        if collection_code:
-            for rgx, p in collections.items():
-                if re.match(rgx, collection_code):
-                    collection_formatted_fields, collection_parsed_fields = p
-                    self.format_to_fields = self._merge(
-                        global_formatted_fields, collection_formatted_fields
-                    )
-                    self.parsed_fields = global_parsed_fields + collection_parsed_fields
-                    break
-
-        self.field_to_formats = {
-            f: [k for k, v in self.format_to_fields.items() if f in v]
-            for f in set(
-                [
-                    item
-                    for field_names in self.format_to_fields.values()
-                    for item in field_names
-                ]
-            )
-        }
-
-        for f, keys in self.format_to_fields.items():
-            if field_name in keys:
-                body = f(body)
-
-        if field_name in self.parsed_fields:
+        if field_name in rules.parsed_fields:
             body = self._parse_field(body, record_dict)
 
         return body
 
-    @staticmethod
-    def _merge(ff1, ff2):
-        """
-        Helper method to merge two lists of field formats.
-
-        :param ff1: a dict where the keys are functions taking and outputting a single
-            string, and the values are the names of fields to which that function should
-            be applied
-        :type ff1: <function, string[]> dict
-        :param ff2: a dict where the keys are functions taking and outputting a single
-            string, and the values are the names of fields to which that function should
-            be applied
-        :type ff2: <function, string[]> dict
-        :returns: a combined dict
-        """
-        return {
-            k: list(set(ff1.get(k, []) + ff2.get(k, []))) for k in set(ff1).union(ff2)
-        }
-
-    @property
-    def _zoo(self):
-        """
-        Zoology-specific rules.
-
-        :returns: a tuple of collections; a dictionary of string formatting functions
-            and corresponding field names, and a list of fields to be parsed
-        """
-        formatted_fields = {
-            self.common_strings['italics'].format: [
-                'specificEpithet',
-                'genus',
-                'subgenus',
-            ],
-            str.lower: ['specificEpithet', 'infraspecificEpithet'],
-        }
-        parsed_fields = [
-            'scientificName',
-            'infraspecificEpithet',
-            'determinations Names',
-        ]
-        return formatted_fields, parsed_fields
-
-    @property
-    def _ent(self):
-        """
-        Entomology-specific rules. Will almost always follow zoology rules but can
-        override them if necessary.
-
-        :returns: a tuple of collections; a dictionary of string formatting functions
-            and corresponding field names, and a list of fields to be parsed
-        """
-        return self._zoo
-
-    @property
-    def _pal(self):
-        """
-        Palaeontology-specific rules. Will almost always follow zoology rules but can
-        override them if necessary.
-
-        :returns: a tuple of collections; a dictionary of string formatting functions
-            and corresponding field names, and a list of fields to be parsed
-        """
-        return self._zoo
-
-    @property
-    def _bot(self):
-        """
-        Botany-specific rules.
-
-        :returns: a tuple of collections; a dictionary of string formatting functions
-            and corresponding field names, and a list of fields to be parsed
-        """
-        formatted_fields = {
-            self.common_strings['italics'].format: [
-                'specificEpithet',
-                'genus',
-                'subgenus',
-            ],
-            str.lower: ['specificEpithet', 'infraspecificEpithet'],
-        }
-        parsed_fields = [
-            'scientificName',
-            'infraspecificEpithet',
-            'determinations Names',
-        ]
-        return formatted_fields, parsed_fields
-
-    @property
-    def _min(self):
-        """
-        Mineralogy-specific rules.
-
-        :returns: a tuple of collections; a dictionary of string formatting functions
-            and corresponding field names, and a list of fields to be parsed
-        """
-        formatted_fields = {}
-        parsed_fields = []
-        return formatted_fields, parsed_fields
-
     def _parse_field(self, body, record_dict):
         """
         For longer/more complex fields with multiple parts that need to be variably
@@ -221,13 +196,9 @@ class TaxonomyFormatExtension(Extension):
             by wrapping in span tags
         """
         # abbreviations should not be italicised
-        abbr = ['var', 'subsp', 'subvar', 'f', 'subf', 'ssp', 'cv']
-        for a in abbr:
-            body = re.sub(
-                r'(\s?{0}\.?\s)'.format(a),
-                '<span style="font-style: normal;">\\1</span>',
-                body,
-            )
+        body = _abbreviation_regex.sub(
+            '<span style="font-style: normal;">\\1</span>', body
+        )
 
         # neither should authors
         body = self._find_authors(body, record_dict)
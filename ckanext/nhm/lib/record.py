@@ -3,55 +3,235 @@
 #
 # This file is part of ckanext-nhm
 # Created by the Natural History Museum in London, UK
+import logging
+import time
+from collections.abc import Sequence
 from contextlib import suppress
-from dataclasses import dataclass
-from functools import partial
-from typing import List, Optional
+from functools import lru_cache, partial
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import ckan.model as model
-from cachetools import TTLCache, cached
 from ckan.lib.helpers import url_for
 from ckan.model.license import DefaultLicense
 from ckan.plugins import toolkit
 
 from ckanext.nhm.dcat.utils import rdf_resources
+from ckanext.nhm.lib.action_memo import get_memoized_action
+from ckanext.nhm.lib.cache import TwoTierCache, get_cache
 from ckanext.nhm.lib.helpers import get_specimen_resource_id, is_collection_resource_id
 
+log = logging.getLogger(__name__)
+
+
+def get_uuid_location_cache() -> TwoTierCache:
+    """
+    Returns the cache which maps record UUIDs to the resource and record IDs they are
+    found at. Records never move between resources or change ID so the values are kept
+    forever (or until they are evicted) and shared between processes using Redis.
+
+    :returns: a TwoTierCache
+    """
+    return get_cache('uuid_location', maxsize=65536, use_redis=True)
+
+
+def _find_record_by_uuid(
+    uuid: str, version: Optional[int], context: dict
+) -> Optional[Tuple[str, dict]]:
+    """
+    Searches all the RDF resources for the record with the given UUID with one multi
+    resource query.
+
+    :param uuid: the record's UUID
+    :param version: the version to search at
+    :param context: the context to use for the search
+    :returns: a 2-tuple of the resource ID and the record's data, or None if it couldn't
+        be found
+    """
+    search_data_dict = {
+        'resource_ids': rdf_resources(),
+        'query': {
+            'filters': {
+                'and': [
+                    {
+                        'string_equals': {
+                            'fields': ['occurrenceID'],
+                            'value': uuid,
+                        }
+                    }
+                ]
+            }
+        },
+        'size': 1,
+        'version': version,
+    }
+    search_result = toolkit.get_action('vds_multi_query')(context, search_data_dict)
+    for hit in search_result['records']:
+        return hit['resource'], hit['data']
+    return None
+
 
 def get_record_by_uuid(uuid, version=None) -> Optional['Record']:
     """
-    Loop through all resources, and try and find the record.
+    Find the record with the given UUID in any of the RDF resources.
 
     Currently this only works for specimens (as rdf_resources() only returns the
-    specimens resource).
+    specimens resource) but all the RDF resources are searched at once so adding more
+    doesn't add more searches. Once the record has been found, its resource and record
+    IDs are cached so that subsequent calls can get the record directly.
+
+    :param uuid: the record's UUID
+    :param version: the version to get the record at (default: None, the latest)
+    :returns: a Record or None if the record couldn't be found
     """
     context = {'user': toolkit.c.user or toolkit.c.author}
+    location_cache = get_uuid_location_cache()
+
+    location = location_cache.get(uuid, None)
+    if location is not None:
+        resource_id, record_id = location
+        record = Record(record_id, version, resource_id=resource_id, context=context)
+        try:
+            # load the data now to check the record exists at this version
+            record.data
+            return record
+        except Exception:
+            return None
+
+    try:
+        found = _find_record_by_uuid(uuid, version, context)
+    except Exception:
+        log.warning(f'Failed to search for the record with UUID {uuid}', exc_info=True)
+        return None
+    if found is None:
+        return None
+    resource_id, data = found
+    location_cache.set(uuid, [resource_id, data['_id']])
+    return Record(data['_id'], version, data, resource_id, context=context)
+
+
+def get_records_by_uuids(
+    uuids: Iterable[str], version: Optional[int] = None
+) -> Dict[str, 'Record']:
+    """
+    Find the records with the given UUIDs. Each RDF resource is searched with
+    occurrenceID terms queries (rather than one query per UUID) using
+    RecordBatch.load_by, so the resource and package dicts are only resolved once per
+    resource and then shared between all the records found in it.
+
+    :param uuids: the UUIDs to find
+    :param version: the version to find the records at (default: None, the latest)
+    :returns: a dict of UUID -> Record, UUIDs that couldn't be found are not included
+    """
+    context = {'user': toolkit.c.user or toolkit.c.author}
+    remaining = set(uuids)
+    found = {}
     for resource_id in rdf_resources():
-        with suppress(Exception):
-            # search for the record
-            search_data_dict = {
-                'resource_id': resource_id,
-                'filters': {
-                    'occurrenceID': uuid,
-                },
-                'version': version,
-            }
-            # retrieve datastore record
-            search_result = toolkit.get_action('vds_basic_query')(
-                context, search_data_dict
+        if not remaining:
+            break
+        try:
+            batch = RecordBatch.load_by(
+                resource_id, 'occurrenceID', sorted(remaining), version, context
             )
-            records = search_result['records']
-            if records:
-                data = records[0]
-                return Record(data['_id'], version, data, resource_id, context=context)
-    return None
+        except Exception:
+            log.warning(
+                f'Failed to search {resource_id} for {len(remaining)} UUIDs',
+                exc_info=True,
+            )
+            continue
+        for record in batch:
+            uuid = record.data['occurrenceID']
+            remaining.discard(uuid)
+            found[uuid] = record
+            get_uuid_location_cache().set(uuid, [resource_id, record.id])
+    return found
+
+
+def iter_records(
+    resource_id: str,
+    version: Optional[int] = None,
+    page_size: int = 1000,
+    context: Optional[dict] = None,
+) -> Iterator['Record']:
+    """
+    Iterate over every record in the given resource at the given version. The records
+    are paged through using the after value returned by each search so only one page
+    of records is held in memory at a time. The resource and package dicts are retrieved
+    once and shared between all the yielded records.
+
+    :param resource_id: the resource ID
+    :param version: the version to get the records at (default: None, the latest)
+    :param page_size: the number of records to retrieve per search (default: 1000)
+    :param context: the context to use for the action calls, defaults to a context
+        which ignores auth as this will often be used outside of a request
+    :returns: yields Record objects
+    """
+    if context is None:
+        context = {'ignore_auth': True}
+    # this batch is only used to resolve the resource and package dicts once, each page
+    # of records gets its own batch sharing them so that only one page is kept around
+    shared = RecordBatch(resource_id, version=version, context=context)
+    search_data_dict = {
+        'resource_id': resource_id,
+        'limit': page_size,
+        'version': version,
+    }
+    while True:
+        search_result = toolkit.get_action('vds_basic_query')(
+            dict(context), dict(search_data_dict)
+        )
+        records = search_result['records']
+        yield from RecordBatch(
+            resource_id,
+            records,
+            version,
+            resource=shared.resource,
+            package=shared.package,
+            context=context,
+        )
+        after = search_result.get('after')
+        if not records or after is None:
+            break
+        search_data_dict['after'] = after
 
 
-# cache for 5 mins
-@cached(cache=TTLCache(maxsize=4096, ttl=300))
-def get_specimen_by_uuid(
-    uuid: str, version: Optional[int] = None
-) -> Optional['Record']:
+# specimens at a specific version never change so they can be cached for a long time,
+# the latest version of a specimen can change whenever there's an ingest so it's only
+# cached for the specimen cache's default ttl (ckanext.nhm.specimen_cache.ttl)
+VERSIONED_SPECIMEN_TTL = 60 * 60 * 24 * 30
+LATEST_SPECIMEN_TTL = 300
+# the key the latest specimens' generation is stored under in the specimen cache
+SPECIMEN_GENERATION_KEY = 'generation'
+
+
+def get_specimen_cache() -> TwoTierCache:
+    """
+    Returns the cache used by get_specimen_by_uuid. This is shared between processes
+    using Redis (if it's available) and each process only keeps values locally for a
+    minute so that invalidations made by other processes are seen quickly.
+
+    :returns: a TwoTierCache
+    """
+    return get_cache(
+        'specimen',
+        maxsize=4096,
+        ttl=LATEST_SPECIMEN_TTL,
+        use_redis=True,
+        local_ttl=60,
+    )
+
+
+def invalidate_latest_specimens():
+    """
+    Invalidates all the cached latest version specimens by starting a new generation,
+    this should be called when an ingest into the specimen resource has finished.
+    Specimens cached at specific versions are unaffected.
+    """
+    get_specimen_cache().set(
+        SPECIMEN_GENERATION_KEY, int(time.time()), ttl=VERSIONED_SPECIMEN_TTL
+    )
+
+
+def _find_specimen(uuid: str, version: Optional[int]) -> Optional[dict]:
     with suppress(Exception):
         search_data_dict = {
             'resource_id': get_specimen_resource_id(),
@@ -63,11 +243,39 @@ def get_specimen_by_uuid(
         search_result = toolkit.get_action('datastore_search')({}, search_data_dict)
         records = search_result['records']
         if records:
-            data = records[0]
-            return Record(data['_id'], version, data, get_specimen_resource_id())
+            return records[0]
     return None
 
 
+def get_specimen_by_uuid(
+    uuid: str, version: Optional[int] = None
+) -> Optional['Record']:
+    """
+    Find the specimen with the given UUID. Found specimens are cached, specimens at a
+    specific version for a long time and the latest version of specimens for a short
+    time (or until invalidate_latest_specimens is called). Specimens which can't be
+    found aren't cached.
+
+    :param uuid: the specimen's UUID
+    :param version: the version to find the specimen at (default: None, the latest)
+    :returns: a Record or None if the specimen couldn't be found
+    """
+    cache = get_specimen_cache()
+    if version is None:
+        generation = cache.get(SPECIMEN_GENERATION_KEY, 0)
+        # use the cache's default ttl, which can be set in the config
+        key, ttl = f'latest:{generation}:{uuid}', None
+    else:
+        key, ttl = f'{version}:{uuid}', VERSIONED_SPECIMEN_TTL
+
+    data = cache.get_or_set(
+        key, partial(_find_specimen, uuid, version), ttl=ttl, cache_none=False
+    )
+    if data is None:
+        return None
+    return Record(data['_id'], version, data, get_specimen_resource_id())
+
+
 # define some custom fields that are set on the resource
 TITLE_FIELD = '_title_field'
 SUBTITLE_FIELD = '_subtitle_field'
@@ -85,8 +293,7 @@ DEFAULT_RIGHTS = '&copy; The Trustees of the Natural History Museum, London'
 DEFAULT_IMAGE_LICENSE_ID = 'cc-by'
 
 
-@dataclass
-class RecordImage:
+class RecordImage(NamedTuple):
     """
     Simple class representing an image associated with a record.
     """
@@ -96,36 +303,156 @@ class RecordImage:
     license_title: str
     license_url: str
     rights: str = DEFAULT_RIGHTS
-    record: Optional['Record'] = None
     is_mss_image: bool = False
 
     @property
     def is_iiif_image(self) -> bool:
+        """
+        Returns whether the image is served by the IIIF image server (either because
+        it's an MSS image or because its URL is on the configured image server).
+
+        :returns: True if the image is a IIIF image, False if not
+        """
         return self.is_mss_image or self.url.startswith(
             toolkit.config.get('ckanext.iiif.image_server_url')
         )
 
     @property
     def download_url(self) -> str:
+        """
+        Returns the URL to download the original image from.
+
+        :returns: the URL
+        """
         return f'{self.url}/original' if self.is_iiif_image else self.url
 
     @property
     def preview_url(self) -> str:
+        """
+        Returns the URL of a preview sized version of the image.
+
+        :returns: the URL
+        """
         return f'{self.url}/preview' if self.is_iiif_image else self.url
 
     @property
     def thumbnail_url(self) -> str:
+        """
+        Returns the URL of a thumbnail sized version of the image.
+
+        :returns: the URL
+        """
         return f'{self.url}/thumbnail' if self.is_iiif_image else self.url
 
 
+class RecordImages(Sequence):
+    """
+    The images associated with a record. Rather than holding a RecordImage object per
+    image, the values are stored in parallel tuples (which mostly contain references to
+    strings shared with other images and records) and the RecordImage objects are only
+    created when they are accessed.
+    """
+
+    __slots__ = ('urls', 'titles', 'license_titles', 'license_urls', 'rights', 'is_mss')
+
+    def __init__(
+        self,
+        urls: Iterable[str] = (),
+        titles: Iterable[str] = (),
+        license_titles: Iterable[str] = (),
+        license_urls: Iterable[str] = (),
+        rights: Iterable[str] = (),
+        is_mss: bool = False,
+    ):
+        """
+        :param urls: the image URLs
+        :param titles: the image titles
+        :param license_titles: the titles of the images' licences
+        :param license_urls: the URLs of the images' licences
+        :param rights: the images' rights statements
+        :param is_mss: whether the images are all MSS images or not
+        """
+        self.urls = tuple(urls)
+        self.titles = tuple(titles)
+        self.license_titles = tuple(license_titles)
+        self.license_urls = tuple(license_urls)
+        self.rights = tuple(rights)
+        self.is_mss = is_mss
+
+    def __len__(self) -> int:
+        """
+        :returns: the number of images
+        """
+        return len(self.urls)
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[RecordImage, List[RecordImage]]:
+        """
+        Creates the RecordImage object(s) for the image(s) at the given index or slice.
+
+        :param index: an index or a slice
+        :returns: a RecordImage, or a list of RecordImages if a slice is given
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return RecordImage(
+            self.urls[index],
+            self.titles[index],
+            self.license_titles[index],
+            self.license_urls[index],
+            self.rights[index],
+            self.is_mss,
+        )
+
+
+@lru_cache(maxsize=64)
+def get_image_license(chosen_license: Optional[str]) -> DefaultLicense:
+    """
+    Returns the licence object for the given image licence value from a resource. The
+    licence objects are cached so that they are shared between all the records in a
+    resource rather than looked up for each one.
+
+    :param chosen_license: the value of the image licence field on the resource, can be
+        None
+    :returns: the licence model object, or the default image licence if the value
+        doesn't match a licence
+    """
+    license_registry = model.Package.get_license_register()
+    id_options = []
+    if chosen_license:
+        # add the shortened form too in case we get a hit on that
+        id_options.extend([chosen_license, chosen_license[:5].lower()])
+    for license_id in id_options:
+        if license_id in license_registry:
+            return license_registry[license_id]
+    return license_registry[DEFAULT_IMAGE_LICENSE_ID]
+
+
 class Record:
     """
     A model class for a record.
 
     This class allows access to various information related to the record using the
-    resource and package and will lazily load those entities as required.
+    resource and package and will lazily load those entities as required. Records in a
+    RecordBatch share the batch's resource and package dicts and context.
     """
 
+    __slots__ = (
+        'id',
+        'version',
+        '_data',
+        '_resource_id',
+        '_resource',
+        '_package_id',
+        '_package_name',
+        '_package_id_or_name',
+        '_package',
+        '_images',
+        '_context',
+        '_batch',
+    )
+
     def __init__(
         self,
         record_id: int,
@@ -138,6 +465,7 @@ class Record:
         resource: Optional[dict] = None,
         package: Optional[dict] = None,
         context: Optional[dict] = None,
+        batch: Optional['RecordBatch'] = None,
     ):
         """
         The only required init parameter is the record_id, however, most of the related
@@ -157,6 +485,8 @@ class Record:
         :param resource: the resource this record is from as a dict
         :param package: the package this record is from as a dict
         :param context: a context to use for any action API calls
+        :param batch: the RecordBatch this record is part of, if given, the resource,
+            package and context are taken from it when needed
         """
         self.id = record_id
         self.version = version
@@ -167,17 +497,37 @@ class Record:
         self._package_name = package_name
         self._package_id_or_name = package_id_or_name
         self._package = package
-        self._image_license = None
         self._images = None
-        self._geojson = None
-        self._context = (
-            context
-            if context
-            else {
+        self._batch = batch
+        if context:
+            self._context = context
+        elif batch is not None:
+            self._context = batch.context
+        else:
+            self._context = {
                 'user': toolkit.c.user or toolkit.c.author,
                 'auth_user_obj': toolkit.c.userobj,
             }
-        )
+
+    @classmethod
+    def load_many(
+        cls,
+        resource_id: str,
+        record_ids: Iterable[Union[int, str]],
+        version: Optional[int] = None,
+        context: Optional[dict] = None,
+    ) -> 'RecordBatch':
+        """
+        Loads the records with the given IDs from the given resource. See
+        RecordBatch.load for details.
+
+        :param resource_id: the resource ID
+        :param record_ids: the record IDs
+        :param version: the version to get the records at (default: None, the latest)
+        :param context: a context to use for any action API calls
+        :returns: a RecordBatch
+        """
+        return RecordBatch.load(resource_id, record_ids, version, context)
 
     @property
     def data(self) -> dict:
@@ -206,8 +556,11 @@ class Record:
         """
         Sets up the resource data.
         """
+        if self._batch is not None:
+            self._resource = self._batch.resource
+            return
         data_dict = dict(id=self.resource_id)
-        self._resource = toolkit.get_action('resource_show')(self._context, data_dict)
+        self._resource = get_memoized_action('resource_show')(self._context, data_dict)
 
     def _set_package(self):
         """
@@ -218,17 +571,23 @@ class Record:
         the resource model object. If none of these strategies work, an Exception is
         thrown.
         """
+        if self._batch is not None:
+            self._package = self._batch.package
+            self._package_id = self._package['id']
+            self._package_name = self._package['name']
+            return
         id_or_name = (
             self._package_id or self._package_name or self._package_id_or_name or None
         )
-        # if we don't have an id or a name for the package, see if we can use the resource
+        # if we don't have an id or a name for the package, see if we can use the
+        # resource
         if not id_or_name and self._resource_id:
             resource = model.Resource.get(self.resource_id)
             if resource:
                 id_or_name = resource.get_package_id()
         if not id_or_name:
             raise Exception('Package id or name not available')
-        self._package = toolkit.get_action('package_show')(
+        self._package = get_memoized_action('package_show')(
             self._context, dict(id=id_or_name)
         )
         self._package_id = self._package['id']
@@ -285,24 +644,12 @@ class Record:
     def image_license(self) -> DefaultLicense:
         """
         Retrieves the default image license for the record based on the image licence
-        field set on the resource.
+        field set on the resource. The same object is shared by all the records from a
+        resource.
 
         :returns: the licence model object
         """
-        if not self._image_license:
-            license_registry = model.Package.get_license_register()
-            id_options = []
-            chosen_license = self.resource.get(IMAGE_LICENCE_FIELD)
-            if chosen_license:
-                # add the shortened form too in case we get a hit on that
-                id_options.extend([chosen_license, chosen_license[:5].lower()])
-            for license_id in id_options:
-                if license_id in license_registry:
-                    self._image_license = license_registry[license_id]
-                    break
-            else:
-                self._image_license = license_registry[DEFAULT_IMAGE_LICENSE_ID]
-        return self._image_license
+        return get_image_license(self.resource.get(IMAGE_LICENCE_FIELD))
 
     @property
     def image_field(self) -> Optional[str]:
@@ -320,59 +667,55 @@ class Record:
         )
 
     @property
-    def images(self) -> List[RecordImage]:
+    def images(self) -> RecordImages:
         """
-        Retrieves a list of RecordImages associated with this record.
+        Retrieves the images associated with this record.
 
-        :returns: a list of RecordImage objects
+        :returns: a RecordImages object, a sequence of RecordImage objects
         """
         if self._images is None:
-            self._images = []
-            # TODO: there used to be a check that this wasn't _id here, do we really need that?
+            urls = []
+            titles = []
+            license_titles = []
+            license_urls = []
+            rights = []
+            is_mss_image = False
+            # TODO: there used to be a check that this wasn't _id here, do we really
+            #       need that?
             if self.image_field is not None:
                 raw_images = self.data.get(self.image_field)
                 if raw_images:
                     is_mss_image = is_collection_resource_id(self._resource_id)
+                    image_license = self.image_license
                     if isinstance(raw_images, str):
                         # if we have a delimiter, use it to split the images
                         delimiter = self.resource.get(IMAGE_DELIMETER_FIELD)
                         images = (
                             raw_images.split(delimiter) if delimiter else [raw_images]
                         )
+                        title = self.title
                         for image in filter(None, (image.strip() for image in images)):
-                            self._images.append(
-                                RecordImage(
-                                    image,
-                                    self.title,
-                                    self.image_license.title,
-                                    self.image_license.url,
-                                    DEFAULT_RIGHTS,
-                                    self,
-                                    is_mss_image,
-                                )
-                            )
+                            urls.append(image)
+                            titles.append(title)
+                            license_titles.append(image_license.title)
+                            license_urls.append(image_license.url)
+                            rights.append(DEFAULT_RIGHTS)
                     elif isinstance(raw_images, list):
                         for image in raw_images:
                             image_url = image.get('identifier')
                             if image_url:
-                                license_title = image.get(
-                                    'license', self.image_license.title
+                                urls.append(image_url)
+                                titles.append(image.get('title', self.title))
+                                license_titles.append(
+                                    image.get('license', image_license.title)
                                 )
-                                licence_url = image.get(
-                                    'license', self.image_license.url
-                                )
-                                rights = image.get('rightsHolder', DEFAULT_RIGHTS)
-                                self._images.append(
-                                    RecordImage(
-                                        image_url,
-                                        image.get('title', self.title),
-                                        license_title,
-                                        licence_url,
-                                        rights,
-                                        self,
-                                        is_mss_image,
-                                    )
+                                license_urls.append(
+                                    image.get('license', image_license.url)
                                 )
+                                rights.append(image.get('rightsHolder', DEFAULT_RIGHTS))
+            self._images = RecordImages(
+                urls, titles, license_titles, license_urls, rights, is_mss_image
+            )
         return self._images
 
     @property
@@ -408,3 +751,183 @@ class Record:
         # create a piece of GeoJSON to point at the specific record location on a map
         # (note the longitude then latitude ordering required by GeoJSON)
         return dict(type='Point', coordinates=[longitude, latitude])
+
+
+class RecordBatch(Sequence):
+    """
+    A group of records from the same resource at the same version. The resource and
+    package dicts and the context are only resolved once and are then shared by all the
+    records in the batch, which keeps memory use down when working with lots of records
+    (for example when creating sitemaps, exports and gallery feeds).
+    """
+
+    __slots__ = (
+        'resource_id',
+        'version',
+        'context',
+        '_resource',
+        '_package',
+        '_records',
+    )
+
+    def __init__(
+        self,
+        resource_id: str,
+        records: Iterable[dict] = (),
+        version: Optional[int] = None,
+        resource: Optional[dict] = None,
+        package: Optional[dict] = None,
+        context: Optional[dict] = None,
+    ):
+        """
+        :param resource_id: the resource ID the records come from
+        :param records: the records' data dicts, each must include the _id field
+        :param version: the version of the records
+        :param resource: the resource dict, if not given it is retrieved when needed
+        :param package: the package dict, if not given it is retrieved when needed
+        :param context: a context to use for any action API calls, defaults to a context
+            for the current user
+        """
+        self.resource_id = resource_id
+        self.version = version
+        self.context = (
+            context
+            if context
+            else {
+                'user': toolkit.c.user or toolkit.c.author,
+                'auth_user_obj': toolkit.c.userobj,
+            }
+        )
+        self._resource = resource
+        self._package = package
+        self._records = [self._create(data) for data in records]
+
+    @classmethod
+    def load(
+        cls,
+        resource_id: str,
+        record_ids: Iterable[Union[int, str]],
+        version: Optional[int] = None,
+        context: Optional[dict] = None,
+        page_size: int = 1000,
+    ) -> 'RecordBatch':
+        """
+        Loads the records with the given IDs from the given resource using an _id terms
+        query rather than getting each record on its own. See load_by for details.
+
+        :param resource_id: the resource ID
+        :param record_ids: the record IDs
+        :param version: the version to get the records at (default: None, the latest)
+        :param context: a context to use for any action API calls
+        :param page_size: the maximum number of IDs to search for at once
+        :returns: a RecordBatch
+        """
+        return cls.load_by(resource_id, '_id', record_ids, version, context, page_size)
+
+    @classmethod
+    def load_by(
+        cls,
+        resource_id: str,
+        field: str,
+        values: Iterable[Union[int, str]],
+        version: Optional[int] = None,
+        context: Optional[dict] = None,
+        page_size: int = 1000,
+    ) -> 'RecordBatch':
+        """
+        Loads the records from the given resource which have one of the given values in
+        the given field using a terms query (one search per page_size values). The
+        records are returned in the order their values were given, values which
+        couldn't be found are left out and only the first record found for each value is
+        included.
+
+        :param resource_id: the resource ID
+        :param field: the field to search, e.g. _id or occurrenceID
+        :param values: the values to search for
+        :param version: the version to get the records at (default: None, the latest)
+        :param context: a context to use for any action API calls
+        :param page_size: the maximum number of values to search for at once
+        :returns: a RecordBatch
+        """
+        batch = cls(resource_id, version=version, context=context)
+        # remove duplicates while keeping the order
+        values = list(dict.fromkeys(str(value) for value in values))
+        found = {}
+        for start in range(0, len(values), page_size):
+            chunk = values[start : start + page_size]
+            search_data_dict = {
+                'resource_id': resource_id,
+                'filters': {field: chunk},
+                'limit': len(chunk),
+                'version': version,
+            }
+            search_result = toolkit.get_action('vds_basic_query')(
+                dict(batch.context), search_data_dict
+            )
+            for data in search_result['records']:
+                found.setdefault(str(data.get(field)), data)
+        for value in values:
+            if value in found:
+                batch.add(found[value])
+        return batch
+
+    def _create(self, data: dict) -> Record:
+        return Record(data['_id'], self.version, data, self.resource_id, batch=self)
+
+    def add(self, data: dict) -> Record:
+        """
+        Adds a record to the batch.
+
+        :param data: the record's data, this must include the _id field
+        :returns: the new Record object
+        """
+        record = self._create(data)
+        self._records.append(record)
+        return record
+
+    @property
+    def resource(self) -> dict:
+        """
+        Returns the resource dict the records are from, this is only looked up once for
+        the whole batch.
+
+        :returns: the resource dict
+        """
+        if self._resource is None:
+            action = get_memoized_action('resource_show')
+            self._resource = action(dict(self.context), {'id': self.resource_id})
+        return self._resource
+
+    @property
+    def package(self) -> dict:
+        """
+        Returns the package dict the records' resource is in, this is only looked up
+        once for the whole batch.
+
+        :returns: the package dict
+        """
+        if self._package is None:
+            action = get_memoized_action('package_show')
+            self._package = action(
+                dict(self.context), {'id': self.resource['package_id']}
+            )
+        return self._package
+
+    def __len__(self) -> int:
+        """
+        :returns: the number of records in the batch
+        """
+        return len(self._records)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Record, List[Record]]:
+        """
+        :param index: an index or a slice
+        :returns: the Record at the index, or a list of Records if a slice is given
+        """
+        return self._records[index]
+
+    def __iter__(self) -> Iterator[Record]:
+        """
+        :returns: an iterator over the records in the batch
+        """
+        return iter(self._records)
@@ -4,34 +4,89 @@
 # This file is part of ckanext-nhm
 # Created by the Natural History Museum in London, UK
 
+from typing import Dict, Iterable, Optional
+
+from ckan.plugins import toolkit
+
 import ckanext.nhm.views as nhm_views
+from ckanext.nhm.lib.cache import get_cache
 
 
-def resource_view_get_view(resource):
+class ViewRegistry:
+    """
+    Maps resource IDs and formats to the view objects used to display them. The view
+    objects don't hold any state of their own so one instance of each view is created
+    and shared.
     """
-    Retrieve the controller for a resource. Try and match on resource ID, or on.
 
-    format so we can provide a custom controller for all format types - e.g. DwC.
+    def __init__(self, view_classes: Iterable[type]):
+        """
+        :param view_classes: the DefaultView subclasses to register, when more than one
+            class has the same resource ID or format, the first one wins
+        """
+        self.default = nhm_views.DefaultView()
+        self.by_resource_id: Dict[str, nhm_views.DefaultView] = {}
+        self.by_format: Dict[str, nhm_views.DefaultView] = {}
+        for cls in view_classes:
+            view = cls()
+            if cls.resource_id:
+                self.by_resource_id.setdefault(cls.resource_id, view)
+            if cls.format:
+                self.by_format.setdefault(cls.format, view)
 
-    :param resource:
+    def get(self, resource_id: str, resource_format: Optional[str] = None):
+        """
+        Returns the view for the given resource. A view for the specific resource ID is
+        preferred over a view for the resource's format (e.g. DwC).
+
+        :param resource_id: the resource's ID
+        :param resource_format: the resource's format
+        :returns: a view object
+        """
+        view = self.by_resource_id.get(resource_id)
+        if view is None:
+            view = self.by_format.get(resource_format, self.default)
+        return view
+
+
+_registry: Optional[ViewRegistry] = None
 
-    :returns: controller class
+
+def build_view_registry() -> ViewRegistry:
+    """
+    Creates the view registry from the subclasses of DefaultView. This is called when
+    the plugin is configured so that the resource IDs set on the view classes are
+    available.
+
+    :returns: the new ViewRegistry
+    """
+    global _registry
+    _registry = ViewRegistry(nhm_views.DefaultView.__subclasses__())
+    return _registry
+
+
+def get_view_registry() -> ViewRegistry:
+    """
+    Returns the view registry, building it if it hasn't been built yet.
+
+    :returns: the ViewRegistry
     """
+    if _registry is None:
+        return build_view_registry()
+    return _registry
 
-    subclasses = nhm_views.DefaultView.__subclasses__()
 
-    for cls in subclasses:
-        # Does the resource ID match the record controller
-        if cls.resource_id == resource['id']:
-            return cls()
+def resource_view_get_view(resource):
+    """
+    Retrieve the controller for a resource. Try and match on resource ID, or on.
+
+    format so we can provide a custom controller for all format types - e.g. DwC.
 
-    # Or do we have a controller for a particular format type (eg. DwC)
-    # Run in separate loop so this is lower specificity
-    for cls in subclasses:
-        if cls.format == resource['format']:
-            return cls()
+    :param resource:
 
-    return nhm_views.DefaultView()
+    :returns: controller object
+    """
+    return get_view_registry().get(resource['id'], resource.get('format'))
 
 
 def resource_view_get_filter_options(resource):
@@ -43,3 +98,49 @@ def resource_view_get_filter_options(resource):
     """
     view_cls = resource_view_get_view(resource)
     return view_cls.filter_options
+
+
+def _get_resource_format_cache():
+    # the formats are shared through redis so that forgetting them when a resource is
+    # updated affects every process, the short local ttl limits how long other
+    # processes can keep using their own copy of an old format
+    return get_cache(
+        'resource_format', maxsize=1024, ttl=3600, use_redis=True, local_ttl=60
+    )
+
+
+def get_filter_options_by_id(resource_id: str):
+    """
+    Return additional filter options for a resource view using just the resource's ID.
+    Resources with their own view don't need to be looked up at all and the formats of
+    other resources are cached so that this doesn't need to call resource_show each
+    time.
+
+    :param resource_id: the resource ID
+    :returns: OrderedDict of filter options
+    """
+    registry = get_view_registry()
+    view = registry.by_resource_id.get(resource_id)
+    if view is None:
+
+        def get_format():
+            resource = toolkit.get_action('resource_show')({}, {'id': resource_id})
+            return resource.get('format')
+
+        resource_format = _get_resource_format_cache().get_or_set(
+            resource_id, get_format
+        )
+        view = registry.get(resource_id, resource_format)
+    return view.filter_options
+
+
+def forget_resource_formats(resource_ids: Iterable[str]):
+    """
+    Removes the cached formats of the given resources from the shared cache, this should
+    be called when the resources are updated.
+
+    :param resource_ids: the resource IDs
+    """
+    cache = _get_resource_format_cache()
+    for resource_id in resource_ids:
+        cache.delete(resource_id)
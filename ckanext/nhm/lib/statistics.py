@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import fcntl
+import json
+import logging
+import operator
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ckan.plugins import toolkit
+
+from ckanext.nhm.lib.concurrency import run_concurrently
+
+log = logging.getLogger(__name__)
+
+# the collection codes we report on in the collection stats
+COLLECTION_CODES = ('PAL', 'MIN', 'BMNH(E)', 'ZOO', 'BOT')
+
+# the record history starts on 01/08/2017 (as ms epoch) and has a point every week
+RECORD_HISTORY_START = 1501545600000
+RECORD_HISTORY_STEP = 604800000
+# the number of recent weeks which can be counted when the history is read during a
+# request, older missing weeks are only counted by the update-record-history command
+RECORD_HISTORY_RECENT_WEEKS = 4
+
+
+def get_collection_stats(
+    collections: Iterable[Tuple[str, Optional[str]]],
+    specimen_resource_id: Optional[str],
+) -> dict:
+    """
+    Get collection stats, including collection codes and collection totals.
+
+    The totals and the collection code counts are retrieved using a single
+    multi-resource count and a single collectionCode aggregation on the specimen
+    resource. If this fails, the individual counts are made concurrently instead.
+
+    :param collections: a list of (name, resource ID) pairs to get the totals for
+    :param specimen_resource_id: the ID of the specimen resource
+    :returns: a dict of the name -> total for each collection, the overall total as
+        "total" and an OrderedDict of collection code counts, in descending count order,
+        as "collectionCodes"
+    """
+    collections = list(collections)
+    try:
+        totals, code_counts = _get_aggregated_counts(collections, specimen_resource_id)
+    except Exception:
+        log.warning(
+            'Could not get aggregated collection stats, using separate counts instead',
+            exc_info=True,
+        )
+        totals, code_counts = _get_separate_counts(collections, specimen_resource_id)
+
+    stats = dict(totals)
+    stats['total'] = sum(totals.values())
+    stats['collectionCodes'] = OrderedDict(
+        sorted(code_counts.items(), key=operator.itemgetter(1), reverse=True)
+    )
+    return stats
+
+
+def _get_aggregated_counts(
+    collections, specimen_resource_id
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Gets the collection totals from one multi-resource count and the collection code
+    counts from one terms aggregation.
+
+    :param collections: a list of (name, resource ID) pairs
+    :param specimen_resource_id: the ID of the specimen resource
+    :returns: a 2-tuple of the totals dict and the collection code counts dict
+    """
+    resource_ids = [resource_id for _, resource_id in collections if resource_id]
+    counts = {}
+    if resource_ids:
+        result = toolkit.get_action('vds_multi_count')(
+            {}, {'resource_ids': resource_ids}
+        )
+        # this is only present if the datastore version we're using supports it,
+        # otherwise we need to use the fallback
+        counts = result['counts']
+    totals = {name: counts.get(resource_id, 0) for name, resource_id in collections}
+
+    code_counts = dict.fromkeys(COLLECTION_CODES, 0)
+    if specimen_resource_id:
+        result = toolkit.get_action('vds_basic_query')(
+            {},
+            {
+                'resource_id': specimen_resource_id,
+                'limit': 0,
+                'facets': ['collectionCode'],
+                'facet_limits': {'collectionCode': 50},
+            },
+        )
+        lookup = {code.lower(): code for code in COLLECTION_CODES}
+        for value, count in result['facets']['collectionCode']['values'].items():
+            # match case-insensitively to mirror the string_equals filter the separate
+            # counts use
+            code = lookup.get(value.lower())
+            if code is not None:
+                code_counts[code] += count
+
+    return totals, code_counts
+
+
+def _get_separate_counts(
+    collections, specimen_resource_id
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Gets the collection totals and collection code counts using a count request for
+    each, run concurrently.
+
+    :param collections: a list of (name, resource ID) pairs
+    :param specimen_resource_id: the ID of the specimen resource
+    :returns: a 2-tuple of the totals dict and the collection code counts dict
+    """
+    calls = [partial(_count_resource, resource_id) for _, resource_id in collections]
+    calls.extend(
+        partial(_count_collection_code, specimen_resource_id, code)
+        for code in COLLECTION_CODES
+    )
+    results = run_concurrently(calls)
+    totals = {
+        name: count
+        for (name, _), count in zip(collections, results[: len(collections)])
+    }
+    code_counts = dict(zip(COLLECTION_CODES, results[len(collections) :]))
+    return totals, code_counts
+
+
+def _count_resource(resource_id: Optional[str]) -> int:
+    """
+    Count the records in the given resource.
+
+    :param resource_id: the resource ID
+    :returns: the number of records, 0 if the resource isn't a datastore resource
+    """
+    # we use the same params for both the vds_resource_check and the vds_basic_count
+    # and the limit param is just ignored by vds_resource_check
+    params = {'resource_id': resource_id, 'limit': 0}
+    # check if the resource is a valid datastore resource first otherwise the call
+    # to vds_basic_count could error out
+    if toolkit.get_action('vds_resource_check')({}, params):
+        return toolkit.get_action('vds_basic_count')({}, params)
+    return 0
+
+
+def _count_collection_code(specimen_resource_id: str, collection_code: str) -> int:
+    """
+    Count the records in the specimen resource with the given collection code.
+
+    :param specimen_resource_id: the ID of the specimen resource
+    :param collection_code: the collection code
+    :returns: the number of records
+    """
+    params = {
+        'resource_ids': [specimen_resource_id],
+        'limit': 0,
+        'query': {
+            'filters': {
+                'and': [
+                    {
+                        'string_equals': {
+                            'fields': ['collectionCode'],
+                            'value': collection_code,
+                        }
+                    }
+                ]
+            }
+        },
+    }
+    return toolkit.get_action('vds_multi_count')({}, params)['total']
+
+
+def get_record_history_path() -> Optional[str]:
+    """
+    Returns the path of the file the weekly record count history is stored in. This can
+    be set using the ckanext.nhm.record_history.path config option and defaults to a
+    file in the CKAN storage path. If neither are set, None is returned.
+
+    :returns: the path or None
+    """
+    path = toolkit.config.get('ckanext.nhm.record_history.path')
+    if path:
+        return path
+    storage_path = toolkit.config.get('ckan.storage_path')
+    if storage_path:
+        return os.path.join(storage_path, 'nhm', 'record_history.json')
+    return None
+
+
+def _read_record_history(path: Optional[str]) -> List[List[int]]:
+    """
+    Reads the stored record history from the given path.
+
+    :param path: the path to read from (can be None)
+    :returns: a list of [version, count] pairs in version order, empty if there isn't a
+        stored history or it can't be read
+    """
+    if path is None or not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        log.warning(f'Could not read the record history from {path}', exc_info=True)
+        return []
+
+
+def _write_record_history(path: str, history: List[List[int]]):
+    """
+    Writes the record history to the given path. The history is written to a temporary
+    file first and then moved into place so that readers never see a partial file.
+
+    :param path: the path to write to
+    :param history: a list of [version, count] pairs
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.record_history')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(history, f)
+        os.replace(temp_path, path)
+    except OSError:
+        log.warning(f'Could not write the record history to {path}', exc_info=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+@contextmanager
+def _lock_record_history(path: Optional[str], wait: bool) -> Iterator[bool]:
+    """
+    Locks the record history stored at the given path using a lock file next to it so
+    that only one process (or thread) extends the history at a time.
+
+    :param path: the path of the record history (can be None, in which case nothing is
+        locked as nothing will be stored)
+    :param wait: whether to wait for the lock if it's already held
+    :returns: a context manager which yields whether the lock was acquired
+    """
+    if path is None:
+        yield True
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.lock', 'w') as lock_file:
+        try:
+            fcntl.flock(
+                lock_file, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB
+            )
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def update_record_history(
+    now: Optional[int] = None, backfill: bool = True
+) -> List[List[int]]:
+    """
+    Extends the stored weekly record count history with any weeks that are missing and
+    returns the full history. The count at a past version never changes so the weeks
+    already stored are never counted again, only the new weeks are.
+
+    Counting the whole history takes a long time, so it should be seeded using the
+    update-record-history command (which backfills). Without backfilling, only missing
+    weeks from the last RECORD_HISTORY_RECENT_WEEKS are counted and nothing is counted
+    if another process is already updating the history.
+
+    :param now: the current time as a ms epoch, defaults to the actual current time
+    :param backfill: whether to count every missing week (default: True), or just the
+        recent ones
+    :returns: a list of [version, count] pairs in version order
+    """
+    if now is None:
+        now = int(time.time() * 1000)
+    path = get_record_history_path()
+
+    with _lock_record_history(path, wait=backfill) as locked:
+        history = _read_record_history(path)
+        if not locked:
+            return history
+
+        first = RECORD_HISTORY_START
+        if not backfill:
+            first = max(first, now - RECORD_HISTORY_RECENT_WEEKS * RECORD_HISTORY_STEP)
+        stored = {version for version, _ in history}
+        missing = [
+            version
+            for version in range(RECORD_HISTORY_START, now, RECORD_HISTORY_STEP)
+            if version >= first and version not in stored
+        ]
+        if not missing:
+            return history
+
+        count_action = toolkit.get_action('vds_multi_count')
+        history.extend(
+            [version, count_action({}, {'version': version})['total']]
+            for version in missing
+        )
+        history.sort()
+
+        if path is None:
+            log.warning(
+                'No storage path configured, the record history will not be stored'
+            )
+        else:
+            _write_record_history(path, history)
+        return history
+
+
+def get_record_history() -> List[dict]:
+    """
+    Returns a list of dictionaries containing the number of records available each week
+    starting from 01/08/2017 and ending now. Only the most recent missing weeks are
+    counted, see update_record_history.
+
+    :returns: a list of dicts with a date and a count
+    """
+    return [
+        {'date': datetime.fromtimestamp(version / 1000), 'count': count}
+        for version, count in update_record_history(backfill=False)
+    ]
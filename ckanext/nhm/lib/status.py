@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from ckan.plugins import toolkit
+
+from ckanext.nhm.lib.cache import get_cache
+from ckanext.nhm.lib.concurrency import in_app_context
+from ckanext.nhm.lib.utils import get_gbif_status, get_iiif_status, get_ingest_status
+
+log = logging.getLogger(__name__)
+
+# the key the latest status snapshot is stored under
+SNAPSHOT_KEY = 'snapshot'
+# the default number of seconds after which a snapshot is refreshed
+DEFAULT_REFRESH_INTERVAL = 300
+
+# makes sure only one background refresh runs at a time in each process
+_refresh_lock = threading.Lock()
+
+
+def get_status_store():
+    """
+    Returns the store the status snapshot is kept in. This is shared between processes
+    using Redis (if available) so that the scheduled refresh command's results are seen
+    by all the web workers. Values are only kept in each process for a short time so
+    that new snapshots are picked up quickly.
+
+    :returns: a TwoTierCache
+    """
+    return get_cache('status', maxsize=4, use_redis=True, local_ttl=30)
+
+
+def get_refresh_interval() -> int:
+    """
+    Returns the number of seconds after which the status snapshot is considered old
+    enough to be refreshed in the background. This can be set using the
+    ckanext.nhm.status.refresh_interval config option.
+
+    :returns: the number of seconds
+    """
+    return toolkit.asint(
+        toolkit.config.get(
+            'ckanext.nhm.status.refresh_interval', DEFAULT_REFRESH_INTERVAL
+        )
+    )
+
+
+def refresh_status() -> dict:
+    """
+    Checks the status of the IIIF server, the collections data ingest and the GBIF
+    dataset and stores the results in the status store. This makes requests to other
+    services and can be slow so it should not be called while handling a web request.
+    If a check fails, the previous result for it is kept.
+
+    :returns: the new snapshot
+    """
+    previous = get_status_store().get(SNAPSHOT_KEY, None) or {}
+    snapshot = {'checked': time.time()}
+
+    # the ingest status is cached per process, clear it to get an up to date result
+    get_ingest_status.cache_clear()
+    checks = {
+        'iiif': get_iiif_status,
+        'ingest': get_ingest_status,
+        'gbif': lambda: list(get_gbif_status()),
+    }
+    for name, check in checks.items():
+        try:
+            snapshot[name] = check()
+        except Exception:
+            log.warning(f'The {name} status check failed', exc_info=True)
+            snapshot[name] = previous.get(name)
+
+    get_status_store().set(SNAPSHOT_KEY, snapshot)
+    return snapshot
+
+
+def _refresh_in_background():
+    """
+    Starts a thread which refreshes the status snapshot, unless one is already running
+    in this process.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        return
+
+    def refresh():
+        try:
+            refresh_status()
+        except Exception:
+            log.exception('Failed to refresh the status snapshot')
+        finally:
+            _refresh_lock.release()
+
+    try:
+        thread = threading.Thread(
+            target=in_app_context(refresh), name='nhm-status-refresh', daemon=True
+        )
+        thread.start()
+    except Exception:
+        _refresh_lock.release()
+        log.warning('Failed to start the status refresh thread', exc_info=True)
+
+
+def get_last_status() -> Optional[dict]:
+    """
+    Returns the last status snapshot without running any of the checks. If there isn't
+    a snapshot or it is older than the refresh interval, a refresh is started in the
+    background and the old snapshot (or None) is returned straight away.
+
+    :returns: a dict with the time the checks were made under "checked" and the
+        results of the iiif, ingest and gbif checks, or None if there isn't a snapshot
+        yet
+    """
+    snapshot = get_status_store().get(SNAPSHOT_KEY, None)
+    if snapshot is None or time.time() - snapshot['checked'] > get_refresh_interval():
+        _refresh_in_background()
+    return snapshot
+
+
+def _unknown_report(label: str, help_text: str, group: Optional[str] = None) -> dict:
+    report = {
+        'label': label,
+        'value': toolkit._('unknown'),
+        'help': help_text,
+        'state': 'ok',
+    }
+    if group:
+        report['group'] = group
+    return report
+
+
+def get_status_reports() -> List[dict]:
+    """
+    Creates the status reports from the last status snapshot. Each report's help text
+    includes the time its status was last checked. Statuses which haven't been checked
+    yet are reported as unknown.
+
+    :returns: a list of status report dicts
+    """
+    snapshot = get_last_status() or {}
+    checked = snapshot.get('checked')
+    if checked is not None:
+        checked_text = toolkit._(' Last checked: {}.').format(
+            datetime.fromtimestamp(checked).strftime('%Y-%m-%d %H:%M')
+        )
+    else:
+        checked_text = ''
+
+    reports = []
+    images_group = toolkit._('Images')
+
+    iiif_help = toolkit._(
+        'The IIIF server provides most of the images in datasets (some are '
+        'externally hosted)'
+    )
+    specimens_help = toolkit._(
+        'Specimen images are a specific subset of images used primarily in '
+        'the Collection specimens and Index lots datasets'
+    )
+    iiif_health = snapshot.get('iiif')
+    if iiif_health is None:
+        reports.append(
+            _unknown_report(toolkit._('Image server'), iiif_help, images_group)
+        )
+        reports.append(
+            _unknown_report(toolkit._('Specimen images'), specimens_help, images_group)
+        )
+    else:
+        # overall image server status
+        if iiif_health['ping'] and iiif_health['status'] == ':)':
+            iiif_status_text = toolkit._('available')
+            iiif_status_type = 'good'
+        elif iiif_health['ping'] and iiif_health['status'] != ':)':
+            iiif_status_text = toolkit._('available (issues)')
+            iiif_status_type = 'ok'
+        else:
+            iiif_status_text = toolkit._('unavailable')
+            iiif_status_type = 'bad'
+
+        reports.append(
+            {
+                'label': toolkit._('Image server'),
+                'value': iiif_status_text,
+                'group': images_group,
+                'help': iiif_help + '.' + checked_text,
+                'state': iiif_status_type,
+            }
+        )
+
+        # specimen images
+        if iiif_health['ping'] and iiif_health['specimens'] == ':)':
+            specimens_status_text = toolkit._('available')
+            specimens_status_type = 'good'
+        else:
+            specimens_status_text = toolkit._('unavailable')
+            specimens_status_type = 'bad'
+
+        reports.append(
+            {
+                'label': toolkit._('Specimen images'),
+                'value': specimens_status_text,
+                'group': images_group,
+                'help': specimens_help + '.' + checked_text,
+                'state': specimens_status_type,
+            }
+        )
+
+    # ingest status
+    ingest_help = toolkit._(
+        'The last update to the collections datasets. These datasets are '
+        'not usually updated on Fridays or Saturdays.'
+    )
+    ingest_status = snapshot.get('ingest')
+    if ingest_status is None:
+        reports.append(
+            _unknown_report(toolkit._('Collections data ingest'), ingest_help)
+        )
+    else:
+        reports.append(
+            {
+                'label': toolkit._('Collections data ingest'),
+                'value': ingest_status['current_version'],
+                'help': ingest_help
+                + toolkit._(' Next ingest: {}.').format(ingest_status['next_ingest'])
+                + checked_text,
+                'state': ingest_status['state'],
+            }
+        )
+
+    # gbif dataset status
+    gbif_help = toolkit._('The last time the GBIF dataset was updated.')
+    gbif_status = snapshot.get('gbif')
+    if gbif_status is None:
+        reports.append(_unknown_report(toolkit._('GBIF updated'), gbif_help))
+    else:
+        gbif_status_text, gbif_status_type = gbif_status
+        reports.append(
+            {
+                'label': toolkit._('GBIF updated'),
+                'value': gbif_status_text,
+                'help': gbif_help + checked_text,
+                'state': gbif_status_type,
+            }
+        )
+
+    return reports
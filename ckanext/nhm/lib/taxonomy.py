@@ -7,6 +7,7 @@
 import abc
 import re
 from collections import OrderedDict
+from functools import lru_cache
 
 
 def extract_ranks(record):
@@ -100,6 +101,38 @@ def extract_species(record):
     return None
 
 
+# the maximum number of compiled per-value patterns to keep around
+PATTERN_CACHE_SIZE = 16384
+
+_first_space_regex = re.compile(r'\s')
+_capitalised_word_regex = re.compile(r'\(?[A-Z]\w*')
+_capitalised_words_regex = re.compile(r'([A-Z]\S*)(?:\s|$)')
+_capital_regex = re.compile('[A-Z]')
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def _author_regex(author):
+    """
+    Compiles the regex used to find the given author in a value. Authors repeat a lot
+    across records (and across the taxonomy tags on a page) so these are memoized.
+
+    :param author: the author string
+    :returns: a compiled regex
+    """
+    return re.compile(r'\s\(?{0}\)?(\s|$)'.format(re.escape(author)))
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def _value_at_end_regex(value):
+    """
+    Compiles the regex used to check if the given value is at the end of a string.
+
+    :param value: the value
+    :returns: a compiled regex
+    """
+    return re.compile(f'{re.escape(value)}$')
+
+
 def find_author_split(value, record_dict):
     """
     Given a string and a record attempts to determine where in the string an author is
@@ -111,19 +144,12 @@ def find_author_split(value, record_dict):
         information
     :returns: the index at the start of the author part or None
     """
-    first_space = re.search(r'\s', value)
+    first_space = _first_space_regex.search(value)
     if not first_space:
         return None
 
-    evaluators = [
-        AuthorParserStage(),
-        SimpleFieldParserStage('specificEpithet'),
-        SimpleFieldParserStage('subgenus'),
-        CapitalisedParserStage(),
-    ]
-
     ix = None
-    for evaluator in evaluators:
+    for evaluator in PARSER_STAGES:
         ix = evaluator.evaluate(value, record_dict)
         if ix:
             break
@@ -131,6 +157,22 @@ def find_author_split(value, record_dict):
     return ix
 
 
+def find_author_splits(records, field='scientificName'):
+    """
+    Finds the author split for the given field in each of the given records. This is
+    the same as calling find_author_split on each record but is more convenient when
+    dealing with a lot of records.
+
+    :param records: an iterable of record dicts
+    :param field: the field in each record to search in (default: scientificName)
+    :returns: a list of indexes (or Nones), one for each record in the order given
+    """
+    return [
+        find_author_split(record[field], record) if record.get(field) else None
+        for record in records
+    ]
+
+
 class BaseParserStage(object):
     """
     Represents a single stage of a field parsing process.
@@ -183,22 +225,13 @@ class AuthorParserStage(BaseParserStage):
 
     def _extract(self, body, record_dict):
         """
-        Searches for the full author string, then breaks it up into smaller pieces
-        (sections in brackets, individual names) if that's not found.
+        Searches for the full author string.
 
         :returns: the start index of the author string if found, otherwise None
         """
         full_author = record_dict['scientificNameAuthorship']
-        author_strings = [full_author] + [
-            p.strip()
-            for p in set(
-                re.findall(r'\(([\w\s]+)\)', full_author)
-                + re.findall(r'([\w.\s]+)', full_author)
-            )
-        ]
-        for a in author_strings:
-            matches = re.search(r'\s\(?{0}\)?(\s|$)'.format(re.escape(a)), body)
-            return matches.start() if matches else None
+        matches = _author_regex(full_author).search(body)
+        return matches.start() if matches else None
 
 
 class SimpleFieldParserStage(BaseParserStage):
@@ -228,10 +261,10 @@ class SimpleFieldParserStage(BaseParserStage):
         :returns: the start index of the estimated author string if found, else None.
         """
         field_value = record_dict[self.field_name]
-        if re.search(f'{re.escape(field_value)}$', body):
+        if _value_at_end_regex(field_value).search(body):
             return len(body)
-        split_by_value = re.split(f'{re.escape(field_value)}', body, 1)
-        matches = re.search(r'\(?[A-Z]\w*', split_by_value[1])
+        split_by_value = body.split(field_value, 1)
+        matches = _capitalised_word_regex.search(split_by_value[1])
         return (
             matches.start() + len(split_by_value[0]) + len(field_value)
             if matches
@@ -249,12 +282,22 @@ class CapitalisedParserStage(BaseParserStage):
         """
         Checks for multiple capitalised words in the tag body.
         """
-        capit = re.findall(r'([A-Z]\S*)(?:\s|$)', body)
+        capit = _capitalised_words_regex.findall(body)
         return len(capit) > 1
 
     def _extract(self, body, record_dict):
         """
         Finds the start index of the second capitalised word.
         """
-        matches = [m for m in re.finditer('[A-Z]', body)]
+        matches = [m for m in _capital_regex.finditer(body)]
         return matches[1].start()
+
+
+# the stages used by find_author_split, in the order they are tried. None of the stages
+# hold any per-call state so they are only created once
+PARSER_STAGES = (
+    AuthorParserStage(),
+    SimpleFieldParserStage('specificEpithet'),
+    SimpleFieldParserStage('subgenus'),
+    CapitalisedParserStage(),
+)
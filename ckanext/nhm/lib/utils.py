@@ -12,14 +12,15 @@ import requests
 from cachetools import TTLCache, cached
 from ckan.plugins import toolkit
 
+from ckanext.nhm.lib.http import get_client
+
 
-@cached(cache=TTLCache(maxsize=10, ttl=300))
 def get_iiif_status():
     health = {'ping': False}
 
     url = toolkit.config.get('ckanext.iiif.image_server_url')
     try:
-        r = requests.get(url + '/status', timeout=7)
+        r = get_client('iiif', timeout=7).get(url + '/status')
         if r.ok:
             health['ping'] = True
             response_json = r.json()
@@ -121,7 +122,6 @@ def get_ingest_status():
     }
 
 
-@cached(cache=TTLCache(maxsize=10, ttl=7200))
 def get_gbif_status():
     gbif_dataset_key = toolkit.config.get('ckanext.gbif.dataset_key')
     gbif_url = (
@@ -136,7 +136,7 @@ def get_gbif_status():
     if gbif_url:
         try:
             headers = {'User-Agent': 'NHMUK dataset status: data [at] nhm.ac.uk'}
-            r = requests.get(gbif_url, timeout=7, headers=headers)
+            r = get_client('gbif_status', timeout=7).get(gbif_url, headers=headers)
             if r.ok:
                 response_json = r.json()
                 modified = response_json.get('modified')
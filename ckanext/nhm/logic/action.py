@@ -12,8 +12,10 @@ from ckan.plugins import plugin_loaded, toolkit
 
 import ckanext.nhm.logic.schema as nhm_schema
 from ckanext.nhm.dcat.specimen_records import ObjectSerializer
+from ckanext.nhm.dcat.utils import rdf_resources
 from ckanext.nhm.lib import helpers
-from ckanext.nhm.lib.record import get_record_by_uuid
+from ckanext.nhm.lib.cache import MISSING, get_cache
+from ckanext.nhm.lib.record import get_record_by_uuid, get_records_by_uuids
 from ckanext.nhm.logic.schema import DATASET_TYPE_VOCABULARY
 
 log = logging.getLogger(__name__)
@@ -23,6 +25,11 @@ def object_rdf(context, data_dict):
     """
     Get record RDF.
 
+    The rendered RDF is cached using the uuid, the rounded version of each RDF resource
+    and the format as the key. This means that once a new version of the data is
+    ingested, requests for the latest version of an object will stop using the old
+    cached RDF.
+
     :param context:
     :param data_dict:
     """
@@ -35,16 +42,85 @@ def object_rdf(context, data_dict):
     if errors:
         raise toolkit.ValidationError(errors)
 
-    # get the record
     version = data_dict.get('version', None)
+    output_format = data_dict.get('format')
+    cache = get_cache('object_rdf', maxsize=1024, ttl=7 * 24 * 60 * 60)
+    cache_key = _object_rdf_cache_key(data_dict['uuid'], version, output_format)
+    output = cache.get(cache_key)
+    if output is not MISSING:
+        return output
+
+    # get the record
     record = get_record_by_uuid(data_dict['uuid'], version)
     if record:
         serializer = ObjectSerializer()
-        output = serializer.serialize_record(record, data_dict.get('format'), version)
+        output = serializer.serialize_record(record, output_format, version)
+        cache.set(cache_key, output)
         return output
     raise toolkit.ObjectNotFound
 
 
+def _object_rdf_cache_key(uuid, version, output_format):
+    """
+    Creates the cache key for an object's RDF.
+
+    :param uuid: the object's uuid
+    :param version: the requested version, or None for the latest version
+    :param output_format: the requested format
+    :returns: the key as a string
+    """
+    rounded_versions = [
+        toolkit.get_action('vds_version_round')(
+            {}, {'resource_id': resource_id, 'version': version}
+        )
+        for resource_id in rdf_resources()
+    ]
+    return ':'.join(map(str, [uuid, *rounded_versions, output_format]))
+
+
+def object_rdf_batch(context, data_dict):
+    """
+    Get the RDF for many records at once as a single merged graph.
+
+    :param uuids: the occurrence IDs of the records to include
+    :type uuids: list of strings
+    :param format: the RDF format to serialise the graph in
+    :type format: string
+    :param version: the version of the records to retrieve (optional, defaults to the
+        latest version)
+    :type version: int
+    :returns: the serialised graph
+    :rtype: string
+    """
+    context = {'user': toolkit.c.user or toolkit.c.author}
+    schema = context.get('schema', nhm_schema.object_rdf_batch_schema())
+    data_dict, errors = toolkit.navl_validate(data_dict, schema, context)
+    if errors:
+        raise toolkit.ValidationError(errors)
+
+    # remove any duplicates but keep the order the uuids were requested in
+    uuids = list(dict.fromkeys(data_dict['uuids']))
+    max_uuids = toolkit.asint(
+        toolkit.config.get('ckanext.nhm.object_rdf_batch.max_uuids', 100)
+    )
+    if len(uuids) > max_uuids:
+        raise toolkit.ValidationError(
+            {'uuids': [f'A maximum of {max_uuids} UUIDs can be requested at once']}
+        )
+
+    version = data_dict.get('version', None)
+    records = get_records_by_uuids(uuids, version)
+    if not records:
+        raise toolkit.ObjectNotFound
+
+    serializer = ObjectSerializer()
+    return serializer.serialize_records(
+        [records[uuid] for uuid in uuids if uuid in records],
+        data_dict.get('format'),
+        version,
+    )
+
+
 def _image_exists_on_record(resource, record, asset_id):
     """
     Check the image belongs to the record.
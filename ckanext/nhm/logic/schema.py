@@ -19,6 +19,7 @@ resource_id_exists = toolkit.get_validator('resource_id_exists')
 int_validator = toolkit.get_validator('int_validator')
 boolean_validator = toolkit.get_validator('boolean_validator')
 one_of = toolkit.get_validator('one_of')
+list_of_strings = toolkit.get_validator('list_of_strings')
 
 DATASET_TYPE_VOCABULARY = 'dataset_category'
 
@@ -43,6 +44,20 @@ def object_rdf_schema():
     return schema
 
 
+def object_rdf_batch_schema():
+    """
+    Returns the schema for the object_rdf_batch action.
+
+    :returns: the schema dict
+    """
+    schema = {
+        'uuids': [not_empty, list_of_strings],
+        'format': [not_missing],
+        'version': [ignore_missing, int_validator],
+    }
+    return schema
+
+
 def create_package_schema():
     schema = default_create_package_schema()
     _modify_schema(schema)
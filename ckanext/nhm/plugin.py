@@ -9,7 +9,7 @@ from collections import OrderedDict
 from contextlib import suppress
 from pathlib import Path
 
-from beaker.cache import cache_managers, cache_regions
+from beaker.cache import cache_regions
 from ckan.lib.helpers import literal
 from ckan.plugins import SingletonPlugin, implements, interfaces, toolkit
 from importlib_resources import files
@@ -21,14 +21,25 @@ from ckanext.contact.interfaces import IContact
 from ckanext.doi.interfaces import IDoi
 from ckanext.gallery.plugins.interfaces import IGalleryImage
 from ckanext.nhm import cli, routes
-from ckanext.nhm.lib.helpers import resource_view_get_filter_options
+from ckanext.nhm.lib.action_memo import clear_memo, log_memo_stats
+from ckanext.nhm.lib.cache import invalidate_resource_dependents
+from ckanext.nhm.lib.field_schema import queue_field_schema_warming
 from ckanext.nhm.lib.mail import (
     create_department_email,
     create_indexlots_email,
     create_package_email,
 )
-from ckanext.nhm.lib.record import LATITUDE_FIELD, LONGITUDE_FIELD
-from ckanext.nhm.lib.utils import get_gbif_status, get_iiif_status, get_ingest_status
+from ckanext.nhm.lib.record import (
+    LATITUDE_FIELD,
+    LONGITUDE_FIELD,
+    invalidate_latest_specimens,
+)
+from ckanext.nhm.lib.resource_view import (
+    build_view_registry,
+    forget_resource_formats,
+    get_filter_options_by_id,
+)
+from ckanext.nhm.lib.status import get_status_reports
 from ckanext.nhm.views.artefact import modify_field_groups as artefact_modify_groups
 from ckanext.nhm.views.indexlot import modify_field_groups as indexlot_modify_groups
 from ckanext.nhm.views.specimen import modify_field_groups as specimen_modify_groups
@@ -74,6 +85,7 @@ class NHMPlugin(SingletonPlugin, toolkit.DefaultDatasetForm):
     implements(IVersionedDatastore, inherit=True)
     implements(interfaces.IClick)
     implements(interfaces.IConfigurable)
+    implements(interfaces.IMiddleware, inherit=True)
     implements(IVersionedDatastoreDownloads, inherit=True)
     if status_available:
         implements(IStatus)
@@ -87,6 +99,22 @@ class NHMPlugin(SingletonPlugin, toolkit.DefaultDatasetForm):
 
         cache_regions.update({'collection_stats': options})
 
+        # the views' resource IDs come from the config so this has to happen here
+        build_view_registry()
+
+    ## IMiddleware
+    def make_middleware(self, app, config):
+        """
+        Registers a hook which logs the stats of the per-request action memo cache (see
+        lib/action_memo.py) after each request.
+
+        ..seealso:: ckan.plugins.interfaces.IMiddleware.make_middleware
+        """
+        # only the flask app supports request hooks
+        if hasattr(app, 'after_request'):
+            app.after_request(log_memo_stats)
+        return app
+
     ## IActions
     def get_actions(self):
         """
@@ -94,6 +122,7 @@ class NHMPlugin(SingletonPlugin, toolkit.DefaultDatasetForm):
         """
         return {
             'object_rdf': nhm_action.object_rdf,
+            'object_rdf_batch': nhm_action.object_rdf_batch,
             'get_permanent_url': nhm_action.get_permanent_url,
             'user_show': nhm_action.user_show,
             'package_update': nhm_action.package_update,
@@ -225,7 +254,8 @@ class NHMPlugin(SingletonPlugin, toolkit.DefaultDatasetForm):
 
     def after_update(self, context, pkg_dict):
         """
-        If this is the specimen resource, clear memcached.
+        Mark any cached values which depend on the updated package's resources as stale
+        and load the fields of any new versions of them in the background.
 
         NB: Our version of ckan doesn't have the IResource after_update method
         But updating a resource calls IPackageController.after_update
@@ -233,18 +263,22 @@ class NHMPlugin(SingletonPlugin, toolkit.DefaultDatasetForm):
         :param context:
         :param pkg_dict:
         """
-        for resource in pkg_dict.get('resources', []):
-            # If this is the specimen resource ID, clear the collection stats
-            if 'id' in resource:
-                if resource['id'] in [
-                    helpers.get_specimen_resource_id(),
-                    helpers.get_indexlot_resource_id(),
-                ]:
-                    log.info('Clearing caches')
-                    # Quick and dirty, delete all caches when indexlot or specimens
-                    # are updated
-                    for _cache in cache_managers.values():
-                        _cache.clear()
+        resource_ids = [
+            resource['id']
+            for resource in pkg_dict.get('resources', [])
+            if 'id' in resource
+        ]
+        invalidate_resource_dependents(resource_ids)
+        forget_resource_formats(resource_ids)
+        if helpers.get_specimen_resource_id() in resource_ids:
+            invalidate_latest_specimens()
+        queue_field_schema_warming(
+            resource['id']
+            for resource in pkg_dict.get('resources', [])
+            if resource.get('datastore_active')
+        )
+        # anything memoized in this request could now be out of date
+        clear_memo()
 
     ## IRoutes
     def before_map(self, _map):
@@ -477,9 +511,7 @@ class NHMPlugin(SingletonPlugin, toolkit.DefaultDatasetForm):
 
         if 'filters' in request.data_dict:
             # figure out which options are available for this resource
-            resource_show = toolkit.get_action('resource_show')
-            resource = resource_show({}, {'id': request.data_dict['resource_id']})
-            options = resource_view_get_filter_options(resource)
+            options = get_filter_options_by_id(request.data_dict['resource_id'])
 
             for option in options:
                 if option.name in request.data_dict['filters']:
@@ -687,77 +719,6 @@ class NHMPlugin(SingletonPlugin, toolkit.DefaultDatasetForm):
 
     ## IStatus
     def modify_status_reports(self, status_reports):
-        iiif_health = get_iiif_status()
-
-        # overall image server status
-        if iiif_health['ping'] and iiif_health['status'] == ':)':
-            iiif_status_text = toolkit._('available')
-            iiif_status_type = 'good'
-        elif iiif_health['ping'] and iiif_health['status'] != ':)':
-            iiif_status_text = toolkit._('available (issues)')
-            iiif_status_type = 'ok'
-        else:
-            iiif_status_text = toolkit._('unavailable')
-            iiif_status_type = 'bad'
-
-        status_reports.append(
-            {
-                'label': toolkit._('Image server'),
-                'value': iiif_status_text,
-                'group': toolkit._('Images'),
-                'help': toolkit._(
-                    'The IIIF server provides most of the images in datasets (some are '
-                    'externally hosted)'
-                ),
-                'state': iiif_status_type,
-            }
-        )
-
-        # specimen images
-        if iiif_health['ping'] and iiif_health['specimens'] == ':)':
-            specimens_status_text = toolkit._('available')
-            specimens_status_type = 'good'
-        else:
-            specimens_status_text = toolkit._('unavailable')
-            specimens_status_type = 'bad'
-
-        status_reports.append(
-            {
-                'label': toolkit._('Specimen images'),
-                'value': specimens_status_text,
-                'group': toolkit._('Images'),
-                'help': toolkit._(
-                    'Specimen images are a specific subset of images used primarily in '
-                    'the Collection specimens and Index lots datasets'
-                ),
-                'state': specimens_status_type,
-            }
-        )
-
-        # ingest status
-        ingest_status = get_ingest_status()
-        status_reports.append(
-            {
-                'label': toolkit._('Collections data ingest'),
-                'value': ingest_status['current_version'],
-                'help': toolkit._(
-                    'The last update to the collections datasets. These datasets are '
-                    'not usually updated on Fridays or Saturdays. Next ingest: '
-                )
-                + ingest_status['next_ingest'],
-                'state': ingest_status['state'],
-            }
-        )
-
-        # get the gbif dataset status
-        gbif_status_text, gbif_status_type = get_gbif_status()
-        status_reports.append(
-            {
-                'label': toolkit._('GBIF updated'),
-                'value': gbif_status_text,
-                'help': toolkit._('The last time the GBIF dataset was updated.'),
-                'state': gbif_status_type,
-            }
-        )
-
+        # the checks themselves are run in the background, see lib/status.py
+        status_reports.extend(get_status_reports())
         return status_reports
@@ -8,6 +8,7 @@ from . import (
     about,
     bbcm,
     beetle_iiif,
+    facets,
     help,
     legal,
     liv,
@@ -28,6 +29,7 @@ blueprints = [
     help.blueprint,
     bbcm.blueprint,
     beetle_iiif.blueprint,
+    facets.blueprint,
     misc.blueprint,
     liv.blueprint,
     user.blueprint,
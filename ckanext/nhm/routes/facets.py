@@ -0,0 +1,49 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+
+from ckan.plugins import toolkit
+from flask import Blueprint
+
+from ckanext.nhm.lib.helpers import get_resource_facets
+
+blueprint = Blueprint(name='facets', import_name=__name__)
+
+
+def _context():
+    return {
+        'user': toolkit.c.user or toolkit.c.author,
+        'auth_user_obj': toolkit.c.userobj,
+    }
+
+
+@blueprint.route('/dataset/<package_name>/resource/<resource_id>/facets')
+def facets(package_name, resource_id):
+    """
+    Render the facets for a resource. The q, filters and _<field>_limit query parameters
+    are used in the same way as on the resource page. This is requested by the resource
+    page when the facets weren't already cached so that the grid doesn't have to wait
+    for them.
+
+    :param package_name: the package name or ID
+    :param resource_id: the resource ID
+    :returns: the rendered facets as an HTML snippet
+    """
+    try:
+        resource = toolkit.get_action('resource_show')(_context(), {'id': resource_id})
+    except toolkit.ObjectNotFound:
+        toolkit.abort(404, toolkit._('Resource not found'))
+    except toolkit.NotAuthorized:
+        toolkit.abort(401, toolkit._('Unauthorized to read resource'))
+    return toolkit.render_snippet(
+        'package/snippets/resource_view_facet_list.html',
+        {
+            'facets': get_resource_facets(resource) or [],
+            # the links need to go to the resource page rather than this route
+            'alternative_url': toolkit.url_for(
+                'resource.read', id=package_name, resource_id=resource_id
+            ),
+        },
+    )
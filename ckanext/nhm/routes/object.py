@@ -15,20 +15,26 @@ If a user requests the object in RDF format:
     object/73f450db-46b3-45a0-ac18-f00547be5af1.ttl
 Returns RDF
 
-In both cases, if a version is appended to the end of the URL then that version of the record is
-returned. For example:
+Many objects can be requested in RDF format at once, as a single merged graph:
+    object/batch.ttl?uuid=73f450db-46b3-45a0-ac18-f00547be5af1&uuid=...
+
+In all cases, if a version is appended to the end of the URL then that version of the
+record is returned. For example:
     object/73f450db-46b3-45a0-ac18-f00547be5af1/1551692486000
 otherwise the current version is returned.
 
 Old style /specimen urls are also supported to ensure backwards compatibility.
 """
 
+import hashlib
 import logging
+import time
 
 from ckan.plugins import toolkit
-from flask import Blueprint, Response, redirect, url_for
+from flask import Blueprint, Response, redirect, request, url_for
 
 from ckanext.dcat.utils import CONTENT_TYPES, check_access_header
+from ckanext.nhm.lib.guid_index import lookup_guid
 from ckanext.nhm.lib.record import Record, get_record_by_uuid
 
 log = logging.getLogger(__name__)
@@ -88,6 +94,33 @@ def _context():
     }
 
 
+def _rdf_response(result, _format, version):
+    """
+    Creates the response for some RDF output, setting the ETag and the caching headers.
+
+    Versions in the past can't change (new data is always ingested at a later version)
+    so the RDF for them is marked as immutable. Unversioned requests, and requests for
+    versions in the future, could get different data after the next ingest so they are
+    only cached for a short, configurable, amount of time.
+
+    :param result: the RDF output
+    :param _format: the format of the output
+    :param version: the requested version, or None
+    :returns: a Response object
+    """
+    response = Response(result, mimetype=rdf_content_types[_format])
+    content = result if isinstance(result, bytes) else result.encode('utf-8')
+    response.set_etag(hashlib.sha1(content).hexdigest())
+    if version is not None and version <= time.time() * 1000:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        max_age = toolkit.asint(
+            toolkit.config.get('ckanext.nhm.object_rdf.unversioned_max_age', 300)
+        )
+        response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response.make_conditional(request)
+
+
 @specimen_blueprint.route('/<uuid>.<_format>', defaults={'version': None})
 @specimen_blueprint.route('/<uuid>/<int:version>.<_format>')
 @blueprint.route('/<uuid>.<_format>', defaults={'version': None})
@@ -109,9 +142,38 @@ def rdf(uuid, _format, version):
     }
     try:
         result = toolkit.get_action('object_rdf')(_context(), data_dict)
-        return Response(result, mimetype=rdf_content_types[_format])
+        return _rdf_response(result, _format, version)
+    except toolkit.ValidationError as e:
+        toolkit.abort(409, str(e))
+
+
+@blueprint.route('/batch.<_format>', defaults={'version': None})
+@blueprint.route('/batch/<int:version>.<_format>')
+def rdf_batch(_format, version):
+    """
+    Return an RDF view of many objects, merged into one graph. The objects are
+    specified using repeated uuid query parameters.
+
+    :param _format: the format requested
+    :param version: the version of the records to retrieve, or None if the current
+        version is desired
+    :returns: the data to display
+    """
+    if _format not in rdf_content_types:
+        toolkit.abort(404, toolkit._('Format not supported'))
+
+    data_dict = {
+        'uuids': toolkit.request.args.getlist('uuid'),
+        'format': _format,
+        'version': version,
+    }
+    try:
+        result = toolkit.get_action('object_rdf_batch')(_context(), data_dict)
+        return _rdf_response(result, _format, version)
     except toolkit.ValidationError as e:
         toolkit.abort(409, str(e))
+    except toolkit.ObjectNotFound:
+        toolkit.abort(404, toolkit._('Records not found'))
 
 
 @specimen_blueprint.route('/<uuid>', defaults={'version': None})
@@ -138,6 +200,23 @@ def view(uuid, version):
         return redirect(url, code=303)
     else:
         try:
+            # try the GUID index first as it avoids searching for the record
+            location = lookup_guid(uuid)
+            if location is not None and version is None:
+                # the record may have changed since it was indexed, so only trust the
+                # index if it's up to date with the resource's latest version
+                latest_version = toolkit.get_action('vds_version_round')(
+                    _context(), {'resource_id': location.resource_id}
+                )
+                found = location.contains(latest_version)
+            else:
+                found = location is not None and location.contains(version)
+            if found:
+                record = Record(
+                    location.record_id, version, resource_id=location.resource_id
+                )
+                return redirect(record.url(), code=303)
+
             # get the record at the given version
             record = get_record_by_uuid(uuid, version)
             if record:
@@ -15,7 +15,7 @@ from ckan.lib.helpers import link_to
 from ckan.plugins import toolkit
 from flask import Blueprint, current_app, redirect
 
-from ckanext.nhm.lib.helpers import resource_view_get_view
+from ckanext.nhm.lib.helpers import get_external_links, resource_view_get_view
 from ckanext.nhm.lib.jinja_extensions import TaxonomyFormatExtension
 from ckanext.nhm.lib.record import Record, RecordImage
 from ckanext.nhm.views import DarwinCoreView
@@ -25,11 +25,12 @@ log = logging.getLogger(__name__)
 blueprint = Blueprint(name='record', import_name=__name__)
 
 
-def prepare_image(image: RecordImage) -> dict:
+def prepare_image(image: RecordImage, record: Record) -> dict:
     """
     Given an image object, return a dict of information about it for the view.
 
     :param image: the RecordImage object
+    :param record: the Record the image belongs to
     :returns: a dict of info
     """
     license_link = link_to(image.title, image.url, target='_blank')
@@ -38,9 +39,9 @@ def prepare_image(image: RecordImage) -> dict:
         'href': image.url,
         'download': image.download_url,
         'copyright': f'{license_link}<br /><small>{image.rights}</small>',
-        'record_id': image.record.id,
-        'resource_id': image.record.resource_id,
-        'link': image.record.url(),
+        'record_id': record.id,
+        'resource_id': record.resource_id,
+        'link': record.url(),
     }
 
 
@@ -60,7 +61,7 @@ def update_render_context(record: Record):
     }
     toolkit.c.version = record.version
     toolkit.c.record_title = record.title
-    toolkit.c.images = list(map(prepare_image, record.images))
+    toolkit.c.images = [prepare_image(image, record) for image in record.images]
     geojson = record.geojson
     # something expects this as json apparently, sigh
     toolkit.c.record_map = json.dumps(geojson) if geojson else None
@@ -171,3 +172,35 @@ def permalink(resource_id, record_id, version):
         version=version,
     )
     return redirect(url)
+
+
+@blueprint.route(
+    '/dataset/<package_name>/resource/<resource_id>/record/<record_id>/external-links',
+    defaults={'version': None},
+)
+@blueprint.route(
+    '/dataset/<package_name>/resource/<resource_id>/record/<record_id>/external-links/<int:version>'
+)
+def external_links(package_name, resource_id, record_id, version):
+    """
+    Render the external links for a record. This is requested by the record page once
+    it has loaded so that slow external sites don't hold up the page.
+
+    :param package_name: the package name or ID, we don't actually need this
+    :param resource_id: the resource ID
+    :param record_id: the record ID
+    :param version: optional record version, defaults to None which will be interpreted
+        as now
+    :returns: the rendered links as an HTML snippet
+    """
+    record = Record(record_id, resource_id=resource_id, version=version)
+    try:
+        data = record.data
+    except toolkit.ObjectNotFound:
+        toolkit.abort(404, toolkit._('Record not found'))
+    except toolkit.NotAuthorized:
+        toolkit.abort(403, toolkit._('Unauthorized to read record'))
+    return toolkit.render_snippet(
+        'record/snippets/external_links_content.html',
+        {'resolved_links': get_external_links(data)},
+    )
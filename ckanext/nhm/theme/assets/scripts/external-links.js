@@ -10,7 +10,7 @@ window.external_links =
     self.bindCollapsible = function () {
       // start off with the children not visible
       $(document).find('.external-link-child').hide();
-      $('.external-link-parent').click(function () {
+      $('.external-link-parent').off('click').click(function () {
         // hide all sibling's lists
         $(this).siblings('.external-link-parent').find('li').slideUp();
         // and toggle this ul's list
@@ -18,10 +18,19 @@ window.external_links =
       });
     };
 
+    /**
+     * Loads the links for any lazy external links sections and replaces the section's
+     * placeholder with them.
+     */
+    self.loadLazy = function () {
+      window.lazy_load('.external-links-lazy', self.bindCollapsible);
+    };
+
     return self;
   })();
 
 // bind up as soon as the document is ready for it
 $(document).ready(function () {
   window.external_links.bindCollapsible();
+  window.external_links.loadLazy();
 });
@@ -0,0 +1,31 @@
+// define a function for loading parts of the page once it has been rendered, but only if
+// it hasn't been defined
+window.lazy_load =
+  window.lazy_load ||
+  /**
+   * Replaces each placeholder matching the selector with the HTML at its data-url.
+   * Placeholders which fail to load are removed.
+   *
+   * @param selector the placeholders' selector
+   * @param callback an optional function to call after each placeholder is replaced
+   */
+  function (selector, callback) {
+    $(selector).each(function () {
+      var placeholder = $(this);
+      $.get(placeholder.data('url'))
+        .done(function (html) {
+          placeholder.replaceWith(html);
+          if (callback) {
+            callback();
+          }
+        })
+        .fail(function () {
+          placeholder.remove();
+        });
+    });
+  };
+
+// load the generic placeholders as soon as the document is ready for it
+$(document).ready(function () {
+  window.lazy_load('.lazy-load');
+});
@@ -8,6 +8,8 @@ from collections import OrderedDict
 
 from ckan.plugins import toolkit
 
+from ckanext.nhm.lib.field_schema import get_field_names
+
 
 class DefaultView(object):
     """
@@ -59,13 +61,10 @@ class DefaultView(object):
 
         :param resource_id:
         """
-        data = {'resource_id': resource_id, 'limit': 0}
         try:
-            result = toolkit.get_action('datastore_search')({}, data)
+            return get_field_names(resource_id)
         except toolkit.ObjectNotFound:
             return []
-        else:
-            return [f['id'] for f in result['fields']]
 
     def render_record(self, c):
         """
@@ -0,0 +1,30 @@
+"""
+Micro-benchmark for dwc_terms on records with 50, 200 and 1000 fields.
+
+Run with: python -m tests.benchmarks.bench_dwc
+"""
+
+import timeit
+
+from ckanext.nhm.lib.dwc import DWC_TERM_INDEX, dwc_terms
+
+
+def make_fields(count):
+    """
+    Create a list of field names made up of as many DwC terms as possible and then
+    padded out with non-DwC fields.
+    """
+    terms = list(DWC_TERM_INDEX)[:count]
+    return terms + [f'field{i}' for i in range(count - len(terms))]
+
+
+def main():
+    for count in (50, 200, 1000):
+        fields = make_fields(count)
+        number = 2000
+        seconds = timeit.timeit(lambda: dwc_terms(fields), number=number)
+        print(f'{count} fields: {seconds / number * 1e6:.1f}µs per call')
+
+
+if __name__ == '__main__':
+    main()
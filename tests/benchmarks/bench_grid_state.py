@@ -0,0 +1,41 @@
+"""
+Benchmark for building the slickgrid state of a resource with lots of fields.
+
+Run with: python -m tests.benchmarks.bench_grid_state [fields] [renders]
+
+Times the first build of the state for a resource (when the column order and hidden
+columns are worked out) against later builds for the same resource and version (when
+they come from the cache). The defaults are 500 fields and 1,000 renders.
+"""
+
+import sys
+import time
+
+from ckanext.nhm.lib.grid_state import build_grid_state, get_grid_columns
+from ckanext.nhm.views import DarwinCoreView
+
+
+def main():
+    field_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    renders = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    latest_fields = ['_id'] + [f'field{i}' for i in range(field_count)]
+    # pretend the version being viewed is missing the last 10% of the fields
+    fields = latest_fields[: -field_count // 10]
+    view = DarwinCoreView()
+
+    start = time.perf_counter()
+    build_grid_state(view, fields, latest_fields)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(renders):
+        build_grid_state(view, fields, latest_fields)
+    cached = (time.perf_counter() - start) / renders
+
+    print(f'{field_count} fields: first build {first * 1e3:.2f}ms')
+    print(f'{field_count} fields: cached build {cached * 1e3:.3f}ms')
+    print(get_grid_columns.cache_info())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Memory benchmark for building lots of Record objects with images.
+
+Run with: python -m tests.benchmarks.bench_record [count]
+
+Compares records created on their own (each with its own context and copy of the
+resource dict, as happens when they are looked up one at a time) against records created
+in a RecordBatch, with and without their images loaded. The default count is 100,000.
+"""
+
+import copy
+import sys
+import tracemalloc
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from ckanext.nhm.lib.record import (
+    DWC_ASSOCIATED_MEDIA,
+    IMAGE_FIELD,
+    Record,
+    RecordBatch,
+)
+
+RESOURCE_ID = 'bench-resource'
+RESOURCE = {
+    'id': RESOURCE_ID,
+    'package_id': 'bench-package',
+    'format': 'dwc',
+    IMAGE_FIELD: DWC_ASSOCIATED_MEDIA,
+    '_title_field': 'catalogNumber',
+}
+LICENSE = SimpleNamespace(
+    title='Creative Commons Attribution', url='https://example.com/cc'
+)
+
+
+def make_data(count):
+    return [
+        {
+            '_id': i,
+            'catalogNumber': f'BMNH {i}',
+            DWC_ASSOCIATED_MEDIA: [
+                {
+                    'identifier': f'https://example.com/media/{i}-{n}',
+                    'title': f'BMNH {i}',
+                    'rightsHolder': 'The Trustees of the NHM, London',
+                }
+                for n in range(3)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def standalone(data):
+    return [
+        Record(
+            row['_id'],
+            data=row,
+            resource_id=RESOURCE_ID,
+            resource=copy.deepcopy(RESOURCE),
+            context={'user': 'bench', 'auth_user_obj': None},
+        )
+        for row in data
+    ]
+
+
+def batched(data):
+    return RecordBatch(RESOURCE_ID, data, resource=RESOURCE, context={'user': 'bench'})
+
+
+def measure(label, build, data, load_images):
+    tracemalloc.start()
+    records = build(data)
+    if load_images:
+        for record in records:
+            record.images
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label}: {current / 1e6:.1f}MB, {current / len(data):.0f} bytes per record')
+    return records
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    # the data is shared by all the runs and isn't included in the measurements
+    data = make_data(count)
+    # plain functions rather than mocks so that the calls aren't recorded and measured
+    with patch('ckanext.nhm.lib.record.get_image_license', lambda _: LICENSE):
+        with patch('ckanext.nhm.lib.record.is_collection_resource_id', lambda _: True):
+            for load_images in (False, True):
+                suffix = ' with images' if load_images else ''
+                measure(f'standalone{suffix}', standalone, data, load_images)
+                measure(f'batched{suffix}', batched, data, load_images)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark for find_author_splits.
+
+Run with: python -m tests.benchmarks.bench_taxonomy [path/to/occurrence.csv]
+
+If a path is given it should be a CSV (such as a DwC-A occurrence file from a specimen
+collection export) with at least scientificName and scientificNameAuthorship columns.
+Otherwise, a few hundred thousand synthetic name/author pairs are generated.
+"""
+
+import csv
+import random
+import sys
+import time
+
+from ckanext.nhm.lib.taxonomy import _author_regex, find_author_splits
+
+FIELDS = ('scientificName', 'scientificNameAuthorship', 'specificEpithet', 'subgenus')
+
+
+def load_records(path):
+    """
+    Loads the relevant fields from each row in the given CSV.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        dialect = 'excel-tab' if path.endswith(('.txt', '.tsv')) else 'excel'
+        for row in csv.DictReader(f, dialect=dialect):
+            yield {field: row[field] for field in FIELDS if row.get(field)}
+
+
+def make_records(count, seed=42):
+    """
+    Generates records with a realistic amount of author repetition.
+    """
+    rng = random.Random(seed)
+    authors = [f'Author{i}, {1750 + i % 270}' for i in range(5000)]
+    records = []
+    for i in range(count):
+        author = rng.choice(authors)
+        epithet = f'epithet{rng.randrange(50000)}'
+        if rng.random() < 0.3:
+            author = f'({author})'
+        records.append(
+            {
+                'scientificName': f'Genus{i % 3000} {epithet} {author}',
+                'scientificNameAuthorship': author,
+                'specificEpithet': epithet,
+            }
+        )
+    return records
+
+
+def main():
+    if len(sys.argv) > 1:
+        records = list(load_records(sys.argv[1]))
+    else:
+        records = make_records(300000)
+
+    _author_regex.cache_clear()
+    start = time.perf_counter()
+    find_author_splits(records)
+    seconds = time.perf_counter() - start
+    print(
+        f'{len(records)} records: {seconds:.2f}s '
+        f'({seconds / len(records) * 1e6:.1f}µs per record)'
+    )
+    print(_author_regex.cache_info())
+
+
+if __name__ == '__main__':
+    main()
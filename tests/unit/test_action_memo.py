@@ -0,0 +1,59 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from ckanext.nhm.lib.action_memo import clear_memo, get_memo_stats, memoized
+
+
+@pytest.fixture
+def request_context():
+    with Flask(__name__).test_request_context() as context:
+        yield context
+
+
+class TestMemoized(object):
+    def test_no_request(self):
+        action = MagicMock(return_value={'id': 'beans'})
+        memoized('resource_show', action)({}, {'id': 'beans'})
+        memoized('resource_show', action)({}, {'id': 'beans'})
+        assert action.call_count == 2
+
+    def test_not_memoizable(self, request_context):
+        action = MagicMock()
+        assert memoized('package_update', action) is action
+
+    def test_memoized(self, request_context):
+        action = MagicMock(side_effect=lambda context, data_dict: dict(data_dict))
+        first = memoized('resource_show', action)({}, {'id': 'beans', 'x': 1})
+        # same data dict in a different order
+        second = memoized('resource_show', action)({}, {'x': 1, 'id': 'beans'})
+        memoized('resource_show', action)({}, {'id': 'lemons'})
+
+        assert first == second
+        # modifying a result shouldn't affect the next caller
+        first['id'] = 'changed'
+        assert memoized('resource_show', action)({}, {'id': 'beans', 'x': 1}) == {
+            'id': 'beans',
+            'x': 1,
+        }
+        assert action.call_count == 2
+        assert get_memo_stats() == {'resource_show': {'hits': 2, 'misses': 2}}
+
+    def test_clear(self, request_context):
+        action = MagicMock(return_value={'id': 'beans'})
+        memoized('package_show', action)({}, {'id': 'beans'})
+        clear_memo()
+        memoized('package_show', action)({}, {'id': 'beans'})
+        assert action.call_count == 2
+
+    def test_exceptions_are_not_memoized(self, request_context):
+        action = MagicMock(side_effect=[ValueError(), {'id': 'beans'}])
+        with pytest.raises(ValueError):
+            memoized('package_show', action)({}, {'id': 'beans'})
+        assert memoized('package_show', action)({}, {'id': 'beans'}) == {'id': 'beans'}
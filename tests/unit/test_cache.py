@@ -0,0 +1,131 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+import threading
+from unittest.mock import MagicMock, patch
+
+from ckanext.nhm.lib import cache
+
+
+def make_cached_function(name):
+    function = MagicMock(_arg_namespace=name, _arg_region='test')
+    function.__name__ = name
+    function.__wrapped__ = MagicMock(return_value=f'new {name}')
+    return function
+
+
+class TestResourceDependents(object):
+    def setup_method(self):
+        self.specimens = make_cached_function('specimens')
+        self.both = make_cached_function('both')
+        self.dependents = [
+            ('ckanext.nhm.specimen_resource_id', self.specimens, 'specimens'),
+            ('ckanext.nhm.specimen_resource_id', self.both, 'both'),
+            ('ckanext.nhm.indexlot_resource_id', self.both, 'both'),
+        ]
+        self.config = {
+            'ckanext.nhm.specimen_resource_id': 's',
+            'ckanext.nhm.indexlot_resource_id': 'i',
+        }
+
+    def test_get_resource_dependents(self):
+        with patch.object(cache, '_resource_dependents', self.dependents), patch(
+            'ckanext.nhm.lib.cache.toolkit', MagicMock(config=self.config)
+        ):
+            assert cache.get_resource_dependents(['s']) == [
+                (self.specimens, 'specimens'),
+                (self.both, 'both'),
+            ]
+            assert cache.get_resource_dependents(['i', 's']) == [
+                (self.specimens, 'specimens'),
+                (self.both, 'both'),
+            ]
+            assert cache.get_resource_dependents(['i']) == [(self.both, 'both')]
+            assert cache.get_resource_dependents(['x']) == []
+
+    def test_invalidate_only_queues_a_refresh(self):
+        mock_toolkit = MagicMock(config=self.config)
+
+        with patch.object(cache, '_resource_dependents', self.dependents), patch(
+            'ckanext.nhm.lib.cache.toolkit', mock_toolkit
+        ), patch('ckanext.nhm.lib.cache.Cache') as mock_cache_class:
+            cache.invalidate_resource_dependents(['i'])
+            cache.invalidate_resource_dependents(['x'])
+
+        # nothing should be recalculated or removed from the cache in the request
+        assert not self.both.__wrapped__.called
+        assert not mock_cache_class.called
+        assert mock_toolkit.enqueue_job.call_count == 1
+
+    def test_refresh_overwrites_the_values(self):
+        mock_cache_class = MagicMock()
+        with patch.object(cache, '_resource_dependents', self.dependents), patch(
+            'ckanext.nhm.lib.cache.toolkit', MagicMock(config=self.config)
+        ), patch('ckanext.nhm.lib.cache.Cache', mock_cache_class), patch(
+            'ckanext.nhm.lib.cache.cache_regions', {'test': {'type': 'memory'}}
+        ):
+            cache.refresh_resource_dependents(['i'])
+
+        mock_cache_class.assert_called_once_with('both', type='memory')
+        mock_cache_class.return_value.put.assert_called_once_with('both', 'new both')
+        # the cached function isn't used as it would return the old value
+        assert not self.both.called
+
+    def test_refresh_failure_keeps_the_old_value(self):
+        self.both.__wrapped__.side_effect = Exception('oh no')
+        mock_cache_class = MagicMock()
+        with patch.object(cache, '_resource_dependents', self.dependents), patch(
+            'ckanext.nhm.lib.cache.toolkit', MagicMock(config=self.config)
+        ), patch('ckanext.nhm.lib.cache.Cache', mock_cache_class), patch(
+            'ckanext.nhm.lib.cache.cache_regions', {'test': {'type': 'memory'}}
+        ):
+            cache.refresh_resource_dependents(['i', 's'])
+
+        # only the specimens value is replaced
+        mock_cache_class.return_value.put.assert_called_once_with(
+            'specimens', 'new specimens'
+        )
+
+
+class TestTwoTierCache(object):
+    def test_stats(self):
+        two_tier = cache.TwoTierCache('test')
+        two_tier.set('a', 1)
+        assert two_tier.get('a') == 1
+        assert two_tier.get('b') is cache.MISSING
+
+        stats = two_tier.stats()
+        assert stats['local_hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_get_or_set_single_flight(self):
+        two_tier = cache.TwoTierCache('test')
+        started = threading.Event()
+        release = threading.Event()
+        factory = MagicMock(side_effect=lambda: release.wait() and 'value')
+
+        def slow_factory():
+            started.set()
+            return factory()
+
+        threads = [
+            threading.Thread(target=two_tier.get_or_set, args=('key', slow_factory))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        started.wait()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        factory.assert_called_once()
+        assert two_tier.get('key') == 'value'
+
+    def test_get_or_set_none(self):
+        two_tier = cache.TwoTierCache('test')
+        assert two_tier.get_or_set('key', lambda: None, cache_none=False) is None
+        assert two_tier.get('key') is cache.MISSING
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+
+import pytest
+
+from ckanext.nhm.lib.dwc import DWC_TERM_INDEX, DWC_XSD, dwc_terms
+
+
+def walk_xsd_dwc_terms(fields):
+    """
+    The original implementation of dwc_terms, which walked the XSD on every call, used
+    to check the output of the precomputed version hasn't changed.
+    """
+    fields = list(fields)
+    dynamic_properties_uri = None
+    terms = OrderedDict()
+    for group in DWC_XSD.iterfind('xs:group', namespaces=DWC_XSD.nsmap):
+        for element in group.iterfind(
+            'xs:sequence/xs:element', namespaces=DWC_XSD.nsmap
+        ):
+            ns, name = element.get('ref').split(':')
+            uri = f'{DWC_XSD.nsmap[ns]}{name}'
+            if name == 'dynamicProperties':
+                dynamic_properties_uri = uri
+            if name in fields:
+                terms.setdefault(group.get('name'), OrderedDict())[uri] = name
+                fields.remove(name)
+    terms['RecordLevelTerms']['http://purl.org/dc/terms/created'] = 'created'
+    terms['dynamicProperties'] = {
+        dynamic_properties_uri: [f for f in fields if not f.startswith('_')]
+    }
+    return terms
+
+
+class TestDwCTerms:
+    def test_index_is_read_only(self):
+        with pytest.raises(TypeError):
+            DWC_TERM_INDEX['beans'] = ('RecordLevelTerms', 'beans')
+
+    def test_duplicate_terms_use_first_group(self):
+        # collectionCode is in more than one group in the XSD
+        terms = dwc_terms(['collectionCode', 'type'])
+        assert list(terms['RecordLevelTerms'].values()) == [
+            'type',
+            'collectionCode',
+            'created',
+        ]
+
+    def test_dynamic_properties(self):
+        terms = dwc_terms(['type', 'beans', '_hidden', 'lemons'])
+        assert list(terms['dynamicProperties'].values()) == [['beans', 'lemons']]
+
+    @pytest.mark.parametrize(
+        'fields',
+        [
+            ['type', 'scientificName', 'genus', 'locality', 'beans', '_id'],
+            list(reversed(DWC_TERM_INDEX)),
+            list(DWC_TERM_INDEX) + [f'extra{i}' for i in range(100)],
+        ],
+    )
+    def test_matches_xsd_walk(self, fields):
+        expected = walk_xsd_dwc_terms(fields)
+        actual = dwc_terms(fields)
+        assert list(actual.items()) == list(expected.items())
+        for group, group_terms in expected.items():
+            assert list(actual[group].items()) == list(group_terms.items())
@@ -1,3 +1,4 @@
+import time
 from unittest.mock import MagicMock, patch
 
 from requests.exceptions import HTTPError, SSLError, Timeout
@@ -7,7 +8,9 @@ from ckanext.nhm.lib.external_links import (
     P10K,
     Link,
     RankedTemplateSite,
+    Site,
     get_sites,
+    resolve_links,
 )
 
 
@@ -128,3 +131,42 @@ class TestGBIFSite:
         with patch('ckanext.nhm.lib.external_links._get_gbif_record', gbif_mock):
             links = GBIF.get_links({'occurrenceID': 'x'})
             assert len(links) == 0
+
+
+class SlowSite(Site):
+    remote = True
+
+    def __init__(self, name, delay, links):
+        super().__init__(name, 'icon')
+        self.delay = delay
+        self.links = links
+
+    def get_links(self, record):
+        time.sleep(self.delay)
+        return self.links
+
+
+class TestResolveLinks:
+    def test_slow_sites_are_left_out(self):
+        fast = SlowSite('fast', 0, [Link('a', 'b')])
+        slow = SlowSite('slow', 1, [Link('c', 'd')])
+        template = RankedTemplateSite('template', 'icon', 'beans/{}')
+        sites = [slow, template, fast]
+        with patch('ckanext.nhm.lib.external_links.get_sites', return_value=sites):
+            start = time.monotonic()
+            resolved = resolve_links({'kingdom': 'k'}, deadline=0.2)
+            assert time.monotonic() - start < 1
+
+        assert resolved == [
+            (template, [Link('k', 'beans/k')]),
+            (fast, [Link('a', 'b')]),
+        ]
+
+    def test_errors_are_left_out(self):
+        broken = SlowSite('broken', 0, None)
+        broken.get_links = MagicMock(side_effect=Exception())
+        fine = SlowSite('fine', 0, [Link('a', 'b')])
+        with patch(
+            'ckanext.nhm.lib.external_links.get_sites', return_value=[broken, fine]
+        ):
+            assert resolve_links({}, deadline=1) == [(fine, [Link('a', 'b')])]
@@ -0,0 +1,83 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ckanext.nhm.lib.cache import TwoTierCache
+from ckanext.nhm.lib.facets import MAX_FACET_LIMIT, FacetQuery, precompute_facets
+
+
+@pytest.fixture
+def search():
+    search = MagicMock(
+        return_value={
+            'facets': {
+                'genus': {
+                    'values': {'Quercus': 2, 'Bellis': 10},
+                    'details': {'sum_other_doc_count': 0},
+                }
+            }
+        }
+    )
+    mock_toolkit = MagicMock(get_action=MagicMock(return_value=search))
+    cache = TwoTierCache('facets')
+    snapshots = TwoTierCache('facet_snapshots')
+    with patch('ckanext.nhm.lib.facets.get_facet_cache', return_value=cache):
+        with patch(
+            'ckanext.nhm.lib.facets.get_facet_snapshot_store', return_value=snapshots
+        ):
+            with patch('ckanext.nhm.lib.action_memo.toolkit', mock_toolkit):
+                with patch('ckanext.nhm.lib.facets.round_version', return_value=10):
+                    yield search
+
+
+class TestFacetQuery(object):
+    def test_normalised_key(self):
+        one = FacetQuery('res', ['genus'], ' oak ', {'a': ['2', '1'], 'b': []})
+        two = FacetQuery('res', ['genus'], 'oak', {'a': ['1', '2', '1']})
+        assert one.get_key(10) == two.get_key(10)
+        assert one.get_key(10) != one.get_key(11)
+        assert not one.is_unfiltered
+        assert FacetQuery('res', ['genus'], '', {}).is_unfiltered
+
+    def test_cached(self, search):
+        query = FacetQuery('res', ['genus'], filters={'__version__': ['12']})
+        assert query.get_cached() is None
+        facets = query.get()
+        assert facets['genus']['values'] == [['Bellis', 10], ['Quercus', 2]]
+        assert query.get_cached() == facets
+        FacetQuery('res', ['genus']).get()
+
+        search.assert_called_once()
+        search_params = search.call_args[0][1]
+        assert search_params['version'] == 10
+        assert search_params['filters'] == {}
+        assert search_params['facet_limits'] == {'genus': MAX_FACET_LIMIT}
+
+    def test_snapshot(self, search):
+        assert precompute_facets('res', ['genus']) == 10
+        # already up to date
+        assert precompute_facets('res', ['genus']) is None
+        search.assert_called_once()
+
+        facets = FacetQuery('res', ['genus'], filters={}).get()
+        assert facets['genus']['values'][0] == ['Bellis', 10]
+        search.assert_called_once()
+        # filtered and versioned searches don't use the snapshot
+        FacetQuery('res', ['genus'], filters={'genus': ['Bellis']}).get()
+        FacetQuery('res', ['genus'], filters={'__version__': ['5']}).get()
+        assert search.call_count == 3
+
+    def test_stale_snapshot(self, search):
+        precompute_facets('res', ['genus'])
+        # a new version has been ingested since the snapshot was taken
+        with patch('ckanext.nhm.lib.facets.round_version', return_value=11):
+            FacetQuery('res', ['genus']).get()
+            FacetQuery('res', ['genus']).get()
+        # the search is run once for the new version and then comes from the cache
+        assert search.call_count == 2
+        assert search.call_args[0][1]['version'] == 11
@@ -0,0 +1,56 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ckanext.nhm.lib.cache import TwoTierCache
+from ckanext.nhm.lib.field_schema import Field, get_field_names, get_field_schema
+
+
+@pytest.fixture
+def actions():
+    actions = {
+        'vds_version_round': MagicMock(return_value=10),
+        'vds_basic_query': MagicMock(
+            return_value={
+                'fields': [
+                    {'id': '_id', 'type': 'long'},
+                    {'id': 'genus', 'type': 'string'},
+                ]
+            }
+        ),
+    }
+    mock_toolkit = MagicMock(get_action=MagicMock(side_effect=actions.get))
+    cache = TwoTierCache('field_schema')
+    with patch(
+        'ckanext.nhm.lib.field_schema.get_field_schema_cache', return_value=cache
+    ):
+        with patch('ckanext.nhm.lib.action_memo.toolkit', mock_toolkit):
+            yield actions
+
+
+class TestFieldSchema(object):
+    def test_cached_by_rounded_version(self, actions):
+        assert get_field_schema('res', 12) == (
+            Field('_id', 'long'),
+            Field('genus', 'string'),
+        )
+        assert get_field_names('res') == ['_id', 'genus']
+        search = actions['vds_basic_query']
+        search.assert_called_once()
+        assert search.call_args[0][1]['version'] == 10
+
+        # a new version means a new search
+        actions['vds_version_round'].return_value = 20
+        get_field_schema('res')
+        assert search.call_count == 2
+
+    def test_no_data_not_cached(self, actions):
+        actions['vds_version_round'].return_value = None
+        get_field_schema('res')
+        get_field_schema('res')
+        assert actions['vds_basic_query'].call_count == 2
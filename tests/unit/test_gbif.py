@@ -0,0 +1,96 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+from unittest.mock import MagicMock, patch
+
+import pytest
+from requests.exceptions import Timeout
+
+from ckanext.nhm.lib.cache import MISSING, TwoTierCache
+from ckanext.nhm.lib.gbif import (
+    backfill_gbif_occurrences,
+    fetch_gbif_occurrences,
+    get_gbif_occurrence,
+)
+
+
+def mock_response(results, end_of_records=True):
+    return MagicMock(
+        json=MagicMock(
+            return_value={'results': results, 'endOfRecords': end_of_records}
+        )
+    )
+
+
+@pytest.fixture
+def store():
+    store = TwoTierCache('test')
+    with patch('ckanext.nhm.lib.gbif.get_occurrence_store', return_value=store):
+        with patch('ckanext.nhm.lib.gbif.get_negative_ttl', return_value=60):
+            yield store
+
+
+@pytest.mark.usefixtures('store')
+class TestGBIFOccurrences(object):
+    def test_fetch(self):
+        results = [
+            {'occurrenceID': 'a', 'key': 1, 'extra': 'x'},
+            {'occurrenceID': 'b', 'key': 2},
+            {'occurrenceID': 'b', 'key': 3},
+        ]
+        get = MagicMock(return_value=mock_response(results))
+        with patch('ckanext.nhm.lib.gbif.get_client', return_value=MagicMock(get=get)):
+            occurrences = fetch_gbif_occurrences(['a', 'b', 'c'], 'NHMUK')
+        # one request for all of them
+        assert get.call_count == 1
+        assert occurrences == {'a': {'key': 1}, 'b': None, 'c': None}
+
+    def test_not_found_is_stored(self):
+        get = MagicMock(return_value=mock_response([]))
+        with patch('ckanext.nhm.lib.gbif.get_client', return_value=MagicMock(get=get)):
+            assert get_gbif_occurrence('a', 'NHMUK') is None
+            assert get_gbif_occurrence('a', 'NHMUK') is None
+        assert get.call_count == 1
+
+    def test_errors_are_not_stored(self):
+        get = MagicMock(side_effect=Timeout())
+        with patch('ckanext.nhm.lib.gbif.get_client', return_value=MagicMock(get=get)):
+            assert get_gbif_occurrence('a', 'NHMUK') is None
+            assert get_gbif_occurrence('a', 'NHMUK') is None
+        assert get.call_count == 2
+
+    def test_fetch_pages(self):
+        pages = [
+            mock_response([{'occurrenceID': 'a', 'key': 1}], end_of_records=False),
+            mock_response([{'occurrenceID': 'b', 'key': 2}]),
+        ]
+        get = MagicMock(side_effect=pages)
+        with patch('ckanext.nhm.lib.gbif.get_client', return_value=MagicMock(get=get)):
+            occurrences = fetch_gbif_occurrences(['a', 'b', 'c'], 'NHMUK')
+        assert get.call_count == 2
+        assert get.call_args[1]['params']['offset'] == 1
+        assert occurrences == {'a': {'key': 1}, 'b': {'key': 2}, 'c': None}
+
+    def test_incomplete_results_are_not_stored(self, store):
+        # GBIF says there are more results but doesn't return them
+        get = MagicMock(return_value=mock_response([], end_of_records=False))
+        with patch('ckanext.nhm.lib.gbif.get_client', return_value=MagicMock(get=get)):
+            assert fetch_gbif_occurrences(['a'], 'NHMUK') == {}
+            assert get_gbif_occurrence('a', 'NHMUK') is None
+        assert store.get('NHMUK:a') is MISSING
+
+    def test_backfill(self, store):
+        store.set('NHMUK:a', {'key': 1})
+        records = [{'occurrenceID': o} for o in 'abcde'] + [{}]
+        get = MagicMock(
+            side_effect=lambda url, params: mock_response(
+                [{'occurrenceID': o, 'key': o} for o in params['occurrenceID']]
+            )
+        )
+        with patch('ckanext.nhm.lib.gbif.get_client', return_value=MagicMock(get=get)):
+            counts = backfill_gbif_occurrences(records, batch_size=2, interval=0)
+        assert counts == {'found': 4, 'not_found': 0, 'skipped': 2, 'failed': 0}
+        assert get.call_count == 2
+        assert store.get('NHMUK:e') == {'key': 'e'}
@@ -0,0 +1,38 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+from ckanext.nhm.lib.grid_state import build_grid_state, get_grid_columns
+from ckanext.nhm.views import DefaultView
+
+
+class WideView(DefaultView):
+    grid_column_widths = {'catalogNumber': 120}
+
+
+class TestGridState(object):
+    def test_columns(self):
+        fields = ('zzz', '_id', 'genus', 'scientificName', 'gbifIssue', 'aaa')
+        columns = get_grid_columns(fields, fields + ('new',))
+        assert columns.order == (
+            '_id',
+            'gbifIssue',
+            'scientificName',
+            'genus',
+            'zzz',
+            'aaa',
+        )
+        assert columns.hidden == ('new',)
+        assert columns.fit
+
+    def test_view_state_not_mutated(self):
+        view = WideView()
+        widths = list(DefaultView.state['columnsWidth'])
+        for _ in range(3):
+            state = build_grid_state(view, ['_id', 'catalogNumber'], ['_id'])
+        assert state['columnsWidth'] == widths + [
+            {'column': 'catalogNumber', 'width': 120}
+        ]
+        assert DefaultView.state['columnsWidth'] == widths
+        assert 'columnsOrder' not in DefaultView.state
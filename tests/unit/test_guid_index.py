@@ -0,0 +1,49 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+import sqlite3
+from unittest.mock import patch
+
+from ckanext.nhm.lib.guid_index import GUIDLocation, lookup_guid, update_guid_index
+
+GUID_1 = '73f450db-46b3-45a0-ac18-f00547be5af1'
+GUID_2 = 'bc03fc1a-3613-41a2-b1f1-bf905e0fa6d0'
+
+
+class TestGUIDIndex(object):
+    def test_update_and_lookup(self, tmp_path):
+        path = str(tmp_path / 'nhm' / 'guid_index.sqlite')
+        records = [
+            {'_id': 1, 'occurrenceID': GUID_1},
+            {'_id': 2, 'occurrenceID': 'not a guid'},
+            {'_id': 3},
+        ]
+
+        with patch('ckanext.nhm.lib.guid_index.get_guid_index_path', return_value=path):
+            assert lookup_guid(GUID_1) is None
+            assert update_guid_index('res', 10, records, batch_size=1) == 1
+            # a later ingest moves nothing but extends the version range and adds a new
+            # record
+            records = [
+                {'_id': 1, 'occurrenceID': GUID_1},
+                {'_id': 4, 'occurrenceID': GUID_2},
+            ]
+            assert update_guid_index('res', 20, records) == 2
+
+            assert lookup_guid(GUID_1) == GUIDLocation('res', 1, 10, 20)
+            assert lookup_guid(GUID_2.upper()) == GUIDLocation('res', 4, 20, 20)
+            assert lookup_guid('not a guid') is None
+
+        connection = sqlite3.connect(path)
+        assert connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+        connection.close()
+
+    def test_contains(self):
+        location = GUIDLocation('res', 1, 10, 20)
+        # the latest version isn't known by the index
+        assert not location.contains(None)
+        assert location.contains(15)
+        assert not location.contains(5)
+        assert not location.contains(25)
@@ -11,6 +11,7 @@ from ckanext.nhm.lib.helpers import (
     dataset_author_truncate,
     get_object_url,
     get_specimen_jsonld,
+    group_resources,
 )
 
 
@@ -71,7 +72,9 @@ class TestGetObjectURL(object):
         mock_get_action = MagicMock(return_value=mock_vds_version_round)
         mock_url_for = MagicMock()
         mock_toolkit = MagicMock(get_action=mock_get_action, url_for=mock_url_for)
-        with patch('ckanext.nhm.lib.helpers.toolkit', mock_toolkit):
+        with patch('ckanext.nhm.lib.helpers.toolkit', mock_toolkit), patch(
+            'ckanext.nhm.lib.action_memo.toolkit', mock_toolkit
+        ):
             get_object_url('a resource', 'a guid')
             mock_get_action.assert_called_once_with('vds_version_round')
             mock_vds_version_round.assert_called_once_with(
@@ -94,7 +97,9 @@ class TestGetObjectURL(object):
         mock_get_action = MagicMock(return_value=mock_vds_version_round)
         mock_url_for = MagicMock()
         mock_toolkit = MagicMock(get_action=mock_get_action, url_for=mock_url_for)
-        with patch('ckanext.nhm.lib.helpers.toolkit', mock_toolkit):
+        with patch('ckanext.nhm.lib.helpers.toolkit', mock_toolkit), patch(
+            'ckanext.nhm.lib.action_memo.toolkit', mock_toolkit
+        ):
             get_object_url('a resource', 'a guid', version=15)
             mock_get_action.assert_called_once_with('vds_version_round')
             mock_vds_version_round.assert_called_once_with(
@@ -115,7 +120,9 @@ class TestGetObjectURL(object):
         mock_get_action = MagicMock()
         mock_url_for = MagicMock()
         mock_toolkit = MagicMock(get_action=mock_get_action, url_for=mock_url_for)
-        with patch('ckanext.nhm.lib.helpers.toolkit', mock_toolkit):
+        with patch('ckanext.nhm.lib.helpers.toolkit', mock_toolkit), patch(
+            'ckanext.nhm.lib.action_memo.toolkit', mock_toolkit
+        ):
             get_object_url('a resource', 'a guid', version=15, include_version=False)
             mock_get_action.assert_not_called()
             mock_url_for.assert_called_once_with(
@@ -159,3 +166,44 @@ class TestGetSpecimenJSONLD(object):
             mock_get_action('object_rdf').assert_called_once_with(
                 {}, {'uuid': uuid, 'format': 'json-ld', 'version': 327947382}
             )
+
+
+class TestGroupResources(object):
+    """
+    Tests for the group_resources helper function.
+    """
+
+    def test_linked_specimens_found_together(self):
+        """
+        group_resources should find all the linked specimens together and fill in
+        the group name tokens.
+        """
+        resources = [
+            {'id': 'r1', 'resource_group': 'CT $catalogNumber', 'linked_specimen': 'a'},
+            {'id': 'r2', 'resource_group': 'CT $catalogNumber', 'linked_specimen': 'b'},
+            {'id': 'r3', 'resource_group': 'CT $catalogNumber', 'linked_specimen': 'a'},
+            {'id': 'r4', 'resource_group': 'Other $unknown', 'linked_specimen': 'b'},
+            {'id': 'r5'},
+        ]
+        specimens = [
+            MagicMock(data={'occurrenceID': 'a', 'catalogNumber': 'BMNH 1'}),
+            MagicMock(data={'occurrenceID': 'b', 'catalogNumber': 'BMNH 2'}),
+        ]
+        mock_load_by = MagicMock(return_value=specimens)
+
+        with patch(
+            'ckanext.nhm.lib.helpers.get_specimen_resource_id',
+            return_value='specimens',
+        ), patch('ckanext.nhm.lib.record.RecordBatch.load_by', mock_load_by):
+            groups = group_resources(resources)
+
+        mock_load_by.assert_called_once()
+        resource_id, field, uuids = mock_load_by.call_args[0]
+        assert (resource_id, field) == ('specimens', 'occurrenceID')
+        assert sorted(uuids) == ['a', 'a', 'b', 'b']
+        assert [(name, [r['id'] for r in items]) for name, _, items in groups] == [
+            (None, ['r5']),
+            ('CT BMNH 1', ['r1', 'r3']),
+            ('CT BMNH 2', ['r2']),
+            ('Other $unknown', ['r4']),
+        ]
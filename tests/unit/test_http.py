@@ -0,0 +1,81 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+from unittest.mock import MagicMock, patch
+
+import pytest
+from requests.exceptions import ConnectionError, Timeout
+
+from ckanext.nhm.lib.http import CircuitOpenError, HTTPClient
+
+
+def make_client(session, **kwargs):
+    with patch('ckanext.nhm.lib.http.toolkit', MagicMock(config={})):
+        client = HTTPClient('test', backoff=0, **kwargs)
+    patcher = patch('ckanext.nhm.lib.http.get_session', return_value=session)
+    patcher.start()
+    return client, patcher
+
+
+class TestHTTPClient(object):
+    def teardown_method(self):
+        patch.stopall()
+
+    def test_success(self):
+        session = MagicMock(get=MagicMock(return_value=MagicMock(status_code=200)))
+        client, _ = make_client(session, timeout=3)
+        assert client.get('https://beans.com', params={'a': 1}).status_code == 200
+        session.get.assert_called_once_with(
+            'https://beans.com', params={'a': 1}, timeout=3
+        )
+        assert client.metrics.requests == 1
+        assert client.metrics.errors == 0
+
+    def test_retries(self):
+        session = MagicMock(
+            get=MagicMock(side_effect=[Timeout(), MagicMock(status_code=200)])
+        )
+        client, _ = make_client(session, retries=1)
+        assert client.get('https://beans.com').status_code == 200
+        assert client.metrics.requests == 2
+        assert client.metrics.errors == 1
+        assert client.metrics.retries == 1
+
+    def test_retries_bad_statuses(self):
+        session = MagicMock(get=MagicMock(return_value=MagicMock(status_code=503)))
+        client, _ = make_client(session, retries=2)
+        # the last response is returned
+        assert client.get('https://beans.com').status_code == 503
+        assert session.get.call_count == 3
+
+    def test_circuit_breaker(self):
+        session = MagicMock(get=MagicMock(side_effect=ConnectionError()))
+        client, _ = make_client(session, retries=0, failure_threshold=2, cooldown=60)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                client.get('https://beans.com')
+        with pytest.raises(CircuitOpenError):
+            client.get('https://beans.com')
+        # the last request shouldn't have been made
+        assert session.get.call_count == 2
+        assert client.metrics.rejected == 1
+        assert client.breaker.is_open
+
+    def test_circuit_breaker_stops_retries(self):
+        session = MagicMock(get=MagicMock(return_value=MagicMock(status_code=503)))
+        client, _ = make_client(session, retries=3, failure_threshold=2, cooldown=60)
+        # the breaker opens after the second attempt and the last response is returned
+        assert client.get('https://beans.com').status_code == 503
+        assert session.get.call_count == 2
+        assert client.metrics.rejected == 1
+
+    def test_circuit_breaker_stops_retries_after_errors(self):
+        error = Timeout()
+        session = MagicMock(get=MagicMock(side_effect=error))
+        client, _ = make_client(session, retries=3, failure_threshold=1, cooldown=60)
+        with pytest.raises(Timeout) as info:
+            client.get('https://beans.com')
+        assert info.value is error
+        assert session.get.call_count == 1
@@ -0,0 +1,43 @@
+import pytest
+from jinja2 import Environment
+
+from ckanext.nhm.lib.jinja_extensions import (
+    DEFAULT_RULES,
+    TaxonomyFormatExtension,
+    get_collection_rules,
+)
+
+
+@pytest.fixture
+def extension():
+    return TaxonomyFormatExtension(Environment())
+
+
+@pytest.mark.parametrize(
+    'collection_code', ['ZOO', 'zoo', 'BMNH(E)', 'PAL', 'BOT', 'MIN', None, 'beans']
+)
+def test_collection_rules_are_immutable(collection_code):
+    rules = get_collection_rules(collection_code)
+    with pytest.raises(TypeError):
+        rules.field_formats['genus'] = (str.upper,)
+    assert isinstance(rules.parsed_fields, frozenset)
+
+
+def test_unknown_collection_uses_default_rules(extension):
+    assert get_collection_rules('beans') is DEFAULT_RULES
+    # format some zoology fields first to make sure nothing carries over
+    assert extension._reformat('genus', 'ZOO', {}, lambda: 'Panthera') == (
+        '<em>Panthera</em>'
+    )
+    assert extension._reformat('genus', 'beans', {}, lambda: 'Panthera') == 'Panthera'
+
+
+def test_abbreviations(extension):
+    body = extension._reformat(
+        'scientificName', 'BOT', {}, lambda: 'Rosa canina subvar. alba f. rubra'
+    )
+    assert body == (
+        '<em>Rosa canina'
+        '<span style="font-style: normal;"> subvar. </span>alba'
+        '<span style="font-style: normal;"> f. </span>rubra</em>'
+    )
@@ -0,0 +1,207 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ckanext.nhm.lib.cache import TwoTierCache
+from ckanext.nhm.lib.record import (
+    DWC_ASSOCIATED_MEDIA,
+    IMAGE_FIELD,
+    LATEST_SPECIMEN_TTL,
+    Record,
+    RecordBatch,
+    RecordImage,
+    RecordImages,
+    get_record_by_uuid,
+    get_records_by_uuids,
+    get_specimen_by_uuid,
+    invalidate_latest_specimens,
+)
+
+RESOURCE = {
+    'id': 'res',
+    'package_id': 'pkg',
+    'format': 'dwc',
+    IMAGE_FIELD: DWC_ASSOCIATED_MEDIA,
+}
+LICENSE = MagicMock(title='CC BY', url='https://example.com/cc-by')
+
+
+class TestRecordImages(object):
+    def test_sequence(self):
+        images = RecordImages(
+            ['a', 'b'], ['A', 'B'], ['CC BY'] * 2, ['url'] * 2, ['rights'] * 2, True
+        )
+        assert len(images) == 2
+        assert images[1] == RecordImage('b', 'B', 'CC BY', 'url', 'rights', True)
+        assert [image.url for image in images] == ['a', 'b']
+        assert images[:1] == [RecordImage('a', 'A', 'CC BY', 'url', 'rights', True)]
+        assert not RecordImages()
+
+
+class TestRecordBatch(object):
+    def test_shared(self):
+        data = [
+            {'_id': 1, DWC_ASSOCIATED_MEDIA: [{'identifier': 'a', 'title': 'A'}]},
+            {'_id': 2},
+        ]
+        package = {'id': 'pkg', 'name': 'specimens'}
+        batch = RecordBatch('res', data, 4, RESOURCE, package, {'user': 'test'})
+
+        assert [record.id for record in batch] == [1, 2]
+        first, second = batch
+        assert first.resource is second.resource is RESOURCE
+        assert first.package is second.package is package
+        assert first.package_name == 'specimens'
+        assert first.version == 4
+
+        with patch('ckanext.nhm.lib.record.get_image_license', return_value=LICENSE):
+            with patch(
+                'ckanext.nhm.lib.record.is_collection_resource_id', return_value=False
+            ):
+                assert first.images.urls == ('a',)
+                assert first.images[0].license_title == 'CC BY'
+                assert len(second.images) == 0
+
+    def test_lazy_resource(self):
+        resource_show = MagicMock(return_value=RESOURCE)
+        batch = RecordBatch('res', context={'user': 'test'})
+        batch.add({'_id': 1})
+        batch.add({'_id': 2})
+
+        with patch(
+            'ckanext.nhm.lib.record.get_memoized_action', return_value=resource_show
+        ):
+            assert all(record.resource is RESOURCE for record in batch)
+
+        resource_show.assert_called_once()
+
+    def test_slots(self):
+        record = Record(1, context={'user': 'test'})
+        assert not hasattr(record, '__dict__')
+
+    def test_load_many(self):
+        def basic_query(context, data_dict):
+            ids = data_dict['filters']['_id']
+            # pretend record 3 doesn't exist and return the others in a different order
+            return {'records': [{'_id': int(i)} for i in reversed(ids) if i != '3']}
+
+        basic_query = MagicMock(side_effect=basic_query)
+        mock_toolkit = MagicMock(get_action=MagicMock(return_value=basic_query))
+
+        with patch('ckanext.nhm.lib.record.toolkit', mock_toolkit):
+            batch = Record.load_many('res', [2, 1, 3, 2, 4], 7, {'user': 'test'})
+
+        assert [record.id for record in batch] == [2, 1, 4]
+        assert all(record.version == 7 for record in batch)
+        basic_query.assert_called_once()
+        assert basic_query.call_args[0][1]['filters'] == {'_id': ['2', '1', '3', '4']}
+
+
+@pytest.fixture
+def specimen_search():
+    search = MagicMock(return_value={'records': [{'_id': 1}]})
+    mock_toolkit = MagicMock(get_action=MagicMock(return_value=search))
+    cache = TwoTierCache('specimen', ttl=LATEST_SPECIMEN_TTL)
+    with patch('ckanext.nhm.lib.record.get_specimen_cache', return_value=cache):
+        with patch('ckanext.nhm.lib.record.toolkit', mock_toolkit):
+            with patch(
+                'ckanext.nhm.lib.record.get_specimen_resource_id', return_value='s'
+            ):
+                yield search
+
+
+class TestGetSpecimenByUUID(object):
+    def test_cached(self, specimen_search):
+        assert get_specimen_by_uuid('a').id == 1
+        assert get_specimen_by_uuid('a').id == 1
+        assert get_specimen_by_uuid('a', 4).version == 4
+        assert specimen_search.call_count == 2
+
+    def test_not_found_not_cached(self, specimen_search):
+        specimen_search.return_value = {'records': []}
+        assert get_specimen_by_uuid('a') is None
+        assert get_specimen_by_uuid('a') is None
+        assert specimen_search.call_count == 2
+
+    def test_invalidate_latest(self, specimen_search):
+        get_specimen_by_uuid('a')
+        get_specimen_by_uuid('a', 4)
+        invalidate_latest_specimens()
+        get_specimen_by_uuid('a')
+        get_specimen_by_uuid('a', 4)
+        # only the latest version is searched for again
+        assert specimen_search.call_count == 3
+
+
+@pytest.fixture
+def uuid_actions():
+    actions = {
+        'vds_multi_query': MagicMock(
+            return_value={'records': [{'resource': 'r2', 'data': {'_id': 5}}]}
+        ),
+        'vds_data_get': MagicMock(return_value={'data': {'_id': 5}}),
+    }
+    mock_toolkit = MagicMock(get_action=MagicMock(side_effect=actions.get))
+    cache = TwoTierCache('uuid_location')
+    with patch('ckanext.nhm.lib.record.get_uuid_location_cache', return_value=cache):
+        with patch('ckanext.nhm.lib.record.toolkit', mock_toolkit):
+            with patch(
+                'ckanext.nhm.lib.record.rdf_resources', return_value=['r1', 'r2']
+            ):
+                yield actions, cache
+
+
+class TestGetRecordByUUID(object):
+    def test_one_search_then_cached(self, uuid_actions):
+        actions, _cache = uuid_actions
+        record = get_record_by_uuid('a')
+        assert (record.resource_id, record.id) == ('r2', 5)
+        search = actions['vds_multi_query']
+        search.assert_called_once()
+        assert search.call_args[0][1]['resource_ids'] == ['r1', 'r2']
+
+        record = get_record_by_uuid('a', 10)
+        assert (record.resource_id, record.id, record.version) == ('r2', 5, 10)
+        search.assert_called_once()
+        actions['vds_data_get'].assert_called_once()
+
+    def test_not_found(self, uuid_actions):
+        actions, cache = uuid_actions
+        actions['vds_multi_query'].return_value = {'records': []}
+        assert get_record_by_uuid('a') is None
+        assert cache.get('a', None) is None
+
+
+class TestGetRecordsByUUIDs(object):
+    def test_searches_each_resource_for_the_remaining(self, uuid_actions):
+        actions, cache = uuid_actions
+        data = {'r1': {'a': 1}, 'r2': {'a': 2, 'b': 3}}
+
+        def basic_query(context, data_dict):
+            records = data[data_dict['resource_id']]
+            return {
+                'records': [
+                    {'_id': records[uuid], 'occurrenceID': uuid}
+                    for uuid in data_dict['filters']['occurrenceID']
+                    if uuid in records
+                ]
+            }
+
+        actions['vds_basic_query'] = MagicMock(side_effect=basic_query)
+        records = get_records_by_uuids(['a', 'b', 'c'])
+
+        assert {uuid: (r.resource_id, r.id) for uuid, r in records.items()} == {
+            'a': ('r1', 1),
+            'b': ('r2', 3),
+        }
+        searches = actions['vds_basic_query'].call_args_list
+        assert [search[0][1]['filters'] for search in searches] == [
+            {'occurrenceID': ['a', 'b', 'c']},
+            {'occurrenceID': ['b', 'c']},
+        ]
+        assert cache.get('b') == ['r2', 3]
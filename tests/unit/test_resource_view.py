@@ -0,0 +1,51 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+from unittest.mock import MagicMock, patch
+
+from ckanext.nhm.lib.cache import TwoTierCache
+from ckanext.nhm.lib.resource_view import ViewRegistry, get_filter_options_by_id
+from ckanext.nhm.views import DefaultView
+
+
+class ResourceView(DefaultView):
+    resource_id = 'special'
+    filter_options = ['special']
+
+
+class FormatView(DefaultView):
+    format = 'dwc'
+    filter_options = ['dwc']
+
+
+class TestViewRegistry(object):
+    def setup_method(self):
+        self.registry = ViewRegistry([ResourceView, FormatView])
+
+    def test_get(self):
+        assert isinstance(self.registry.get('special', 'dwc'), ResourceView)
+        assert isinstance(self.registry.get('other', 'dwc'), FormatView)
+        assert type(self.registry.get('other', 'csv')) is DefaultView
+        # the same objects are returned each time
+        assert self.registry.get('other', 'dwc') is self.registry.get('x', 'dwc')
+
+    def test_filter_options_by_id(self):
+        resource_show = MagicMock(return_value={'id': 'other', 'format': 'dwc'})
+        mock_toolkit = MagicMock(get_action=MagicMock(return_value=resource_show))
+
+        with patch(
+            'ckanext.nhm.lib.resource_view.get_view_registry',
+            return_value=self.registry,
+        ):
+            with patch(
+                'ckanext.nhm.lib.resource_view._get_resource_format_cache',
+                return_value=TwoTierCache('resource_format'),
+            ):
+                with patch('ckanext.nhm.lib.resource_view.toolkit', mock_toolkit):
+                    assert get_filter_options_by_id('special') == ['special']
+                    assert get_filter_options_by_id('other') == ['dwc']
+                    assert get_filter_options_by_id('other') == ['dwc']
+
+        resource_show.assert_called_once()
@@ -0,0 +1,146 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+import json
+from unittest.mock import MagicMock, patch
+
+from ckanext.nhm.lib.statistics import (
+    RECORD_HISTORY_RECENT_WEEKS,
+    RECORD_HISTORY_START,
+    RECORD_HISTORY_STEP,
+    _lock_record_history,
+    get_collection_stats,
+    update_record_history,
+)
+
+COLLECTIONS = [('artefacts', 'a'), ('indexlots', 'i'), ('specimens', 's')]
+
+
+def run_sequentially(functions, max_workers=None):
+    return [function() for function in functions]
+
+
+class TestCollectionStats(object):
+    def test_aggregated(self):
+        actions = {
+            'vds_multi_count': MagicMock(
+                return_value={'total': 60, 'counts': {'a': 10, 'i': 20, 's': 30}}
+            ),
+            'vds_basic_query': MagicMock(
+                return_value={
+                    'facets': {
+                        'collectionCode': {
+                            'values': {'ZOO': 12, 'BOT': 8, 'zoo': 1, 'OTHER': 3}
+                        }
+                    }
+                }
+            ),
+        }
+        mock_toolkit = MagicMock(get_action=MagicMock(side_effect=actions.get))
+
+        with patch('ckanext.nhm.lib.statistics.toolkit', mock_toolkit):
+            stats = get_collection_stats(COLLECTIONS, 's')
+
+        assert stats['artefacts'] == 10
+        assert stats['indexlots'] == 20
+        assert stats['specimens'] == 30
+        assert stats['total'] == 60
+        assert list(stats['collectionCodes'].items()) == [
+            ('ZOO', 13),
+            ('BOT', 8),
+            ('PAL', 0),
+            ('MIN', 0),
+            ('BMNH(E)', 0),
+        ]
+        # one call for all the totals and one for all the collection codes
+        assert actions['vds_multi_count'].call_count == 1
+        assert actions['vds_basic_query'].call_count == 1
+
+    def test_fallback(self):
+        def multi_count(context, data_dict):
+            if 'query' not in data_dict:
+                # an old datastore without per-resource counts
+                return {'total': 60}
+            value = data_dict['query']['filters']['and'][0]['string_equals']['value']
+            return {'total': len(value)}
+
+        actions = {
+            'vds_multi_count': MagicMock(side_effect=multi_count),
+            'vds_resource_check': MagicMock(
+                side_effect=lambda context, data_dict: data_dict['resource_id'] != 'a'
+            ),
+            'vds_basic_count': MagicMock(return_value=5),
+        }
+        mock_toolkit = MagicMock(get_action=MagicMock(side_effect=actions.get))
+
+        with patch('ckanext.nhm.lib.statistics.toolkit', mock_toolkit), patch(
+            'ckanext.nhm.lib.statistics.run_concurrently', run_sequentially
+        ):
+            stats = get_collection_stats(COLLECTIONS, 's')
+
+        assert stats['artefacts'] == 0
+        assert stats['indexlots'] == 5
+        assert stats['specimens'] == 5
+        assert stats['total'] == 10
+        assert list(stats['collectionCodes'].items())[0] == ('BMNH(E)', 7)
+
+
+class TestRecordHistory(object):
+    def test_only_counts_new_weeks(self, tmp_path):
+        path = tmp_path / 'record_history.json'
+        count_action = MagicMock(side_effect=lambda context, data_dict: {'total': 3})
+        mock_toolkit = MagicMock(
+            config={'ckanext.nhm.record_history.path': str(path)},
+            get_action=MagicMock(return_value=count_action),
+        )
+        start = RECORD_HISTORY_START
+
+        with patch('ckanext.nhm.lib.statistics.toolkit', mock_toolkit):
+            history = update_record_history(now=start + 3 * RECORD_HISTORY_STEP)
+            assert len(history) == 3
+            assert count_action.call_count == 3
+
+            history = update_record_history(now=start + 5 * RECORD_HISTORY_STEP)
+            assert len(history) == 5
+            # only the 2 new weeks should have been counted
+            assert count_action.call_count == 5
+
+        assert json.loads(path.read_text()) == history
+
+    def test_no_backfill_only_counts_recent_weeks(self, tmp_path):
+        path = tmp_path / 'record_history.json'
+        count_action = MagicMock(side_effect=lambda context, data_dict: {'total': 3})
+        mock_toolkit = MagicMock(
+            config={'ckanext.nhm.record_history.path': str(path)},
+            get_action=MagicMock(return_value=count_action),
+        )
+        now = RECORD_HISTORY_START + 100 * RECORD_HISTORY_STEP
+
+        with patch('ckanext.nhm.lib.statistics.toolkit', mock_toolkit):
+            history = update_record_history(now=now, backfill=False)
+
+        assert len(history) == RECORD_HISTORY_RECENT_WEEKS
+        assert count_action.call_count == RECORD_HISTORY_RECENT_WEEKS
+        assert [version for version, _ in history] == [
+            now - week * RECORD_HISTORY_STEP
+            for week in range(RECORD_HISTORY_RECENT_WEEKS, 0, -1)
+        ]
+
+    def test_no_backfill_skips_counting_when_locked(self, tmp_path):
+        path = tmp_path / 'record_history.json'
+        path.write_text(json.dumps([[RECORD_HISTORY_START, 3]]))
+        count_action = MagicMock()
+        mock_toolkit = MagicMock(
+            config={'ckanext.nhm.record_history.path': str(path)},
+            get_action=MagicMock(return_value=count_action),
+        )
+        now = RECORD_HISTORY_START + 3 * RECORD_HISTORY_STEP
+
+        with patch('ckanext.nhm.lib.statistics.toolkit', mock_toolkit):
+            with _lock_record_history(str(path), wait=True):
+                history = update_record_history(now=now, backfill=False)
+
+        assert history == [[RECORD_HISTORY_START, 3]]
+        count_action.assert_not_called()
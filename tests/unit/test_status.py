@@ -0,0 +1,82 @@
+# !/usr/bin/env python
+# encoding: utf-8
+#
+# This file is part of ckanext-nhm
+# Created by the Natural History Museum in London, UK
+import time
+from unittest.mock import MagicMock, patch
+
+from ckanext.nhm.lib.cache import TwoTierCache
+from ckanext.nhm.lib.status import (
+    SNAPSHOT_KEY,
+    get_last_status,
+    get_status_reports,
+    refresh_status,
+)
+
+INGEST = {'current_version': '2024-01-01', 'state': 'good', 'next_ingest': '2024-01-02'}
+
+
+def make_toolkit():
+    return MagicMock(config={}, asint=int, _=lambda text: text)
+
+
+class TestStatus(object):
+    def test_refresh_keeps_previous_result_on_failure(self):
+        store = TwoTierCache('status')
+        store.set(SNAPSHOT_KEY, {'checked': 0, 'ingest': INGEST})
+        ingest = MagicMock(side_effect=Exception('es down'))
+        ingest.cache_clear = MagicMock()
+
+        with patch('ckanext.nhm.lib.status.get_status_store', return_value=store):
+            with patch('ckanext.nhm.lib.status.get_ingest_status', ingest):
+                with patch(
+                    'ckanext.nhm.lib.status.get_iiif_status',
+                    return_value={'ping': False},
+                ):
+                    with patch(
+                        'ckanext.nhm.lib.status.get_gbif_status',
+                        return_value=('unknown', 'bad'),
+                    ):
+                        snapshot = refresh_status()
+
+        assert snapshot['ingest'] == INGEST
+        assert snapshot['iiif'] == {'ping': False}
+        assert snapshot['gbif'] == ['unknown', 'bad']
+        assert store.get(SNAPSHOT_KEY) == snapshot
+
+    def test_read_does_not_check(self):
+        store = TwoTierCache('status')
+        snapshot = {
+            'checked': time.time(),
+            'iiif': {'ping': True, 'status': ':)', 'specimens': ':('},
+            'ingest': INGEST,
+            'gbif': ['2024-01-01', 'good'],
+        }
+        store.set(SNAPSHOT_KEY, snapshot)
+        refresh = MagicMock()
+
+        with patch('ckanext.nhm.lib.status.get_status_store', return_value=store):
+            with patch('ckanext.nhm.lib.status.toolkit', make_toolkit()):
+                with patch('ckanext.nhm.lib.status._refresh_in_background', refresh):
+                    reports = get_status_reports()
+
+        refresh.assert_not_called()
+        states = [report['state'] for report in reports]
+        assert states == ['good', 'bad', 'good', 'good']
+        assert all('Last checked' in report['help'] for report in reports)
+
+    def test_stale_read_refreshes_in_background(self):
+        store = TwoTierCache('status')
+        snapshot = {'checked': time.time() - 1000}
+        store.set(SNAPSHOT_KEY, snapshot)
+        refresh = MagicMock()
+
+        with patch('ckanext.nhm.lib.status.get_status_store', return_value=store):
+            with patch('ckanext.nhm.lib.status.toolkit', make_toolkit()):
+                with patch('ckanext.nhm.lib.status._refresh_in_background', refresh):
+                    assert get_last_status() == snapshot
+                    reports = get_status_reports()
+
+        assert refresh.call_count == 2
+        assert all(report['value'] == 'unknown' for report in reports)
@@ -0,0 +1,55 @@
+import pytest
+
+from ckanext.nhm.lib.taxonomy import (
+    _author_regex,
+    find_author_split,
+    find_author_splits,
+)
+
+
+@pytest.mark.parametrize(
+    'record,expected',
+    [
+        (
+            {
+                'scientificName': 'Panthera leo (Linnaeus, 1758)',
+                'scientificNameAuthorship': '(Linnaeus, 1758)',
+            },
+            12,
+        ),
+        ({'scientificName': 'Panthera leo Linnaeus', 'specificEpithet': 'leo'}, 13),
+        ({'scientificName': 'Panthera leo', 'specificEpithet': 'leo'}, 12),
+        (
+            {'scientificName': 'Panthera (Tigris) tigris Smith', 'subgenus': 'Tigris'},
+            25,
+        ),
+        ({'scientificName': 'Panthera tigris Smith'}, 16),
+        ({'scientificName': 'Panthera'}, None),
+    ],
+)
+def test_find_author_split(record, expected):
+    assert find_author_split(record['scientificName'], record) == expected
+
+
+def test_find_author_splits():
+    records = [
+        {'scientificName': 'Panthera leo', 'specificEpithet': 'leo'},
+        {'scientificName': 'Panthera'},
+        {'genus': 'Panthera'},
+    ]
+    assert find_author_splits(records) == [12, None, None]
+
+
+def test_author_regex_is_reused():
+    _author_regex.cache_clear()
+    records = [
+        {
+            'scientificName': f'Panthera {epithet} Linnaeus, 1758',
+            'scientificNameAuthorship': 'Linnaeus, 1758',
+        }
+        for epithet in ('leo', 'tigris', 'onca')
+    ]
+    assert find_author_splits(records) == [12, 15, 13]
+    info = _author_regex.cache_info()
+    assert info.misses == 1
+    assert info.hits == 2